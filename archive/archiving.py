@@ -0,0 +1,90 @@
+"""Moving showings of past days with their orders to archive tables.
+
+Whole days are archived, so that rollups of a day (see reports.rollups)
+are either all computed from the hot tables or kept as they were when the
+day got archived. Showings are moved in batches, each in its own short
+transaction, so that archiving years of history does not lock the tables
+for long.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedShowing, ArchivedOrder
+from cinema.catalog import bump_catalog_version
+from cinema.models import Showing
+from orders.models import Order, WaitingRoom
+from reports.models import ShowingStats
+
+
+def get_archive_cutoff(days=None):
+    """Return the start of the oldest local day which is kept in the hot tables."""
+
+    if days is None:
+        days = settings.CINEMA_ARCHIVE_AFTER_DAYS
+
+    first_day = timezone.localtime(timezone.now()).date() - timezone.timedelta(days=days)
+    return timezone.make_aware(timezone.datetime.combine(first_day, timezone.datetime.min.time()))
+
+
+def delete_rows(model, field_name, values):
+    """Delete rows of model whose field has one of values with a single query,
+    without loading them and sending signals."""
+
+    field = model._meta.get_field(field_name)
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} WHERE {quote_name(field.column)} IN ({placeholders})',
+            [field.get_db_prep_value(value, connection) for value in values]
+        )
+
+
+def archive_showings_batch(cutoff, batch_size):
+    """Move up to batch_size showings starting before cutoff with their orders
+    to the archive, return the amounts of moved showings and orders."""
+
+    with transaction.atomic():
+        showings = list(Showing.objects.select_for_update(of=('self',)).filter(when__lt=cutoff).order_by('when')
+                        [:batch_size])
+        if not showings:
+            return 0, 0
+
+        uuids = [showing.pk for showing in showings]
+        orders = list(Order.objects.select_for_update().filter(showing__in=uuids))
+
+        ArchivedShowing.objects.bulk_create([
+            ArchivedShowing(uuid=showing.pk, when=showing.when, ends_at=showing.ends_at, movie_id=showing.movie_id,
+                            hall_id=showing.hall_id, taken_seats=showing.taken_seats)
+            for showing in showings
+        ])
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(uuid=order.pk, date=order.date, tickets_amount=order.tickets_amount,
+                          accepted=order.accepted, showing_id=order.showing_id, client_id=order.client_id,
+                          cashier_who_accepted_id=order.cashier_who_accepted_id, seats=order.seats)
+            for order in orders
+        ])
+
+        # Day rollups of archived showings are kept, rollups of single showings are not.
+        ShowingStats.objects.filter(showing__in=uuids).delete()
+        WaitingRoom.objects.filter(showing__in=uuids).delete()
+        # Deleted without sending signals for every row: rollups of these days
+        # must not be rebuilt from the hot tables, which no longer have them.
+        delete_rows(Order, 'showing', uuids)
+        delete_rows(Showing, 'uuid', uuids)
+        bump_catalog_version()
+
+    return len(showings), len(orders)
+
+
+def archive_showings(cutoff, batch_size=500):
+    """Move all showings starting before cutoff with their orders to the archive,
+    yield the amounts of showings and orders moved by each batch."""
+
+    while True:
+        showings, orders = archive_showings_batch(cutoff, batch_size)
+        if not showings:
+            return
+        yield showings, orders
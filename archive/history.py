@@ -0,0 +1,14 @@
+import heapq
+
+
+def get_tickets_history(client, before):
+    """Return orders of client of showings that started before `before`,
+    from both the hot and archive tables, ordered by time of showings."""
+
+    orders = client.my_orders.filter(showing__when__lt=before) \
+        .select_related('showing__movie', 'showing__hall').order_by('showing__when')
+    archived_orders = client.archived_orders.filter(showing__when__lt=before) \
+        .select_related('showing__movie', 'showing__hall').order_by('showing__when')
+
+    # Both are ordered, archived showings are usually just the older ones.
+    return list(heapq.merge(archived_orders, orders, key=lambda order: order.showing.when))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from archive.archiving import archive_showings, get_archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move showings of days older than given amount of days with their orders to archive tables. ' \
+           'Should be run daily, so that the size of showing and order tables stays bounded.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CINEMA_ARCHIVE_AFTER_DAYS,
+                            help='Amount of past days kept in showing and order tables.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Amount of showings moved in one transaction.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('At least one past day has to be kept.')
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size has to be positive.')
+
+        cutoff = get_archive_cutoff(options['days'])
+        total_showings = total_orders = 0
+        for showings, orders in archive_showings(cutoff, options['batch_size']):
+            total_showings += showings
+            total_orders += orders
+            self.stdout.write(f'Archived {total_showings} showing(s).')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total_showings} showing(s) and {total_orders} order(s) from before {cutoff.date()}.'
+        ))
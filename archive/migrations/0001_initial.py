@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import orders.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('cinema', '0020_catalogversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedShowing',
+            fields=[
+                ('uuid', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('when', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('taken_seats', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('hall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.hall')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.movie')),
+            ],
+            options={
+                'ordering': ['when'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('uuid', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('tickets_amount', models.IntegerField()),
+                ('accepted', models.BooleanField(default=False)),
+                ('seats', models.BinaryField(default=bytes)),
+                ('cashier_who_accepted', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+                ('showing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='archive.archivedshowing')),
+            ],
+            bases=(orders.models.OrderMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name='archivedshowing',
+            index=models.Index(fields=['when'], name='archived_showing_when_idx'),
+        ),
+    ]
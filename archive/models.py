@@ -0,0 +1,57 @@
+"""Archive tables of finished showings and their orders.
+
+Showings of days older than CINEMA_ARCHIVE_AFTER_DAYS are moved here with
+their orders by archive_showings command (see archive.archiving), so that
+cinema's Showing and orders' Order tables, and their indexes used by
+every booking and schedule, only hold the days being sold. Archived rows
+are read only by customers' ticket history (see archive.history).
+"""
+
+from django.db import models
+from django.utils import timezone
+
+from cinema.models import Movie, Hall
+from orders.models import OrderMixin
+from users.models import CustomUser
+
+
+class ArchivedShowing(models.Model):
+    uuid = models.UUIDField(primary_key=True, editable=False)
+    when = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    hall = models.ForeignKey(Hall, on_delete=models.CASCADE, related_name='+')
+    taken_seats = models.IntegerField(default=0)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['when'], name='archived_showing_when_idx'),
+        ]
+        ordering = ['when']
+
+    def get_datetime(self):
+        return timezone.localtime(self.when)
+
+    def get_date(self):
+        return self.get_datetime().date()
+
+    def get_absolute_url(self):
+        # Pages of past showings are not available, the movie's one is.
+        return self.movie.get_absolute_url()
+
+    def __str__(self):
+        local_when = self.get_datetime()
+        return f'{self.movie.title} on {local_when:%A} ({local_when.date()} {local_when:%H:%M})'
+
+
+class ArchivedOrder(OrderMixin, models.Model):
+    uuid = models.UUIDField(primary_key=True, editable=False)
+    date = models.DateField()
+    tickets_amount = models.IntegerField()
+    accepted = models.BooleanField(default=False)
+    showing = models.ForeignKey(ArchivedShowing, on_delete=models.CASCADE, related_name='orders')
+    client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_orders')
+    cashier_who_accepted = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True,
+                                             related_name='+')
+    seats = models.BinaryField(default=bytes, editable=False)
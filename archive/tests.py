@@ -0,0 +1,81 @@
+import io
+
+from django.core.management import call_command, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from .archiving import get_archive_cutoff
+from .models import ArchivedShowing, ArchivedOrder
+from cinema.models import Showing
+from cinema.tests import CinemaTestCase
+from orders.models import Order
+from orders.services import finalize_orders
+from reports.exports import export
+from reports.models import MovieDayStats
+from reports.rollups import rebuild_rollups
+
+
+class ArchivingTests(CinemaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        finalize_orders([cls.orders[0].pk], cls.cashier, accepted=True)
+
+    def archive(self, days):
+        call_command('archive_showings', days=days, batch_size=3, stdout=io.StringIO())
+        return get_archive_cutoff(days)
+
+    def test_past_days_are_moved(self):
+        cutoff = self.archive(1)
+
+        archived = [showing for showing in self.showings if showing.when < cutoff]
+        self.assertTrue(archived)
+        self.assertFalse(Showing.objects.filter(when__lt=cutoff).exists())
+        self.assertEqual(Showing.objects.count(), len(self.showings) - len(archived))
+        self.assertEqual(set(ArchivedShowing.objects.values_list('pk', flat=True)),
+                         {showing.pk for showing in archived})
+
+        archived_orders = [order for order in self.orders if order.showing.when < cutoff]
+        self.assertFalse(Order.objects.filter(pk__in=[order.pk for order in archived_orders]).exists())
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', 'client', 'tickets_amount')),
+                         {(order.pk, order.client_id, order.tickets_amount) for order in archived_orders})
+        self.assertTrue(ArchivedOrder.objects.get(pk=self.orders[0].pk).is_accepted())
+
+    def test_archiving_is_repeatable(self):
+        self.archive(1)
+        self.archive(1)
+
+        self.assertEqual(ArchivedShowing.objects.count() + Showing.objects.count(), len(self.showings))
+
+    def test_tickets_history_spans_archive(self):
+        cutoff = self.archive(1)
+        start_of_today = timezone.localtime(timezone.now()).replace(hour=0, minute=0)
+
+        expected = [order.pk for order in sorted(self.orders, key=lambda order: order.showing.when)
+                    if order.client == self.client_user and order.showing.when < start_of_today]
+        self.assertTrue(ArchivedOrder.objects.filter(pk__in=expected).exists())
+        self.assertTrue(Order.objects.filter(pk__in=expected, showing__when__gte=cutoff).exists())
+
+        response = self.assertNumQueriesOfGet(5, reverse('profile'), self.client_user)
+        self.assertEqual([order.pk for order in response.context['tickets_history']], expected)
+        self.assertContains(response, str(ArchivedShowing.objects.select_related('movie').first()))
+
+    def test_rollups_of_archived_days_are_kept(self):
+        rebuild_rollups(self.showings[0].get_date(), self.showings[-1].get_date())
+        rollups = list(MovieDayStats.objects.values_list('movie', 'date', 'showings', 'tickets').order_by('pk'))
+
+        self.archive(1)
+
+        self.assertEqual(list(MovieDayStats.objects.values_list('movie', 'date', 'showings', 'tickets')
+                              .order_by('pk')), rollups)
+        with self.assertRaisesMessage(CommandError, 'archived'):
+            call_command('rebuild_reports', since=self.showings[0].get_date(), stdout=io.StringIO())
+
+    def test_exports_span_archive(self):
+        exports = {kind: ''.join(export(kind, 'csv', {})) for kind in ('orders', 'showings')}
+
+        self.archive(1)
+
+        self.assertTrue(ArchivedOrder.objects.exists())
+        for kind, content in exports.items():
+            self.assertEqual(''.join(export(kind, 'csv', {})), content)
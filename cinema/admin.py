@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from .models import Movie, Hall, Showing
+from .models import Genre, Movie, Hall, Showing
 
+admin.site.register(Genre)
 admin.site.register(Movie)
 admin.site.register(Hall)
 admin.site.register(Showing)
@@ -0,0 +1,207 @@
+"""Read-only JSON API for kiosks and mobile apps.
+
+Schedule and movie responses carry ETag and Last-Modified derived from the
+catalog version (see cinema.catalog), so unchanged polls get 304 Not Modified
+after a single primary key lookup, without querying showings or rendering
+anything. The catalog version does not change with orders, so these responses
+do not include free places; the showing response does, and its ETag also
+depends on the showing's seats. Availability of many showings is cached for a
+few seconds.
+"""
+
+import json
+import uuid
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_safe, require_http_methods
+
+from .catalog import get_catalog_version
+from .metrics import AVAILABILITY_API_DURATION
+from .models import Movie, Showing
+from .seats import format_seat
+from .views import get_week_showings, group_by_weekday
+
+
+def get_today():
+    """Return start of the current day. Responses list showings from the
+    beginning of the day, so they change only with the catalog and the date."""
+
+    return timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _get_catalog_version(request):
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = get_catalog_version()
+    return request._catalog_version
+
+
+def catalog_etag(request, *args, **kwargs):
+    version, _ = _get_catalog_version(request)
+    return f'{version}-{get_today().date().isoformat()}'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, modified = _get_catalog_version(request)
+    return max(modified, get_today())
+
+
+catalog_condition = condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+
+
+def showing_etag(request, pk):
+    """Return ETag of the showing changing with the catalog and its seats,
+    or None if there is no such showing. The showing is kept for the view."""
+
+    request._showing = Showing.objects.with_availability().filter(pk=pk).first()
+    if request._showing is None:
+        return None
+
+    seats = zlib.crc32(bytes(request._showing.seat_map))
+    return f'{catalog_etag(request)}-{request._showing.free_seats}-{seats:08x}'
+
+
+# Without Last-Modified, as bookings do not change the catalog's modification time.
+showing_condition = condition(etag_func=showing_etag)
+
+
+def serialize_movie(movie):
+    return {
+        'slug': movie.slug,
+        'title': movie.title,
+        'director': movie.director,
+        'year_of_production': movie.year_of_production,
+        'type': movie.type,
+        'duration_in_minutes': movie.duration_in_minutes,
+        'description': movie.description,
+        'url': movie.get_absolute_url(),
+    }
+
+
+def serialize_showing(showing, movie=True):
+    data = {
+        'uuid': str(showing.uuid),
+        'when': showing.get_datetime().isoformat(),
+        'ends_at': showing.get_end_time().isoformat(),
+        'hall': showing.hall.number,
+        'all_places': showing.all_places(),
+        'url': showing.get_absolute_url(),
+    }
+    if movie:
+        data['movie'] = {
+            'slug': showing.movie.slug,
+            'title': showing.movie.title,
+        }
+    return data
+
+
+@require_safe
+@catalog_condition
+def schedule_api_view(request):
+    schedule = group_by_weekday(get_week_showings(get_today()))
+
+    return JsonResponse({
+        'schedule': [
+            {'weekday': weekday, 'showings': [serialize_showing(showing) for showing in showings]}
+            for weekday, showings in schedule
+        ]
+    })
+
+
+@require_safe
+@catalog_condition
+def movie_api_view(request, slug):
+    movie = get_object_or_404(Movie, slug=slug)
+    showings = Showing.objects.with_availability().filter(movie=movie, when__gte=get_today()).order_by('when')
+
+    data = serialize_movie(movie)
+    data['showings'] = [serialize_showing(showing, movie=False) for showing in showings]
+    return JsonResponse(data)
+
+
+@require_safe
+@showing_condition
+def showing_api_view(request, pk):
+    showing = request._showing
+    if showing is None:
+        raise Http404('No showing matches the given query.')
+
+    data = serialize_showing(showing)
+    data['free_places'] = showing.free_places()
+    data['taken_seats'] = [format_seat(seat) for seat in showing.get_seat_map().taken_seats()]
+    return JsonResponse(data)
+
+
+@AVAILABILITY_API_DURATION.time()
+def get_availability(showing_uuids):
+    """Return dict of showing uuid -> (free places, all places) for existing
+    showings among given ones.
+
+    Recently computed values are served from the cache, the rest is read with
+    a single query from showings' seat counters joined with their halls.
+    """
+
+    keys = {f'showing-availability:{showing_uuid}': showing_uuid for showing_uuid in showing_uuids}
+    cached = cache.get_many(keys.keys())
+    availability = {keys[key]: value for key, value in cached.items()}
+
+    missing = [showing_uuid for key, showing_uuid in keys.items() if key not in cached]
+    if missing:
+        fetched = {
+            showing_uuid: (free_seats, places)
+            for showing_uuid, free_seats, places in Showing.objects.filter(pk__in=missing)
+            .order_by().values_list('uuid', 'free_seats', 'hall__places')
+        }
+        cache.set_many(
+            {f'showing-availability:{showing_uuid}': value for showing_uuid, value in fetched.items()},
+            settings.CINEMA_AVAILABILITY_CACHE_TIMEOUT
+        )
+        availability.update(fetched)
+
+    return availability
+
+
+def _parse_showing_uuids(request):
+    if request.method == 'POST':
+        values = json.loads(request.body)['showings']
+        if not isinstance(values, list):
+            raise ValueError
+    else:
+        values = [value for value in request.GET.get('showings', '').split(',') if value]
+
+    return list(dict.fromkeys(uuid.UUID(str(value)) for value in values))
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def availability_api_view(request):
+    """Return free and all places of many showings at once. Showings' uuids
+    are passed comma separated in `showings` GET parameter or as a list
+    in `showings` key of JSON body of POST request.
+    """
+
+    try:
+        showing_uuids = _parse_showing_uuids(request)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Incorrect list of showings.'}, status=400)
+
+    if len(showing_uuids) > settings.CINEMA_AVAILABILITY_MAX_SHOWINGS:
+        return JsonResponse(
+            {'error': f'At most {settings.CINEMA_AVAILABILITY_MAX_SHOWINGS} showings can be requested.'},
+            status=400
+        )
+
+    availability = get_availability(showing_uuids)
+
+    return JsonResponse({
+        'showings': {
+            str(showing_uuid): {'free_places': free_places, 'all_places': all_places}
+            for showing_uuid, (free_places, all_places) in availability.items()
+        },
+        'not_found': [str(showing_uuid) for showing_uuid in showing_uuids if showing_uuid not in availability],
+    })
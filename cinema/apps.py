@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class CinemaConfig(AppConfig):
     name = 'cinema'
+
+    def ready(self):
+        from . import signals, timing, nplusone  # noqa: F401
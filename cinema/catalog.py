@@ -0,0 +1,27 @@
+from django.db import transaction, models
+from django.db.models.functions import Now
+
+from .models import CatalogVersion
+
+
+def bump_catalog_version():
+    """Mark the catalog as changed once the current transaction commits.
+
+    The row is updated after commit (in its own short transaction), so
+    that bookings do not hold a lock on it and wait for each other.
+    """
+
+    transaction.on_commit(_bump_catalog_version)
+
+
+def _bump_catalog_version():
+    updated = CatalogVersion.objects.filter(pk=1).update(version=models.F('version') + 1, modified=Now())
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=1)
+
+
+def get_catalog_version():
+    """Return (version, modified) of the catalog, read with a single primary key lookup."""
+
+    catalog_version, _ = CatalogVersion.objects.get_or_create(pk=1)
+    return catalog_version.version, catalog_version.modified
@@ -0,0 +1,172 @@
+"""Publish/subscribe of live seat availability.
+
+Changes of free seats are published to channels of their showing
+(`showing:<uuid>`) and of the day of the showing (`day:<YYYY-MM-DD>`),
+and streamed to browsers as Server-Sent Events (see cinema.sse). The broker
+is set with CINEMA_EVENTS_BROKER setting: InProcessBroker delivers events
+published by the same process only, PostgresBroker delivers them to every
+worker using LISTEN/NOTIFY.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .seats import format_seat
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Events of channels delivered to one subscriber. Only the most recent
+    events are kept for slow subscribers, which is enough as every event
+    carries the current amount of free places."""
+
+    def __init__(self, broker, channels, max_size=100):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channels):
+        """Subscribe to channels, must be called from the event loop of the subscriber."""
+
+        subscription = Subscription(self, channels)
+        with self.lock:
+            for channel in channels:
+                self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscriptions = self.subscriptions[channel]
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[channel]
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        """Deliver message to all subscribers of channel in this process.
+        Can be called from any thread."""
+
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, message)
+
+
+class PostgresBroker(InProcessBroker):
+    """Broker delivering events to all processes with PostgreSQL NOTIFY.
+
+    Every process listens with a single connection in a background thread
+    and dispatches received events to its own subscribers.
+    """
+
+    pg_channel = 'cinema_events'
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def subscribe(self, channels):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='cinema-events-listener', daemon=True)
+                self.listener.start()
+        return super().subscribe(channels)
+
+    def publish(self, channel, message):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, json.dumps([channel, message])])
+
+    def listen(self):
+        while True:
+            try:
+                # Closed before reconnecting, so that failures do not leak connections.
+                with contextlib.closing(connection.Database.connect(**connection.get_connection_params())) \
+                        as pg_connection:
+                    pg_connection.autocommit = True
+                    with pg_connection.cursor() as cursor:
+                        cursor.execute(f'LISTEN {self.pg_channel}')
+
+                    while True:
+                        if select.select([pg_connection], [], [], 5) == ([], [], []):
+                            continue
+                        pg_connection.poll()
+                        while pg_connection.notifies:
+                            channel, message = json.loads(pg_connection.notifies.pop(0).payload)
+                            self.dispatch(channel, message)
+            except Exception:
+                logger.exception('Listening for cinema events failed, reconnecting.')
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.CINEMA_EVENTS_BROKER)()
+    return _broker
+
+
+def showing_channel(showing_uuid):
+    return f'showing:{showing_uuid}'
+
+
+def day_channel(date):
+    return f'day:{date.isoformat()}'
+
+
+def publish_seats_changed(showing, free_places, taken=(), released=()):
+    """Publish new amount of free places of showing and seats taken and
+    released by the change, once the current transaction commits."""
+
+    message = {
+        'showing': str(showing.uuid),
+        'free_places': free_places,
+        'all_places': showing.hall.places,
+        'taken': [format_seat(seat) for seat in taken],
+        'released': [format_seat(seat) for seat in released],
+    }
+
+    def publish():
+        broker = get_broker()
+        broker.publish(showing_channel(showing.uuid), message)
+        broker.publish(day_channel(showing.get_date()), message)
+
+    transaction.on_commit(publish)
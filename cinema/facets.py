@@ -0,0 +1,145 @@
+import re
+from collections import Counter
+
+from django.db import models
+from django.db.models.functions import ExtractIsoWeekDay, ExtractHour
+from django.utils import timezone
+
+WEEKDAYS = (
+    (1, 'Monday'),
+    (2, 'Tuesday'),
+    (3, 'Wednesday'),
+    (4, 'Thursday'),
+    (5, 'Friday'),
+    (6, 'Saturday'),
+    (7, 'Sunday'),
+)
+
+# (key, label, from hour, to hour)
+TIME_BANDS = (
+    ('morning', 'Morning (before 12:00)', 0, 12),
+    ('afternoon', 'Afternoon (12:00 - 17:00)', 12, 17),
+    ('evening', 'Evening (17:00 - 21:00)', 17, 21),
+    ('night', 'Night (after 21:00)', 21, 24),
+)
+
+# (GET parameter, title, annotated field)
+FACETS = (
+    ('hall', 'Hall', 'hall_id'),
+    ('genre', 'Genre', 'movie__genre__name'),
+    ('weekday', 'Day', 'facet_weekday'),
+    ('time', 'Time', 'facet_time'),
+    ('available', 'Availability', 'facet_available'),
+)
+
+
+def annotate_facets(showings):
+    """Annotate showings with values of facets that are not their fields."""
+
+    tz = timezone.get_default_timezone()
+
+    showings = showings.annotate(facet_hour=ExtractHour('when', tzinfo=tz))
+    return showings.annotate(
+        facet_weekday=ExtractIsoWeekDay('when', tzinfo=tz),
+        facet_time=models.Case(
+            *[
+                models.When(facet_hour__gte=from_hour, facet_hour__lt=to_hour, then=models.Value(key))
+                for key, _, from_hour, to_hour in TIME_BANDS
+            ],
+            output_field=models.CharField()
+        ),
+        facet_available=models.Case(
+            models.When(free_seats__gt=0, then=models.Value('1')),
+            default=models.Value('0'),
+            output_field=models.CharField()
+        ),
+    )
+
+
+# Checks of selected values of facets which are not free text, values
+# which could not be compared with their fields are ignored.
+VALID_VALUES = {
+    'hall': lambda value: re.fullmatch('[0-9]{1,9}', value) is not None,
+    'weekday': lambda value: value in {str(number) for number, _ in WEEKDAYS},
+    'time': lambda value: value in {key for key, _, _, _ in TIME_BANDS},
+    'available': lambda value: value in ('0', '1'),
+}
+
+
+def get_selected_facets(query_dict):
+    """Return dict of facet parameter -> set of selected values (as strings)."""
+
+    selected = {}
+    for parameter, _, _ in FACETS:
+        is_valid = VALID_VALUES.get(parameter, lambda value: True)
+        values = {value for value in query_dict.getlist(parameter) if is_valid(value)}
+        if values:
+            selected[parameter] = values
+    return selected
+
+
+def filter_by_facets(showings, selected):
+    for parameter, _, field in FACETS:
+        if parameter in selected:
+            showings = showings.filter(**{f'{field}__in': selected[parameter]})
+    return showings
+
+
+def count_facets(showings, selected):
+    """Count showings for every value of every facet with a single grouped query.
+
+    Showings are grouped by combination of all facets' values, then counts of
+    each facet are computed in Python taking into account values selected in
+    all the other facets (as it is usual for faceted search).
+    """
+
+    fields = [field for _, _, field in FACETS]
+    combinations = showings.order_by().values(*fields).annotate(count=models.Count('pk'))
+
+    counts = {parameter: Counter() for parameter, _, _ in FACETS}
+    for combination in combinations:
+        values = {
+            parameter: str(combination[field]) for parameter, _, field in FACETS
+        }
+        for parameter in counts:
+            # Make sure that every existing value is listed, even with 0 count.
+            counts[parameter][values[parameter]] += 0
+
+            if all(
+                values[other] in selected[other]
+                for other in selected if other != parameter
+            ):
+                counts[parameter][values[parameter]] += combination['count']
+
+    return counts
+
+
+def get_facets(showings, selected):
+    """Return list of facets for template: (parameter, title, [(value, label, count, is_selected)])."""
+
+    counts = count_facets(showings, selected)
+
+    labels = {
+        'hall': {value: f'Hall {value}' for value in counts['hall']},
+        'genre': {value: value for value in counts['genre'] if value != 'None'},
+        'weekday': {str(number): name for number, name in WEEKDAYS},
+        'time': {key: label for key, label, _, _ in TIME_BANDS},
+        'available': {'1': 'Has free seats'},
+    }
+    order = {
+        'hall': lambda value: int(value),
+        'genre': lambda value: value,
+    }
+
+    facets = []
+    for parameter, title, _ in FACETS:
+        values = labels[parameter].keys()
+        if parameter in order:
+            values = sorted(values, key=order[parameter])
+
+        facets.append((parameter, title, [
+            (value, labels[parameter][value], counts[parameter][value], value in selected.get(parameter, ()))
+            for value in values
+        ]))
+
+    return facets
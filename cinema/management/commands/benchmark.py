@@ -0,0 +1,190 @@
+import json
+import logging
+import statistics
+import subprocess
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse, URLPattern
+from django.urls.converters import IntConverter
+from django.utils import timezone
+
+from cinema.models import Movie, Hall, Showing
+from orders.models import Order
+
+URLCONFS = ('cinema.urls', 'orders.urls', 'users.urls', 'staff_panel.urls', 'reports.urls')
+
+# Views requested by a logged out user.
+ANONYMOUS_URLS = ('login', 'signup')
+
+
+def percentile(sorted_values, percent):
+    """Return value at given percentile (nearest-rank) of sorted values."""
+
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Request every page of the application with the test client and write latency ' \
+           'percentiles and query counts of each of them to a JSON report. ' \
+           'Changes made by the requests are rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Amount of requests per page.')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', help='Previous report to compare results with.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('At least one request per page is needed.')
+
+        # Timings of every request would be logged otherwise.
+        logging.getLogger('cinema.timing').setLevel(logging.WARNING)
+
+        # Allows requests to 'testserver' host.
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                samples = self.get_samples()
+                results = {
+                    name: self.measure(path, user, options['requests'])
+                    for name, path, user in self.get_urls(samples)
+                }
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'commit': self.get_commit(),
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'counts': {
+                'showings': Showing.objects.count(),
+                'orders': Order.objects.count(),
+            },
+            'urls': results,
+        }
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2)
+
+        self.print_results(results, options['compare'])
+        self.stdout.write(self.style.SUCCESS(f'Report saved to {options["output"]}.'))
+
+    def get_samples(self):
+        """Return objects used as arguments of URLs and the user making requests."""
+
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(email='benchmark@example.com', defaults={
+            'first_name': 'Benchmark', 'last_name': 'User', 'is_staff': True, 'is_cashier': True,
+        })
+
+        showing = Showing.objects.filter(when__gte=timezone.now()).order_by('when').first()
+        order = Order.objects.filter(cashier_who_accepted__isnull=True, showing__when__gte=timezone.now()).first()
+        if showing is None or order is None:
+            raise CommandError('There are no upcoming showings with orders, use generate_cinema_data first.')
+
+        return {
+            'user': user,
+            'slug': Movie.objects.filter(pk=showing.movie_id).values_list('slug', flat=True).get(),
+            'showing_uuid': showing.pk,
+            'order_uuid': order.pk,
+            'hall': Hall.objects.order_by('number').values_list('number', flat=True).first(),
+            # Exports of all showings, exports of all orders would dominate the run.
+            'kind': 'showings',
+            # Event streams are served outside of Django, under WSGI their path only answers 204.
+            'path': f'showing/{showing.pk}/',
+        }
+
+    def get_urls(self, samples):
+        """Yield (name, path, user) of every view of the application."""
+
+        for urlconf in URLCONFS:
+            for pattern in import_module(urlconf).urlpatterns:
+                if not isinstance(pattern, URLPattern) or not pattern.name:
+                    continue
+
+                kwargs = {}
+                for kwarg, converter in pattern.pattern.converters.items():
+                    if kwarg == 'pk':
+                        kwargs[kwarg] = samples['hall'] if isinstance(converter, IntConverter) \
+                            else samples['showing_uuid']
+                    elif kwarg in samples:
+                        kwargs[kwarg] = samples[kwarg]
+                    else:
+                        raise CommandError(f'There is no sample value of "{kwarg}" argument of {pattern.name} URL.')
+
+                user = None if pattern.name in ANONYMOUS_URLS else samples['user']
+                yield pattern.name, reverse(pattern.name, kwargs=kwargs), user
+
+    def measure(self, path, user, requests):
+        client = Client()
+        durations, queries, status_code = [], None, None
+
+        # The first request warms up caches and is not measured.
+        for i in range(requests + 1):
+            # Log in again after e.g logging out.
+            session_cookie = client.cookies.get(settings.SESSION_COOKIE_NAME)
+            if user is not None and not (session_cookie and session_cookie.value):
+                client.force_login(user)
+
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = client.get(path)
+                    if response.streaming:
+                        # Streamed content is produced (and queried) while being read.
+                        b''.join(response.streaming_content)
+                    duration = time.perf_counter() - start
+                # Requests like accepting an order change data, roll them back.
+                transaction.set_rollback(True)
+
+            if i > 0:
+                durations.append(duration * 1000)
+                queries = len(context.captured_queries)
+                status_code = response.status_code
+
+        durations.sort()
+        return {
+            'path': path,
+            'status': status_code,
+            'queries': queries,
+            'mean_ms': round(statistics.mean(durations), 3),
+            'p50_ms': round(percentile(durations, 50), 3),
+            'p90_ms': round(percentile(durations, 90), 3),
+            'p99_ms': round(percentile(durations, 99), 3),
+            'max_ms': round(durations[-1], 3),
+        }
+
+    def print_results(self, results, compare_path):
+        previous = {}
+        if compare_path:
+            with open(compare_path) as file:
+                previous = json.load(file)['urls']
+
+        for name, result in results.items():
+            line = f'{name:<24} {result["status"]} {result["queries"]:>4} queries ' \
+                   f'p50 {result["p50_ms"]:>9.2f} ms  p90 {result["p90_ms"]:>9.2f} ms  p99 {result["p99_ms"]:>9.2f} ms'
+
+            if name in previous:
+                before = previous[name]
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                line += f'  (p50 {change:+.1f}%, queries {result["queries"] - before["queries"]:+d})'
+
+            self.stdout.write(line)
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
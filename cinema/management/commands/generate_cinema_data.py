@@ -0,0 +1,237 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from cinema.catalog import bump_catalog_version
+from cinema.models import Genre, Movie, Hall, Showing
+from cinema.scheduling import is_between_open_hours
+from cinema.seats import SeatMap
+from orders.models import Order
+
+ADJECTIVES = (
+    'Silent', 'Lost', 'Dark', 'Golden', 'Broken', 'Hidden', 'Last', 'Crimson', 'Frozen', 'Wild',
+    'Eternal', 'Burning', 'Secret', 'Distant', 'Electric', 'Forgotten', 'Midnight', 'Iron', 'Hollow', 'Brave',
+)
+NOUNS = (
+    'River', 'Empire', 'Garden', 'Horizon', 'City', 'Storm', 'Kingdom', 'Shadow', 'Voyage', 'Island',
+    'Promise', 'Frontier', 'Machine', 'Orchestra', 'Harbour', 'Summer', 'Planet', 'Witness', 'Legacy', 'Signal',
+)
+FIRST_NAMES = ('Anna', 'Jan', 'Maria', 'Piotr', 'Kasia', 'Tomasz', 'Ewa', 'Marek', 'Zofia', 'Adam', 'Olga', 'Leon')
+LAST_NAMES = ('Nowak', 'Kowalski', 'Wiśniewska', 'Lewandowski', 'Zielińska', 'Mazur', 'Krawczyk', 'Wójcik')
+GENRES = ('Drama', 'Comedy', 'Action', 'Thriller', 'Horror', 'Animation', 'Documentary', 'Sci-Fi', 'Romance')
+
+# Amount of tickets in an order and how often it is ordered.
+TICKETS_AMOUNT_WEIGHTS = {1: 25, 2: 40, 3: 12, 4: 13, 5: 6, 6: 4}
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic data of a cinema: halls, movies, non-colliding showings of given ' \
+           'amount of days and orders of customers, all inserted in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--halls', type=int, default=10)
+        parser.add_argument('--movies', type=int, default=200)
+        parser.add_argument('--days', type=int, default=365, help='Amount of days with showings.')
+        parser.add_argument('--past-days', type=int, default=180,
+                            help='Amount of days with showings before today.')
+        parser.add_argument('--customers', type=int, default=2000)
+        parser.add_argument('--cashiers', type=int, default=5)
+        parser.add_argument('--orders', type=int, default=1000000,
+                            help='Approximate amount of orders, limited by places in halls.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['halls'] < 1 or options['movies'] < 1 or options['days'] < 1 or options['customers'] < 1:
+            raise CommandError('At least one hall, movie, day and customer is needed.')
+
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        with transaction.atomic():
+            halls = self.create_halls(options['halls'])
+            movies = self.create_movies(options['movies'])
+            customers = self.create_users('customer', options['customers'], is_cashier=False)
+            cashiers = self.create_users('cashier', max(options['cashiers'], 1), is_cashier=True)
+
+            first_day = timezone.localtime(timezone.now()).date() - timezone.timedelta(days=options['past_days'])
+            # Every hall has about 6.5 showings a day.
+            showings_per_day = len(halls) * 6.5
+            orders_per_showing = options['orders'] / (options['days'] * showings_per_day)
+
+            showings_count, orders_count, last_when = 0, 0, None
+            for day in range(options['days']):
+                date = first_day + timezone.timedelta(days=day)
+                showings, orders = self.generate_day(date, halls, movies, customers, cashiers, orders_per_showing)
+
+                Showing.objects.bulk_create(showings, batch_size=self.batch_size)
+                Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                showings_count += len(showings)
+                orders_count += len(orders)
+                if showings:
+                    # Days are generated in order.
+                    last_when = max(showing.when for showing in showings)
+
+                if (day + 1) % 30 == 0:
+                    self.stdout.write(f'{day + 1} days: {showings_count} showings, {orders_count} orders')
+
+            bump_catalog_version()
+
+        # Planner statistics of the bulk inserted tables are stale until autovacuum
+        # gets to them, and rebuilding rollups with them would join orders to
+        # showings with nested loops.
+        with connection.cursor() as cursor:
+            for model in (Showing, Order):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+        # Orders inserted in bulk are not recorded in report rollups. Showings
+        # after midnight belong to the day after the last generated one.
+        if last_when is not None:
+            last_day = timezone.localtime(last_when).date()
+            call_command('rebuild_reports', since=first_day, until=last_day, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(halls)} halls, {len(movies)} movies, {len(customers)} customers, '
+            f'{showings_count} showings and {orders_count} orders.'
+        ))
+
+    def create_halls(self, amount):
+        halls = []
+        for _ in range(amount):
+            rows = self.random.randint(8, 20)
+            seats_in_row = self.random.randint(10, min(40, 400 // rows))
+            halls.append(Hall(rows=rows, seats_in_row=seats_in_row, places=rows * seats_in_row))
+
+        Hall.objects.bulk_create(halls)
+        # Primary keys are not returned by bulk_create on all databases.
+        return list(Hall.objects.order_by('-number')[:amount])
+
+    def create_movies(self, amount):
+        genres = {}
+        for name in GENRES:
+            genres[name] = Genre.objects.filter(name__iexact=name).first() or Genre.objects.create(name=name)
+
+        existing_slugs = set(Movie.objects.values_list('slug', flat=True))
+        movies = []
+        while len(movies) < amount:
+            title = f'The {self.random.choice(ADJECTIVES)} {self.random.choice(NOUNS)}'
+            if slugify(title) in existing_slugs:
+                title = f'{title} {len(existing_slugs) + 1}'
+            if slugify(title) in existing_slugs:
+                continue
+            existing_slugs.add(slugify(title))
+
+            genre = self.random.choice(GENRES)
+            movies.append(Movie(
+                title=title,
+                slug=slugify(title),
+                director=f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}',
+                year_of_production=self.random.randint(1950, timezone.now().year),
+                type=genre,
+                genre=genres[genre],
+                duration_in_minutes=self.random.randint(80, 180),
+                description=f'{genre} about {title.lower()}.',
+            ))
+
+        Movie.objects.bulk_create(movies, batch_size=self.batch_size)
+        movies = list(Movie.objects.filter(slug__in=[movie.slug for movie in movies]))
+
+        # A few movies are much more popular than the rest: they have more showings
+        # and more orders per showing. Demand of an average showing is 1.
+        popularities = [self.random.paretovariate(1.5) for _ in movies]
+        mean_demand = sum(popularity ** 2 for popularity in popularities) / sum(popularities)
+        for movie, popularity in zip(movies, popularities):
+            movie.popularity = popularity
+            movie.demand = popularity / mean_demand
+        return movies
+
+    def create_users(self, kind, amount, is_cashier):
+        User = get_user_model()
+        password = make_password(None)
+        emails = [f'{kind}{i}@example.com' for i in range(amount)]
+
+        User.objects.bulk_create([
+            User(email=email, password=password, first_name=kind.capitalize(), last_name=str(i),
+                 is_cashier=is_cashier)
+            for i, email in enumerate(emails)
+        ], batch_size=self.batch_size, ignore_conflicts=True)
+
+        return list(User.objects.filter(email__in=emails))
+
+    def generate_day(self, date, halls, movies, customers, cashiers, orders_per_showing):
+        """Return showings of all halls for the day and their orders. Showings follow
+        each other with short breaks, every order takes next free seats of its showing."""
+
+        now = timezone.now()
+        weights = [movie.popularity for movie in movies]
+        # More orders on weekends.
+        demand = orders_per_showing * (1.5 if date.weekday() >= 4 else 0.8)
+
+        showings, orders = [], []
+        for hall in halls:
+            opening = timezone.datetime.combine(date, timezone.datetime.min.time()).replace(
+                hour=10, minute=self.random.choice((0, 15, 30))
+            )
+            when = timezone.make_aware(opening)
+
+            while True:
+                movie = self.random.choices(movies, weights)[0]
+                ends_at = when + timezone.timedelta(minutes=movie.duration_in_minutes)
+                if not is_between_open_hours(when, ends_at):
+                    break
+
+                showing = Showing(when=when, ends_at=ends_at, movie=movie, hall=hall)
+                orders.extend(self.generate_orders(showing, demand * movie.demand, customers, cashiers,
+                                                   is_past=when < now))
+                showings.append(showing)
+
+                # Break for cleaning, rounded up to 5 minutes.
+                break_minutes = 15 + self.random.randint(0, 15) + (5 - ends_at.minute % 5) % 5
+                when = ends_at + timezone.timedelta(minutes=break_minutes)
+
+        return showings, orders
+
+    def generate_orders(self, showing, demand, customers, cashiers, is_past):
+        hall = showing.hall
+        seats = [(row, number) for row in range(1, hall.rows + 1) for number in range(1, hall.seats_in_row + 1)]
+        seat_map = SeatMap(hall.rows, hall.seats_in_row)
+        taken = 0
+
+        orders = []
+        for _ in range(max(0, round(self.random.gauss(demand, demand / 3)))):
+            tickets_amount = self.random.choices(
+                list(TICKETS_AMOUNT_WEIGHTS), list(TICKETS_AMOUNT_WEIGHTS.values())
+            )[0]
+            if taken + tickets_amount > hall.places:
+                break
+
+            # Past showings' orders were all finalized, most of the future ones are pending.
+            status = self.random.random()
+            if is_past:
+                accepted, cashier = status < 0.92, self.random.choice(cashiers)
+            else:
+                accepted, cashier = status < 0.25, self.random.choice(cashiers) if status < 0.3 else None
+            rejected = cashier is not None and not accepted
+
+            order_seats = SeatMap(hall.rows, hall.seats_in_row)
+            order_seats.take(seats[taken:taken + tickets_amount])
+            if not rejected:
+                # Seats of rejected orders were released and are taken by next orders.
+                seat_map.take(seats[taken:taken + tickets_amount])
+                taken += tickets_amount
+
+            orders.append(Order(
+                showing=showing, client=self.random.choice(customers), tickets_amount=tickets_amount,
+                accepted=accepted, cashier_who_accepted=cashier, seats=order_seats.to_bytes()
+            ))
+
+        showing.taken_seats = taken
+        showing.free_seats = hall.places - taken
+        showing.seat_map = seat_map.to_bytes()
+        return orders
@@ -0,0 +1,160 @@
+import csv
+import json
+from collections import defaultdict
+
+import pytz
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cinema.catalog import bump_catalog_version
+from cinema.models import Movie, Hall, Showing
+from cinema.scheduling import is_between_open_hours, find_overlaps
+from reports.rollups import record_showings_created
+
+
+class Command(BaseCommand):
+    help = 'Import showings from a CSV or JSONL file with "movie" (slug or id), "hall" (number) ' \
+           'and "when" (e.g 24/12/2021 18:30 or ISO 8601) columns. A movie is looked up by its slug first ' \
+           'and by its id only if no movie has such slug. Either all showings are imported or none of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='Format of the file, by default inferred from its extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file.')
+
+    def read_rows(self, path, file_format):
+        with open(path, newline='') as file:
+            if file_format == 'csv':
+                yield from enumerate(csv.DictReader(file), start=2)
+            else:
+                for line_number, line in enumerate(file, start=1):
+                    if line.strip():
+                        yield line_number, json.loads(line)
+
+    @staticmethod
+    def parse_when(value):
+        try:
+            when = timezone.datetime.fromisoformat(value)
+        except ValueError:
+            when = timezone.datetime.strptime(value, '%d/%m/%Y %H:%M')
+
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        return when
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        try:
+            rows = list(self.read_rows(path, file_format))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+        errors = [f'Line {line_number}: expected an object, got {row!r}.'
+                  for line_number, row in rows if not isinstance(row, dict)]
+        rows = [(line_number, row) for line_number, row in rows if isinstance(row, dict)]
+        movie_keys = {str(row.get('movie', '')).strip() for _, row in rows}
+        hall_numbers = {str(row.get('hall', '')).strip() for _, row in rows}
+
+        # Load all referenced movies and halls with one query each. Slugs may
+        # consist of digits only (e.g "1917"), so they take precedence over ids.
+        movies_by_slug, movies_by_pk = {}, {}
+        movie_ids = [key for key in movie_keys if key.isdigit()]
+        for movie in Movie.objects.filter(Q(slug__in=movie_keys) | Q(pk__in=movie_ids)):
+            movies_by_slug[movie.slug] = movie
+            movies_by_pk[str(movie.pk)] = movie
+        halls = Hall.objects.in_bulk([number for number in hall_numbers if number.isdigit()])
+
+        showings = []
+        for line_number, row in rows:
+            movie_key = str(row.get('movie', '')).strip()
+            movie = movies_by_slug.get(movie_key) or movies_by_pk.get(movie_key)
+            hall = halls.get(int(row['hall'])) if str(row.get('hall', '')).strip().isdigit() else None
+
+            if movie is None:
+                errors.append(f'Line {line_number}: unknown movie {row.get("movie")!r}.')
+                continue
+            if hall is None:
+                errors.append(f'Line {line_number}: unknown hall {row.get("hall")!r}.')
+                continue
+
+            try:
+                when = self.parse_when(str(row.get('when', '')).strip())
+            except ValueError:
+                errors.append(f'Line {line_number}: incorrect date {row.get("when")!r}.')
+                continue
+            except pytz.InvalidTimeError:
+                # Naive time skipped or repeated when clocks are changed.
+                errors.append(f'Line {line_number}: date {row.get("when")!r} does not exist '
+                              f'or is ambiguous in local time.')
+                continue
+
+            showing = Showing(when=when, movie=movie, hall=hall, free_seats=hall.places,
+                              ends_at=when + timezone.timedelta(minutes=movie.duration_in_minutes))
+
+            if not (1888 <= when.year <= 3000):
+                errors.append(f'Line {line_number}: provided incorrect year.')
+            elif not is_between_open_hours(showing.get_datetime(), showing.get_end_time()):
+                errors.append(f'Line {line_number}: {showing} collides with cinema open hours.')
+            else:
+                showings.append((line_number, showing))
+
+        if showings:
+            errors.extend(self.find_collisions(showings))
+
+        if errors:
+            for error in errors:
+                self.stderr.write(error)
+            raise CommandError(f'Found {len(errors)} error(s), nothing was imported.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{len(showings)} showing(s) can be imported.'))
+            return
+
+        with transaction.atomic():
+            Showing.objects.bulk_create([showing for _, showing in showings],
+                                        batch_size=options['batch_size'])
+            bump_catalog_version()
+            record_showings_created([showing for _, showing in showings])
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(showings)} showing(s).'))
+
+    @staticmethod
+    def find_collisions(showings):
+        """Check showings for collisions with each other and with existing
+        showings, which are loaded with a single query.
+        """
+
+        intervals = defaultdict(list)
+        for line_number, showing in showings:
+            intervals[showing.hall_id].append((showing.when, showing.ends_at, (line_number, showing)))
+
+        existing_showings = Showing.objects.filter(
+            hall__in=intervals.keys(),
+            when__lt=max(showing.ends_at for _, showing in showings),
+            ends_at__gt=min(showing.when for _, showing in showings)
+        ).select_related('movie')
+        for showing in existing_showings:
+            intervals[showing.hall_id].append((showing.when, showing.ends_at, (None, showing)))
+
+        errors = []
+        for hall_intervals in intervals.values():
+            for first, second in find_overlaps(hall_intervals):
+                if first[0] is None:
+                    first, second = second, first
+                (line_number, showing), (other_line_number, other_showing) = first, second
+
+                if line_number is None:
+                    # Both showings already exist.
+                    continue
+
+                other = f'line {other_line_number}' if other_line_number else 'existing showing'
+                errors.append(f'Line {line_number}: {showing} in {showing.hall} collides with {other} '
+                              f'({other_showing}).')
+
+        return errors
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from cinema.models import Showing
+from cinema.seats import SeatMap
+
+
+class Command(BaseCommand):
+    help = "Recompute showings' seat counters and seat maps from their orders and fix the ones that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report showings with incorrect counters.')
+
+    @staticmethod
+    def count_seat_map(showing):
+        seat_map = SeatMap(showing.hall.rows, showing.hall.seats_in_row)
+        orders = showing.order_set.exclude(accepted=False, cashier_who_accepted__isnull=False)
+
+        for seats in orders.values_list('seats', flat=True):
+            seat_map.merge(seats)
+
+        return seat_map.to_bytes()
+
+    def handle(self, *args, **options):
+        fixed = 0
+
+        with transaction.atomic():
+            drifted = Showing.objects.select_for_update(of=('self',)).select_related('hall') \
+                .with_counted_taken_seats() \
+                .exclude(taken_seats=models.F('counted_taken_seats'),
+                         free_seats=models.F('hall__places') - models.F('counted_taken_seats'))
+
+            for showing in drifted:
+                self.stdout.write(
+                    f'{showing.uuid}: taken {showing.taken_seats} -> {showing.counted_taken_seats}, '
+                    f'free {showing.free_seats} -> {showing.hall.places - showing.counted_taken_seats}'
+                )
+
+                if not options['dry_run']:
+                    Showing.objects.filter(pk=showing.pk).update(
+                        taken_seats=showing.counted_taken_seats,
+                        free_seats=showing.hall.places - showing.counted_taken_seats,
+                        seat_map=self.count_seat_map(showing)
+                    )
+                fixed += 1
+
+        action = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{action} {fixed} showing(s) with drifted seat counters.'))
@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.db import models
+from django.db.models.functions import Coalesce, TruncDate, TruncTime, ExtractIsoWeekDay
+from django.utils import timezone
+
+
+class ShowingQuerySet(models.QuerySet):
+    def with_availability(self):
+        """Join movie and hall, so that listing pages do not need
+        additional queries per showing to display its availability.
+        """
+
+        return self.select_related('movie', 'hall').with_local_times()
+
+    def with_local_times(self):
+        """Annotate local date, start time, weekday and end time computed by
+        the database, used by Showing's time helpers instead of converting
+        `when` and `ends_at` to the local timezone for every showing.
+        """
+
+        # Django 3.1 casts dates and times in the current timezone regardless
+        # of tzinfo, which is the default one as no other is ever activated.
+        tz = timezone.get_default_timezone()
+
+        return self.annotate(
+            local_date=TruncDate('when', tzinfo=tz),
+            local_time=TruncTime('when', tzinfo=tz),
+            local_weekday=ExtractIsoWeekDay('when', tzinfo=tz),
+            local_end_time=TruncTime('ends_at', tzinfo=tz),
+        )
+
+    def available(self):
+        return self.filter(free_seats__gt=0)
+
+    def sold_out(self):
+        return self.filter(free_seats__lte=0)
+
+    def with_counted_taken_seats(self):
+        """Annotate every showing with the amount of taken places
+        aggregated from its orders (rejected orders excluded).
+        """
+
+        Order = apps.get_model('orders', 'Order')
+
+        taken_seats = Order.objects.filter(
+            showing=models.OuterRef('pk')
+        ).exclude(
+            accepted=False, cashier_who_accepted__isnull=False
+        ).order_by().values('showing').annotate(
+            taken=models.Sum('tickets_amount')
+        ).values('taken')
+
+        return self.annotate(
+            counted_taken_seats=Coalesce(
+                models.Subquery(taken_seats, output_field=models.IntegerField()), 0
+            )
+        )
@@ -0,0 +1,90 @@
+"""Metrics of the booking pipeline exposed in Prometheus format at /metrics.
+
+Metrics are recorded with prometheus_client: recording is an in-memory
+update guarded by an uncontended per-value lock, cheap enough for hot paths.
+When the application runs in many worker processes,
+PROMETHEUS_MULTIPROC_DIR environment variable must point to an empty
+directory shared by the workers. Every process then keeps its values in its
+own memory-mapped files there, which metrics_view aggregates when scraped.
+"""
+
+import asyncio
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.utils.deprecation import MiddlewareMixin
+from django.views.decorators.http import require_GET
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+ORDERS_CREATED = Counter('cinema_orders_created_total', 'Orders created.')
+ORDERS_REJECTED_FOR_LACK_OF_SEATS = Counter(
+    'cinema_orders_rejected_for_lack_of_seats_total',
+    'Bookings rejected because there were not enough free places or picked seats were taken.'
+)
+ORDERS_FINALIZED = Counter('cinema_orders_finalized_total', 'Orders accepted or rejected by cashiers.', ['result'])
+BOOKING_DURATION = Histogram('cinema_booking_duration_seconds', 'Time of booking tickets.')
+AVAILABILITY_API_DURATION = Histogram(
+    'cinema_availability_api_duration_seconds', 'Time of getting free places of showings for the availability API.',
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+)
+VIEW_DURATION = Histogram('cinema_view_duration_seconds', 'Time of requests by view.', ['view', 'method'])
+
+# Any other method is labelled 'other', so that clients cannot add labels at will.
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Measures time of every request, should be placed first."""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, start)
+        return response
+
+    @staticmethod
+    def observe(request, start):
+        match = request.resolver_match
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        VIEW_DURATION.labels(match.view_name if match else 'unresolved', method).observe(
+            time.perf_counter() - start
+        )
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@require_GET
+def metrics_view(request):
+    """Return metrics of all workers. If CINEMA_METRICS_TOKEN is set, it has to
+    be passed in `Authorization: Bearer <token>` header, otherwise metrics are
+    shown only to staff members."""
+
+    token = settings.CINEMA_METRICS_TOKEN
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponseForbidden()
+    elif not request.user.is_staff:
+        return HttpResponseForbidden()
+
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
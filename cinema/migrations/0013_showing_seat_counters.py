@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_seat_counters(apps, schema_editor):
+    Showing = apps.get_model('cinema', 'Showing')
+    Hall = apps.get_model('cinema', 'Hall')
+    Order = apps.get_model('orders', 'Order')
+
+    taken_seats = Order.objects.filter(
+        showing=models.OuterRef('pk')
+    ).exclude(
+        accepted=False, cashier_who_accepted__isnull=False
+    ).order_by().values('showing').annotate(
+        taken=models.Sum('tickets_amount')
+    ).values('taken')
+
+    hall_places = models.Subquery(Hall.objects.filter(pk=models.OuterRef('hall')).values('places'))
+    counted = Coalesce(models.Subquery(taken_seats, output_field=models.IntegerField()), 0)
+    # A single UPDATE of all showings.
+    Showing.objects.update(taken_seats=counted, free_seats=hall_places - counted)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0012_auto_20210113_1535'),
+        ('orders', '0005_auto_20210109_2001'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showing',
+            name='free_seats',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='showing',
+            name='taken_seats',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_seat_counters, migrations.RunPython.noop),
+    ]
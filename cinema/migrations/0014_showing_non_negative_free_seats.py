@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0013_showing_seat_counters'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='showing',
+            constraint=models.CheckConstraint(check=models.Q(('free_seats__gte', 0)), name='non_negative_free_seats'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+import math
+
+import cinema.validators
+from django.db import migrations, models
+
+
+def fill_hall_layouts(apps, schema_editor):
+    Hall = apps.get_model('cinema', 'Hall')
+
+    for hall in Hall.objects.all():
+        # Pick the most square-like layout with the same amount of places,
+        # within limits of validate_correct_no_rows and validate_correct_no_seats_in_row.
+        layouts = [
+            (rows, hall.places // rows) for rows in range(1, 41)
+            if hall.places % rows == 0 and 1 <= hall.places // rows <= 40
+        ]
+        if layouts:
+            rows, seats_in_row = min(layouts, key=lambda layout: abs(layout[0] - layout[1]))
+        else:
+            # E.g. a prime amount of places above 40 cannot be split into rows of at most 40 seats.
+            # The last row gets a few more seats than the hall has places, SeatMap.for_showing
+            # marks them as taken, so that the hall keeps its amount of places.
+            rows = max(1, math.ceil(hall.places / 40))
+            seats_in_row = max(1, math.ceil(hall.places / rows))
+
+        Hall.objects.filter(pk=hall.pk).update(rows=rows, seats_in_row=seats_in_row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0014_showing_non_negative_free_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='rows',
+            field=models.IntegerField(default=1, validators=[cinema.validators.validate_correct_no_rows], verbose_name='amount of rows'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='hall',
+            name='seats_in_row',
+            field=models.IntegerField(default=1, validators=[cinema.validators.validate_correct_no_seats_in_row], verbose_name='amount of seats in a row'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='hall',
+            name='places',
+            field=models.IntegerField(editable=False, validators=[cinema.validators.validate_correct_no_places], verbose_name='amount of places'),
+        ),
+        migrations.AddField(
+            model_name='showing',
+            name='seat_map',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(fill_hall_layouts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+import datetime
+
+from django.db import migrations, models
+
+
+def fill_end_times(apps, schema_editor):
+    Movie = apps.get_model('cinema', 'Movie')
+    Showing = apps.get_model('cinema', 'Showing')
+
+    for movie in Movie.objects.all():
+        Showing.objects.filter(movie=movie).update(ends_at=models.ExpressionWrapper(
+            models.F('when') + datetime.timedelta(minutes=movie.duration_in_minutes),
+            output_field=models.DateTimeField()
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0015_hall_layout_and_showing_seat_map'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showing',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_end_times, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        'ALTER TABLE cinema_showing ADD CONSTRAINT showing_no_overlap_in_hall '
+        'EXCLUDE USING gist (hall_id WITH =, tstzrange("when", ends_at, \'[)\') WITH &&)'
+    )
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('ALTER TABLE cinema_showing DROP CONSTRAINT IF EXISTS showing_no_overlap_in_hall')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0016_showing_ends_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='showing',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='showing',
+            index=models.Index(fields=['hall', 'when'], name='showing_hall_when_idx'),
+        ),
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
@@ -0,0 +1,60 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute('''
+        CREATE OR REPLACE FUNCTION cinema_movie_search_vector_update() RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.director, '')), 'B') ||
+                setweight(to_tsvector('pg_catalog.simple', coalesce(NEW.description, '')), 'C');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    ''')
+    schema_editor.execute('''
+        CREATE TRIGGER cinema_movie_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF title, director, description
+            ON cinema_movie
+            FOR EACH ROW
+        EXECUTE PROCEDURE cinema_movie_search_vector_update()
+    ''')
+    # Fill search vectors of existing movies.
+    schema_editor.execute('UPDATE cinema_movie SET title = title')
+
+    schema_editor.execute('CREATE INDEX movie_search_vector_idx ON cinema_movie USING gin (search_vector)')
+    schema_editor.execute('CREATE INDEX movie_title_trgm_idx ON cinema_movie USING gin (title gin_trgm_ops)')
+    schema_editor.execute('CREATE INDEX movie_director_trgm_idx ON cinema_movie USING gin (director gin_trgm_ops)')
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS movie_director_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS movie_title_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS movie_search_vector_idx')
+    schema_editor.execute('DROP TRIGGER IF EXISTS cinema_movie_search_vector_trigger ON cinema_movie')
+    schema_editor.execute('DROP FUNCTION IF EXISTS cinema_movie_search_vector_update()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0017_showing_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
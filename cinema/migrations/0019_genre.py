@@ -0,0 +1,42 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_genres(apps, schema_editor):
+    Genre = apps.get_model('cinema', 'Genre')
+    Movie = apps.get_model('cinema', 'Movie')
+
+    genres = {}
+    for movie_type in Movie.objects.values_list('type', flat=True).distinct():
+        movie_type = movie_type.strip()
+        if movie_type.lower() not in genres:
+            genres[movie_type.lower()] = Genre.objects.create(name=movie_type)
+
+    for movie in Movie.objects.only('type'):
+        Movie.objects.filter(pk=movie.pk).update(genre=genres[movie.type.strip().lower()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0018_movie_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=80, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='genre',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='cinema.genre'),
+        ),
+        migrations.RunPython(fill_genres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0020_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='showing',
+            index=models.Index(fields=['when'], name='showing_when_idx'),
+        ),
+    ]
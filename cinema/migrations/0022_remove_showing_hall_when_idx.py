@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0021_showing_when_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='showing',
+            name='showing_hall_when_idx',
+        ),
+    ]
@@ -1,17 +1,32 @@
 import uuid
 
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
 from django.core.exceptions import ValidationError
-from django.conf import settings
 
 from .validators import (
     validate_correct_year_of_production,
     validate_correct_duration,
-    validate_correct_no_places
+    validate_correct_no_places,
+    validate_correct_no_rows,
+    validate_correct_no_seats_in_row
 )
+from .managers import ShowingQuerySet
+from .seats import SeatMap
+from .scheduling import is_between_open_hours
+
+
+class Genre(models.Model):
+    name = models.CharField(max_length=80, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
 
 
 class Movie(models.Model):
@@ -24,10 +39,14 @@ class Movie(models.Model):
         validators=[validate_correct_year_of_production]
     )
     type = models.CharField(max_length=80)
+    # Normalized `type`, set on save.
+    genre = models.ForeignKey(Genre, on_delete=models.PROTECT, null=True, editable=False)
     duration_in_minutes = models.IntegerField(
         verbose_name='duration in minutes',
         validators=[validate_correct_duration])
     description = models.TextField()
+    # Maintained by a database trigger on PostgreSQL (see cinema.search).
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         constraints = [
@@ -42,9 +61,72 @@ class Movie(models.Model):
         ]
         ordering = ['year_of_production']
 
+    def get_saved_duration(self):
+        """Return duration of the movie stored in the database."""
+
+        return Movie.objects.filter(pk=self.pk).values_list('duration_in_minutes', flat=True).first()
+
+    def get_new_end(self):
+        """Return expression of end times of movie's showings with current duration."""
+
+        return models.ExpressionWrapper(
+            models.F('when') + timezone.timedelta(minutes=self.duration_in_minutes),
+            output_field=models.DateTimeField()
+        )
+
+    def clean(self):
+        if self._state.adding or self.duration_in_minutes is None:
+            return
+        if self.duration_in_minutes != self.get_saved_duration():
+            self.check_showings_with_duration()
+
+    def check_showings_with_duration(self):
+        """Check whether movie's showings with changed duration are
+        between open hours and do not collide with other showings."""
+
+        # Check whether changed duration keeps all of movie's showings between open hours.
+        duration = timezone.timedelta(minutes=self.duration_in_minutes)
+        for showing in self.showing_set.only('when').order_by('when'):
+            if not is_between_open_hours(showing.get_datetime(), showing.get_datetime() + duration):
+                showing.movie = self
+                raise ValidationError(
+                    'With duration %(value)s minutes %(showing)s would collide with cinema open hours',
+                    params={'value': self.duration_in_minutes, 'showing': str(showing)}
+                )
+
+        # Check whether changed duration does not make any of movie's showings collide.
+        new_end = self.get_new_end()
+        colliding_showings = Showing.objects.filter(
+            hall=models.OuterRef('hall'),
+            when__gt=models.OuterRef('when'),
+            when__lt=models.OuterRef('new_end')
+        )
+        colliding_showing = self.showing_set.annotate(new_end=new_end).filter(
+            models.Exists(colliding_showings)
+        ).select_related('movie').first()
+
+        if colliding_showing:
+            raise ValidationError(
+                'With duration %(value)s minutes %(showing)s would collide with other showing',
+                params={'value': self.duration_in_minutes, 'showing': str(colliding_showing)}
+            )
+
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
-        super(Movie, self).save(*args, **kwargs)
+        self.type = self.type.strip()
+        adding = self._state.adding
+
+        with transaction.atomic():
+            duration_changed = not adding and self.duration_in_minutes != self.get_saved_duration()
+            if duration_changed:
+                self.check_showings_with_duration()
+            self.genre = Genre.objects.filter(name__iexact=self.type).first() or \
+                Genre.objects.create(name=self.type)
+            super(Movie, self).save(*args, **kwargs)
+
+            if duration_changed:
+                # Keep showings' end times in sync.
+                self.showing_set.update(ends_at=self.get_new_end())
 
     def get_absolute_url(self):
         return reverse('movie-detail-view', args=(self.slug,))
@@ -55,9 +137,18 @@ class Movie(models.Model):
 
 class Hall(models.Model):
     number = models.AutoField(primary_key=True)
+    rows = models.IntegerField(
+        verbose_name='amount of rows',
+        validators=[validate_correct_no_rows]
+    )
+    seats_in_row = models.IntegerField(
+        verbose_name='amount of seats in a row',
+        validators=[validate_correct_no_seats_in_row]
+    )
     places = models.IntegerField(
         verbose_name='amount of places',
-        validators=[validate_correct_no_places]
+        validators=[validate_correct_no_places],
+        editable=False
     )
 
     class Meta:
@@ -68,6 +159,28 @@ class Hall(models.Model):
             ),
         ]
 
+    def clean(self):
+        if self.rows is None or self.seats_in_row is None:
+            return
+
+        self.places = self.rows * self.seats_in_row
+        validate_correct_no_places(self.places)
+
+        if not self._state.adding:
+            old_layout = Hall.objects.values_list('rows', 'seats_in_row').get(pk=self.pk)
+            if old_layout != (self.rows, self.seats_in_row) and \
+                    self.showing_set.filter(taken_seats__gt=0).exists():
+                raise ValidationError('Cannot change layout of a hall with booked seats.')
+
+    def save(self, *args, **kwargs):
+        self.places = self.rows * self.seats_in_row
+        adding = self._state.adding
+        super(Hall, self).save(*args, **kwargs)
+
+        if not adding:
+            # Amount of places might have changed, keep showings' free seats in sync.
+            self.showing_set.update(free_seats=self.places - models.F('taken_seats'))
+
     def __str__(self):
         return f'Hall number {self.number} ({self.places} places)'
 
@@ -77,37 +190,53 @@ class Showing(models.Model):
     when = models.DateTimeField(null=False, blank=False)
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     hall = models.ForeignKey(Hall, on_delete=models.CASCADE)
+    # Seat counters maintained by the order lifecycle (see orders.services).
+    taken_seats = models.IntegerField(default=0, editable=False)
+    free_seats = models.IntegerField(default=0, editable=False)
+    # Bitmap of taken seats (see cinema.seats.SeatMap).
+    seat_map = models.BinaryField(default=bytes, editable=False)
+    # Computed from movie's duration, on PostgreSQL an exclusion constraint
+    # guarantees that showings in the same hall do not overlap.
+    ends_at = models.DateTimeField(editable=False, blank=True)
+
+    objects = ShowingQuerySet.as_manager()
 
     class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(free_seats__gte=0),
+                name='non_negative_free_seats'
+            ),
+        ]
+        indexes = [
+            # Schedule and listings select ranges of days of all halls, collision
+            # checks a bounded range of start times (see get_colliding_showings).
+            models.Index(fields=['when'], name='showing_when_idx'),
+        ]
         ordering = ['when']
 
+    def get_colliding_showings(self):
+        # No showing lasts longer than 600 minutes (see validate_correct_duration),
+        # so the range of start times to look at is bounded and can use `when` index.
+        return Showing.objects.filter(
+            hall=self.hall,
+            when__gt=self.when - timezone.timedelta(minutes=600),
+            when__lt=self.ends_at,
+            ends_at__gt=self.when
+        ).exclude(pk=self.pk)
+
     def check_is_not_colliding(self):
         """Check whether there are not any collisions with
         current showing.
         """
 
-        day_before = self.get_datetime() - timezone.timedelta(days=1)
-        day_after = self.get_datetime() + timezone.timedelta(days=1)
-
-        showings_that_might_collide = Showing.objects.filter(
-            when__gte=day_before, when__lte=day_after, hall=self.hall
-        )
-
-        new_start_time = self.get_datetime()
-        new_end_time = self.get_end_time()
+        colliding_showing = self.get_colliding_showings().select_related('movie').first()
 
-        for showing in showings_that_might_collide:
-            existing_start_time = showing.get_datetime()
-            existing_end_time = showing.get_end_time()
-
-            if existing_start_time < new_start_time < existing_end_time or \
-                    existing_start_time < new_end_time < existing_end_time or \
-                    (new_start_time < existing_start_time and new_end_time > existing_end_time):
-                colliding_showing = str(showing)
-                raise ValidationError(
-                    '%(value)s collides with showing that is to be added',
-                    params={'value': colliding_showing}
-                )
+        if colliding_showing:
+            raise ValidationError(
+                '%(value)s collides with showing that is to be added',
+                params={'value': str(colliding_showing)}
+            )
 
     def check_is_between_open_hours(self):
         """Check whether current showing is between opening and
@@ -118,37 +247,7 @@ class Showing(models.Model):
             params={'value': str(self)}
         )
 
-        opening_h = settings.CINEMA_OPENING_HOUR
-        opening_m = settings.CINEMA_OPENING_MINUTE
-        closing_h = settings.CINEMA_CLOSING_HOUR
-        closing_m = settings.CINEMA_CLOSING_MINUTE
-
-        showing_time = self.get_datetime()
-        closing_on_showing_day = showing_time.replace(hour=closing_h, minute=closing_m)
-        opening_on_showing_day = showing_time.replace(hour=opening_h, minute=opening_m)
-
-        # Check whether closing is before opening e.g closing: 3:00, opening 9:00 or
-        # after opening e.g closing: 23:00, opening 9:00
-        closing_before_opening = closing_on_showing_day < opening_on_showing_day
-
-        if closing_before_opening:
-            if closing_on_showing_day <= showing_time < opening_on_showing_day:
-                raise validation_error
-        else:
-            if showing_time < opening_on_showing_day or showing_time >= closing_on_showing_day:
-                raise validation_error
-
-        # Here showing start time is during cinema open hours.
-        # Check if its duration doesn't exceed open hours.
-        closing_after_showing_started = closing_on_showing_day
-
-        if closing_after_showing_started < self.get_datetime():
-            # Case when cinema closing is the next day of showing start.
-            closing_after_showing_started = closing_after_showing_started + \
-                                            timezone.timedelta(days=1)
-
-        if self.get_end_time() > closing_after_showing_started:
-            # Showing ends when cinema is close
+        if not is_between_open_hours(self.get_datetime(), self.get_end_time()):
             raise validation_error
 
     def clean(self):
@@ -157,23 +256,70 @@ class Showing(models.Model):
         elif not (1888 <= self.when.year <= 3000):
             raise ValidationError('Provided incorrect Year.')
 
+        self.ends_at = self.when + timezone.timedelta(minutes=self.movie.duration_in_minutes)
+
+        if self.hall.places < self.taken_seats:
+            raise ValidationError('Hall does not have enough places for tickets already ordered.')
+
+        if not self._state.adding:
+            # Seats of the seat map and of orders are numbered in the layout of the hall.
+            old_hall_id, taken_seats = Showing.objects.values_list('hall_id', 'taken_seats').get(pk=self.pk)
+            if old_hall_id != self.hall_id and taken_seats > 0:
+                raise ValidationError('Cannot change hall of a showing with booked seats.')
+
         self.check_is_not_colliding()
         self.check_is_between_open_hours()
 
     def save(self, *args, **kwargs):
         self.full_clean()
 
-        return super(Showing, self).save(*args, **kwargs)
+        if self._state.adding:
+            self.free_seats = self.hall.places - self.taken_seats
+            return super(Showing, self).save(*args, **kwargs)
+
+        # Seat counters and the seat map are updated by the order lifecycle
+        # (and reconcile_seat_counters), so they must not be overwritten with
+        # possibly stale values.
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('taken_seats', 'free_seats', 'seat_map')
+            ]
+        super(Showing, self).save(*args, **kwargs)
+
+        # Hall might have changed.
+        Showing.objects.filter(pk=self.pk).update(free_seats=self.hall.places - models.F('taken_seats'))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Local times annotated by the queryset are valid as long as `when` is not changed.
+        instance._loaded_when = instance.__dict__.get('when')
+        return instance
+
+    def _get_annotated_local(self, name):
+        """Return local time value annotated by ShowingQuerySet.with_local_times,
+        or None if it is not annotated or `when` changed since loading."""
+
+        if name in self.__dict__ and self.__dict__.get('_loaded_when') == self.when:
+            return self.__dict__[name]
+        return None
 
     def get_datetime(self):
-        tz = timezone.get_default_timezone()
-        return self.when.astimezone(tz)
+        # Converted once per value of `when`.
+        cached = self.__dict__.get('_local_when')
+        if cached is None or cached[0] != self.when:
+            cached = (self.when, self.when.astimezone(timezone.get_default_timezone()))
+            self._local_when = cached
+        return cached[1]
 
     def get_date(self):
-        return self.get_datetime().date()
+        local_date = self._get_annotated_local('local_date')
+        return local_date if local_date is not None else self.get_datetime().date()
 
     def get_time(self):
-        return self.get_datetime().time()
+        local_time = self._get_annotated_local('local_time')
+        return local_time if local_time is not None else self.get_datetime().time()
 
     def get_formatted_time(self):
         t = self.get_time()
@@ -183,14 +329,30 @@ class Showing(models.Model):
         return f'{start_hour:02}:{start_minutes:02}'
 
     def get_end_time(self):
-        return self.get_datetime() + timezone.timedelta(minutes=self.movie.duration_in_minutes)
+        if self.ends_at is None:
+            return self.get_datetime() + timezone.timedelta(minutes=self.movie.duration_in_minutes)
+
+        # Converted once per value of `ends_at`.
+        cached = self.__dict__.get('_local_ends_at')
+        if cached is None or cached[0] != self.ends_at:
+            cached = (self.ends_at, self.ends_at.astimezone(timezone.get_default_timezone()))
+            self._local_ends_at = cached
+        return cached[1]
+
+    def get_formatted_end_time(self):
+        end_time = self._get_annotated_local('local_end_time')
+        if end_time is None:
+            end_time = self.get_end_time().time()
+
+        return f'{end_time.hour:02}:{end_time.minute:02}'
 
     def get_numerical_weekday(self):
         """Return week day where Monday is 0 and Sunday is 6"""
-        return self.get_datetime().weekday()
+        local_weekday = self._get_annotated_local('local_weekday')
+        return local_weekday - 1 if local_weekday is not None else self.get_datetime().weekday()
 
     def get_weekday(self):
-        return self.get_datetime().strftime('%A')
+        return self.get_date().strftime('%A')
 
     def get_absolute_url(self):
         return reverse('showing-detail-view', args=(self.uuid,))
@@ -199,11 +361,13 @@ class Showing(models.Model):
         return self.hall.places
 
     def taken_places(self):
-        taken_places = self.order_set.exclude(accepted=False, cashier_who_accepted__isnull=False)
-        return taken_places.aggregate(taken=models.Sum('tickets_amount'))['taken'] or 0
+        return self.taken_seats
 
     def free_places(self):
-        return self.all_places() - self.taken_places()
+        return self.free_seats
+
+    def get_seat_map(self):
+        return SeatMap.for_showing(self)
 
     def __str__(self):
         start_time = self.get_formatted_time()
@@ -211,3 +375,11 @@ class Showing(models.Model):
         weekday = self.get_weekday()
 
         return f'{self.movie.title} on {weekday} ({start_date} {start_time})'
+
+
+class CatalogVersion(models.Model):
+    """Single row with a counter bumped on every change of movies, halls
+    or showings (see cinema.catalog), used for conditional GET."""
+
+    version = models.BigIntegerField(default=0)
+    modified = models.DateTimeField(default=timezone.now)
@@ -0,0 +1,167 @@
+"""Detection of N+1 queries.
+
+The usual cause of slow pages is a relation loaded lazily for every item of
+a list, e.g `{{ showing.movie.title }}` in a loop over showings fetched
+without select_related. Such queries have the same SQL and differ only in
+their parameters. RepeatedQueriesDetector counts structurally identical
+SELECT queries and reports the ones repeated CINEMA_NPLUSONE_THRESHOLD
+times, along with the template line and the line of the project's code
+that made them.
+
+NPlusOneMiddleware checks requests if CINEMA_NPLUSONE_DETECTION is set:
+'warn' logs a warning at the end of the request, 'raise' raises
+NPlusOneError on the repeated query, which makes tests fail. As in
+cinema.timing, the detector is kept in a context variable and every
+database connection counts its queries in it, so the middleware works the
+same under WSGI and ASGI.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.template.base import Node
+from django.utils.deprecation import MiddlewareMixin
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+_current_detector = contextvars.ContextVar('current_detector', default=None)
+
+# Lists of parameters, e.g of `IN (%s, %s)`, of any length are the same query.
+PARAMETERS_LIST = re.compile(r'%s(?:, %s)+')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def get_query_signature(sql):
+    return PARAMETERS_LIST.sub('%s', sql)
+
+
+def get_query_origin():
+    """Return the template line being rendered and the innermost line of
+    the project's code on the stack of the current query."""
+
+    project_dir = str(settings.BASE_DIR) + os.sep
+    template_line, code_line = None, None
+
+    frame = sys._getframe(1)
+    while frame is not None and template_line is None:
+        filename = frame.f_code.co_filename
+        node = frame.f_locals.get('self') if frame.f_code.co_name == 'render_annotated' else None
+
+        if isinstance(node, Node) and getattr(node, 'token', None) is not None:
+            template_line = f'{node.origin.template_name or node.origin.name}:{node.token.lineno}'
+        elif code_line is None and filename.startswith(project_dir) and 'site-packages' not in filename \
+                and filename not in (__file__, timing.__file__):
+            code_line = f'{os.path.relpath(filename, project_dir)}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+        frame = frame.f_back
+
+    return ' via '.join(line for line in (template_line, code_line) if line) or 'unknown'
+
+
+class RepeatedQueriesDetector:
+    """Database execute wrapper counting structurally identical SELECT queries."""
+
+    def __init__(self, threshold, should_raise=False):
+        self.threshold = threshold
+        self.should_raise = should_raise
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            signature = get_query_signature(sql)
+            self.counts[signature] += 1
+
+            # Origin is found only once per query, walking the stack is not cheap.
+            if self.counts[signature] == self.threshold:
+                self.origins[signature] = get_query_origin()
+                if self.should_raise:
+                    raise NPlusOneError(
+                        f'Query repeated {self.threshold} times in {self.origins[signature]}: {sql}'
+                    )
+
+        return execute(sql, params, many, context)
+
+    def get_repeated_queries(self):
+        """Return (sql, count, origin) of queries repeated at least threshold times."""
+
+        return [
+            (signature, count, self.origins[signature])
+            for signature, count in self.counts.most_common()
+            if count >= self.threshold
+        ]
+
+
+def count_query(execute, sql, params, many, context):
+    """Execute wrapper of every database connection, counting queries in
+    the detector of the current request if there is one."""
+
+    detector = _current_detector.get()
+    if detector is None:
+        return execute(sql, params, many, context)
+    return detector(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    # Wrappers are kept when the connection reconnects.
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_execute_wrapper, dispatch_uid='cinema_nplusone_execute_wrapper')
+
+
+@contextmanager
+def detect_repeated_queries(should_raise=False):
+    """Detect N+1 queries made in the block (also in threads it runs code in), yields the detector."""
+
+    detector = RepeatedQueriesDetector(settings.CINEMA_NPLUSONE_THRESHOLD, should_raise)
+    token = _current_detector.set(detector)
+    try:
+        yield detector
+    finally:
+        _current_detector.reset(token)
+
+
+class NPlusOneMiddleware(MiddlewareMixin):
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        detection = settings.CINEMA_NPLUSONE_DETECTION
+        if not detection:
+            return self.get_response(request)
+
+        with detect_repeated_queries(should_raise=detection == 'raise') as detector:
+            response = self.get_response(request)
+        self.log(request, detector)
+        return response
+
+    async def __acall__(self, request):
+        detection = settings.CINEMA_NPLUSONE_DETECTION
+        if not detection:
+            return await self.get_response(request)
+
+        with detect_repeated_queries(should_raise=detection == 'raise') as detector:
+            response = await self.get_response(request)
+        self.log(request, detector)
+        return response
+
+    @staticmethod
+    def log(request, detector):
+        for sql, count, origin in detector.get_repeated_queries():
+            logger.warning('N+1 queries in %s %s: query repeated %d times in %s: %s',
+                           request.method, request.path, count, origin, sql)
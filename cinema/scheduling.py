@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.utils import timezone
+
+
+def is_between_open_hours(start, end):
+    """Check whether showing starting at `start` and ending at `end`
+    (both in cinema's local time) is between opening and closing hours.
+    """
+
+    opening_h = settings.CINEMA_OPENING_HOUR
+    opening_m = settings.CINEMA_OPENING_MINUTE
+    closing_h = settings.CINEMA_CLOSING_HOUR
+    closing_m = settings.CINEMA_CLOSING_MINUTE
+
+    closing_on_showing_day = start.replace(hour=closing_h, minute=closing_m)
+    opening_on_showing_day = start.replace(hour=opening_h, minute=opening_m)
+
+    # Check whether closing is before opening e.g closing: 3:00, opening 9:00 or
+    # after opening e.g closing: 23:00, opening 9:00
+    closing_before_opening = closing_on_showing_day < opening_on_showing_day
+
+    if closing_before_opening:
+        if closing_on_showing_day <= start < opening_on_showing_day:
+            return False
+    else:
+        if start < opening_on_showing_day or start >= closing_on_showing_day:
+            return False
+
+    # Here showing start time is during cinema open hours.
+    # Check if its duration doesn't exceed open hours.
+    closing_after_showing_started = closing_on_showing_day
+
+    if closing_after_showing_started < start:
+        # Case when cinema closing is the next day of showing start.
+        closing_after_showing_started = closing_after_showing_started + \
+                                        timezone.timedelta(days=1)
+
+    # Showing cannot end when cinema is closed.
+    return end <= closing_after_showing_started
+
+
+def find_overlaps(intervals):
+    """Find overlapping intervals in one hall with a single sweep.
+
+    `intervals` is an iterable of (start, end, item) tuples. Return list of
+    (item, colliding_item) pairs, where colliding_item is the earlier
+    started interval that item overlaps with.
+    """
+
+    overlaps = []
+    latest_end, latest_item = None, None
+
+    for start, end, item in sorted(intervals, key=lambda interval: interval[:2]):
+        if latest_end is not None and start < latest_end:
+            overlaps.append((item, latest_item))
+
+        if latest_end is None or end > latest_end:
+            latest_end, latest_item = end, item
+
+    return overlaps
@@ -0,0 +1,57 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection, models
+from django.db.models.functions import Greatest
+
+from .models import Movie
+
+
+def search_movies(search_query):
+    """Return movies matching the query, the most relevant first."""
+
+    terms = re.findall(r'\w+', search_query)
+    if not terms:
+        return Movie.objects.none()
+
+    if connection.vendor == 'postgresql':
+        return _search_movies_postgresql(search_query, terms)
+
+    return _search_movies_portable(search_query)
+
+
+def _search_movies_postgresql(search_query, terms):
+    """Search with full-text search vector of title, director and description
+    maintained by a trigger, where every term is matched as a prefix, and
+    trigram similarity of title and director for typos. All of them are
+    backed by GIN indexes (see migrations).
+    """
+
+    query = SearchQuery(' & '.join(f'{term}:*' for term in terms), config='simple', search_type='raw')
+
+    return Movie.objects.filter(
+        models.Q(search_vector=query) |
+        models.Q(title__trigram_similar=search_query) |
+        models.Q(director__trigram_similar=search_query)
+    ).annotate(
+        rank=SearchRank(models.F('search_vector'), query) + Greatest(
+            TrigramSimilarity('title', search_query),
+            TrigramSimilarity('director', search_query)
+        )
+    ).order_by('-rank', 'title')
+
+
+def _search_movies_portable(search_query):
+    """Fallback for databases other than PostgreSQL (e.g SQLite in tests).
+    Descriptions, long and read whole by `icontains`, are not searched."""
+
+    return Movie.objects.filter(
+        models.Q(title__icontains=search_query) |
+        models.Q(director__icontains=search_query)
+    ).annotate(
+        rank=models.Case(
+            models.When(title__icontains=search_query, then=2),
+            default=1,
+            output_field=models.IntegerField()
+        )
+    ).order_by('-rank', 'title')
@@ -0,0 +1,163 @@
+from django.core.exceptions import ValidationError
+
+
+class SeatMap:
+    """Occupancy of seats in a hall stored as a bitmap.
+
+    Seats are numbered row by row, bit `n` of the bitmap is set if n-th
+    seat is taken. Rows and seats are numbered from 1 in seat labels,
+    e.g '3-12' is 12th seat in 3rd row.
+    """
+
+    def __init__(self, rows, seats_in_row, data=b''):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+
+        size = (rows * seats_in_row + 7) // 8
+        self._bits = bytearray(bytes(data)[:size].ljust(size, b'\0'))
+
+    @classmethod
+    def for_showing(cls, showing):
+        hall = showing.hall
+        seat_map = cls(hall.rows, hall.seats_in_row, showing.seat_map)
+
+        # Halls whose amount of places could not be split into rows when seats were
+        # added (see migration cinema 0015) have trailing seats which cannot be ordered.
+        for index in range(hall.places, hall.rows * hall.seats_in_row):
+            seat_map._bits[index >> 3] |= 1 << (index & 7)
+        return seat_map
+
+    @classmethod
+    def for_order(cls, order):
+        return cls(order.showing.hall.rows, order.showing.hall.seats_in_row, order.seats)
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+    def _index(self, seat):
+        row, number = seat
+        if not (1 <= row <= self.rows and 1 <= number <= self.seats_in_row):
+            raise ValidationError('%(value)s is not a correct seat', params={'value': format_seat(seat)})
+
+        return (row - 1) * self.seats_in_row + number - 1
+
+    def _is_taken(self, index):
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+
+    def is_free(self, seat):
+        return not self._is_taken(self._index(seat))
+
+    def take(self, seats):
+        """Mark seats as taken. Raise ValidationError if any of them is already taken."""
+
+        indexes = [self._index(seat) for seat in seats]
+        if len(set(indexes)) != len(indexes):
+            raise ValidationError('The same seat was picked more than once.')
+
+        taken = [seat for seat, index in zip(seats, indexes) if self._is_taken(index)]
+        if taken:
+            raise ValidationError(
+                'Seats %(value)s are not available.',
+                params={'value': ', '.join(format_seat(seat) for seat in taken)}
+            )
+
+        for index in indexes:
+            self._bits[index >> 3] |= 1 << (index & 7)
+
+    def release(self, seats):
+        for seat in seats:
+            index = self._index(seat)
+            self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def merge(self, data):
+        """Mark all seats taken in other bitmap of the same hall as taken."""
+
+        for i, byte in enumerate(bytes(data)[:len(self._bits)]):
+            self._bits[i] |= byte
+
+    def taken_seats(self):
+        # Only bytes with taken seats are looked into, orders take few seats of a hall.
+        indexes = [
+            byte_index * 8 + bit
+            for byte_index, byte in enumerate(self._bits) if byte
+            for bit in range(8) if byte & (1 << bit)
+        ]
+        return [(index // self.seats_in_row + 1, index % self.seats_in_row + 1) for index in indexes]
+
+    def free_count(self):
+        return self.rows * self.seats_in_row - sum(bin(byte).count('1') for byte in self._bits)
+
+    def layout(self):
+        """Return list of rows, each a list of (label, is_taken) pairs."""
+
+        return [
+            [
+                (format_seat((row, number)), self._is_taken((row - 1) * self.seats_in_row + number - 1))
+                for number in range(1, self.seats_in_row + 1)
+            ]
+            for row in range(1, self.rows + 1)
+        ]
+
+    def _seat_score(self, row, number):
+        # The lower the better: middle seats of rows a bit behind the middle of the hall.
+        preferred_row = (self.rows * 2 + 2) / 3
+        return abs(row - preferred_row) * self.seats_in_row + abs(number - (self.seats_in_row + 1) / 2)
+
+    def best_adjacent(self, amount):
+        """Find `amount` adjacent free seats in one row, placed as close to the best
+        seat in the hall as possible. Return None if there is no such block of seats.
+        """
+
+        if amount < 1 or amount > self.seats_in_row:
+            return None
+
+        best, best_score = None, None
+        for row in range(1, self.rows + 1):
+            free_in_a_row = 0
+            for number in range(1, self.seats_in_row + 1):
+                if self._is_taken((row - 1) * self.seats_in_row + number - 1):
+                    free_in_a_row = 0
+                    continue
+
+                free_in_a_row += 1
+                if free_in_a_row >= amount:
+                    first = number - amount + 1
+                    score = self._seat_score(row, (first + number) / 2)
+                    if best_score is None or score < best_score:
+                        best, best_score = [(row, n) for n in range(first, number + 1)], score
+
+        return best
+
+    def best_seats(self, amount):
+        """Return `amount` best free seats - adjacent ones if possible,
+        or None if there are not enough free seats.
+        """
+
+        seats = self.best_adjacent(amount)
+        if seats is None:
+            free = [
+                (row, number)
+                for row in range(1, self.rows + 1)
+                for number in range(1, self.seats_in_row + 1)
+                if not self._is_taken((row - 1) * self.seats_in_row + number - 1)
+            ]
+            if len(free) < amount:
+                return None
+
+            seats = sorted(sorted(free, key=lambda seat: self._seat_score(*seat))[:amount])
+
+        return seats
+
+
+def format_seat(seat):
+    return f'{seat[0]}-{seat[1]}'
+
+
+def parse_seat(label):
+    """Parse seat label like '3-12' into (row, number) pair."""
+
+    try:
+        row, number = label.split('-')
+        return int(row), int(number)
+    except ValueError:
+        raise ValidationError('%(value)s is not a correct seat', params={'value': label})
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+
+from .catalog import bump_catalog_version
+
+
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+# Changes made with QuerySet.update() or bulk_create() do not send signals,
+# so code making them bumps the catalog version explicitly.
+# Orders do not change the catalog, availability of showings is served separately.
+for model in ('cinema.Movie', 'cinema.Hall', 'cinema.Showing'):
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_save_{model}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_delete_{model}')
@@ -0,0 +1,145 @@
+"""ASGI application streaming live seat availability as Server-Sent Events.
+
+Django 3.1 cannot stream responses asynchronously, so event streams are served
+by this small ASGI application in front of Django (see cinema_project.asgi):
+
+* /events/showing/<uuid>/ - changes of the showing,
+* /events/day/<YYYY-MM-DD>/ - changes of all showings of the day, or of
+  a number of days starting from it with `days` parameter (at most 7).
+
+A stream starts with `snapshot` event with free places of the showing(s),
+followed by `seats` events published by cinema.events. Under WSGI these
+paths reach Django, which answers them with no_events_view.
+"""
+
+import asyncio
+import datetime
+import json
+import re
+import uuid
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .events import get_broker, showing_channel, day_channel
+from .models import Showing
+
+EVENTS_PATH = re.compile(r'^/events/(?P<kind>showing|day)/(?P<key>[^/]+)/$')
+
+# Comment sent periodically, so that proxies do not close idle streams.
+KEEPALIVE_SECONDS = 15
+
+
+def _get_snapshot(showings):
+    close_old_connections()
+    try:
+        return [
+            {'showing': str(showing_uuid), 'free_places': free_places, 'all_places': all_places}
+            for showing_uuid, free_places, all_places
+            in showings.values_list('uuid', 'free_seats', 'hall__places')
+        ]
+    finally:
+        close_old_connections()
+
+
+def _parse_request(scope):
+    """Return (channels, showings) for the request, or None if it is incorrect."""
+
+    match = EVENTS_PATH.match(scope['path'])
+    if not match:
+        return None
+
+    try:
+        if match['kind'] == 'showing':
+            showing_uuid = uuid.UUID(match['key'])
+            return [showing_channel(showing_uuid)], Showing.objects.filter(pk=showing_uuid)
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        days = int(query.get('days', ['1'])[0])
+        if not 1 <= days <= 7:
+            return None
+
+        date = datetime.date.fromisoformat(match['key'])
+        day_start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+        channels = [day_channel(date + datetime.timedelta(days=day)) for day in range(days)]
+        return channels, Showing.objects.filter(
+            when__gte=day_start, when__lt=day_start + datetime.timedelta(days=days)
+        )
+    except ValueError:
+        return None
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+async def events_application(scope, receive, send):
+    parsed = _parse_request(scope)
+    if parsed is None or scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 404,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+        return
+
+    channels, showings = parsed
+
+    # Subscribe before reading the snapshot, so that no change is missed.
+    subscription = get_broker().subscribe(channels)
+    try:
+        snapshot = await sync_to_async(_get_snapshot, thread_sensitive=False)(showings)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': format_event('snapshot', snapshot), 'more_body': True})
+
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while not disconnected.done():
+                event = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait({event, disconnected}, timeout=KEEPALIVE_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if event in done:
+                    body = format_event('seats', event.result())
+                else:
+                    event.cancel()
+                    body = b': keepalive\n\n'
+
+                if not disconnected.done():
+                    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            disconnected.cancel()
+    finally:
+        subscription.close()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def route_events(django_application):
+    """Return ASGI application serving event streams and passing other
+    requests to Django."""
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith('/events/'):
+            await events_application(scope, receive, send)
+        else:
+            await django_application(scope, receive, send)
+
+    return application
+
+
+def no_events_view(request, path):
+    # 204 tells EventSource not to reconnect, pages then show free places as rendered.
+    return HttpResponse(status=204)
@@ -0,0 +1,58 @@
+"""ASGI handler sending streaming responses of synchronous code as they are produced.
+
+Django 3.1 iterates streaming responses in the event loop, where iterators
+reading the database (e.g exports of reports.exports) cannot run. This
+handler gets every part of a streaming response in the thread running
+synchronous views instead, so the first parts are sent while the rest is
+still being read. Its requests are StreamingASGIRequest, so that views can
+tell whether their streaming content may query the database.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
+
+
+class StreamingASGIRequest(ASGIRequest):
+    # Streaming content is iterated outside of the event loop, see StreamingASGIHandler.
+    streams_synchronously = True
+
+
+class StreamingASGIHandler(ASGIHandler):
+    request_class = StreamingASGIRequest
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+
+        # The same thread as the view's, which opened the database cursors read by the iterator.
+        get_next_part = sync_to_async(next, thread_sensitive=True)
+        parts = iter(response)
+        while True:
+            part = await get_next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_streaming_asgi_application():
+    """Set up Django and return StreamingASGIHandler, like get_asgi_application does."""
+
+    import django
+    django.setup(set_prefix=False)
+    return StreamingASGIHandler()
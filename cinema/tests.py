@@ -0,0 +1,902 @@
+import asyncio
+import io
+import json
+import tempfile
+from collections import Counter
+from importlib import import_module
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, URLPattern
+from prometheus_client import REGISTRY
+from django.utils import timezone
+
+from .events import PostgresBroker
+from .facets import annotate_facets, count_facets, filter_by_facets, get_facets
+from .management.commands.benchmark import Command as BenchmarkCommand, URLCONFS
+from .models import Movie, Hall, Showing, CatalogVersion
+from .search import _search_movies_portable, search_movies
+from .seats import SeatMap
+from .sse import events_application
+from .nplusone import NPlusOneError, NPlusOneMiddleware, detect_repeated_queries
+from .timing import RequestTimingMiddleware
+from .views import get_week_showings
+from orders.models import Order
+from orders.services import book_tickets, finalize_orders
+from orders.views import CashierQueueView
+
+
+@override_settings(CINEMA_NPLUSONE_DETECTION='raise', CINEMA_TIMING_SAMPLE_RATE=0)
+class CinemaTestCase(TestCase):
+    """Test case with a few days of showings in two halls and orders of two clients.
+
+    Any N+1 queries made by requests fail the tests, so amounts of queries
+    asserted by tests do not depend on the amount of data.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        CatalogVersion.objects.get_or_create(pk=1)
+
+        User = get_user_model()
+        cls.client_user = User.objects.create_user('client@example.com', 'password',
+                                                   first_name='Client', last_name='One')
+        cls.other_client = User.objects.create_user('other@example.com', 'password',
+                                                    first_name='Client', last_name='Two')
+        cls.cashier = User.objects.create_user('cashier@example.com', 'password',
+                                               first_name='Cashier', last_name='One', is_cashier=True)
+        cls.staff = User.objects.create_user('staff@example.com', 'password',
+                                             first_name='Staff', last_name='One', is_staff=True)
+
+        cls.halls = [Hall.objects.create(rows=5, seats_in_row=10), Hall.objects.create(rows=8, seats_in_row=12)]
+        cls.movies = [
+            Movie.objects.create(title=f'Movie {i}', director='Director', year_of_production=2000 + i,
+                                 type='drama', duration_in_minutes=100, description='Description')
+            for i in range(3)
+        ]
+
+        tomorrow = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0) \
+            + timezone.timedelta(days=1)
+        cls.showings = [
+            Showing.objects.create(when=tomorrow + timezone.timedelta(days=day, hours=3 * i),
+                                   movie=cls.movies[(day + i) % 3], hall=hall)
+            for day in range(-3, 4)
+            for i, hall in enumerate(cls.halls)
+            for i in (i, i + 2)
+        ]
+        cls.showing = cls.showings[-1]
+
+        cls.orders = []
+        for i, showing in enumerate(cls.showings):
+            for client in (cls.client_user, cls.other_client):
+                cls.orders.append(Order.objects.create(showing=showing, client=client, tickets_amount=1 + i % 3))
+
+    def setUp(self):
+        # Availability of showings is cached between requests.
+        cache.clear()
+
+    def assertNumQueriesOfGet(self, num, url, user=None, status_code=200):
+        if user is not None:
+            self.client.force_login(user)
+
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+
+class RepeatedQueriesDetectorTests(CinemaTestCase):
+    def test_lazy_relations_in_loop_are_detected(self):
+        with self.assertRaisesMessage(NPlusOneError, 'cinema/tests.py'):
+            with detect_repeated_queries(should_raise=True):
+                for showing in Showing.objects.all():
+                    showing.movie.title
+
+    def test_template_line_is_reported(self):
+        with detect_repeated_queries() as detector:
+            template = engines['django'].from_string('{% for order in orders %}\n{{ order.showing }}{% endfor %}')
+            template.render({'orders': Order.objects.all()})
+
+        origins = {origin: count for sql, count, origin in detector.get_repeated_queries()}
+        self.assertEqual(origins['<unknown source>:2'], len(self.orders))
+
+    def test_same_query_with_different_amount_of_parameters_is_detected(self):
+        with detect_repeated_queries() as detector:
+            for amount in range(1, 4):
+                list(Showing.objects.filter(pk__in=[showing.pk for showing in self.showings[:amount]]))
+
+        self.assertEqual(len(detector.get_repeated_queries()), 1)
+
+    async def test_repeated_queries_of_async_requests_are_detected(self):
+        async def get_response(request):
+            await sync_to_async(lambda: [showing.movie.title for showing in Showing.objects.all()],
+                                thread_sensitive=True)()
+
+        middleware = NPlusOneMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        with self.assertRaisesMessage(NPlusOneError, 'cinema/tests.py'):
+            await middleware(RequestFactory().get('/'))
+
+
+class ShowingTests(CinemaTestCase):
+    def test_saving_stale_showing_keeps_booked_seats(self):
+        stale_showing = Showing.objects.get(pk=self.showing.pk)
+        book_tickets(self.showing, self.client_user, 2, seats=[(1, 1), (1, 2)])
+
+        stale_showing.save()
+
+        showing = Showing.objects.select_related('hall').get(pk=self.showing.pk)
+        self.assertEqual(showing.taken_seats, 2)
+        self.assertEqual(showing.get_seat_map().taken_seats(), [(1, 1), (1, 2)])
+
+    def test_hall_of_showing_with_booked_seats_cannot_change(self):
+        hall = Hall.objects.create(rows=8, seats_in_row=12)
+        showing = Showing.objects.create(when=self.showing.when, movie=self.showing.movie, hall=hall)
+        book_tickets(showing, self.client_user, 2, seats=[(2, 5), (2, 6)])
+
+        showing = Showing.objects.get(pk=showing.pk)
+        showing.hall = Hall.objects.create(rows=5, seats_in_row=10)
+        with self.assertRaisesMessage(ValidationError, 'Cannot change hall of a showing with booked seats.'):
+            showing.save()
+
+    def test_hall_of_showing_without_booked_seats_can_change(self):
+        hall = Hall.objects.create(rows=8, seats_in_row=12)
+        showing = Showing.objects.create(when=self.showing.when, movie=self.showing.movie, hall=hall)
+
+        showing.hall = Hall.objects.create(rows=3, seats_in_row=5)
+        showing.save()
+
+        self.assertEqual(Showing.objects.get(pk=showing.pk).free_seats, 15)
+
+    def test_overlapping_showing_in_the_same_hall_is_rejected(self):
+        showing = Showing(when=self.showing.when + timezone.timedelta(minutes=30), movie=self.movies[0],
+                          hall=self.showing.hall)
+
+        with self.assertRaisesMessage(ValidationError, f'{self.showing} collides with showing that is to be added'):
+            showing.save()
+
+    def test_adjacent_showing_and_showing_in_other_hall_are_allowed(self):
+        Showing.objects.create(when=self.showing.ends_at, movie=self.movies[0], hall=self.showing.hall)
+        Showing.objects.create(when=self.showing.when, movie=self.movies[0], hall=self.halls[0])
+
+        self.assertEqual(Showing.objects.filter(when__gte=self.showing.when).count(), 3)
+
+    @skipUnless(connection.vendor == 'postgresql', 'The constraint exists on PostgreSQL only.')
+    def test_constraint_rejects_overlapping_showing_which_was_not_validated(self):
+        def get_showing(when):
+            return Showing(when=when, movie=self.movies[0], hall=self.showing.hall,
+                           free_seats=self.showing.hall.places,
+                           ends_at=when + timezone.timedelta(minutes=self.movies[0].duration_in_minutes))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Showing.objects.bulk_create([get_showing(self.showing.when + timezone.timedelta(minutes=30))])
+
+        # Adjacent showing is allowed by the constraint too.
+        Showing.objects.bulk_create([get_showing(self.showing.ends_at)])
+
+
+class MovieDurationTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.movie = Movie.objects.create(title='Late movie', director='Director', year_of_production=2000,
+                                          type='drama', duration_in_minutes=100, description='Description')
+        self.late_showing = Showing.objects.create(when=self.showing.when.replace(hour=21), movie=self.movie,
+                                                   hall=Hall.objects.create(rows=3, seats_in_row=5))
+
+    def test_changed_duration_updates_end_of_showings(self):
+        self.movie.duration_in_minutes = 120
+        self.movie.full_clean()
+        self.movie.save()
+
+        self.assertEqual(Showing.objects.get(pk=self.late_showing.pk).ends_at,
+                         self.late_showing.when + timezone.timedelta(minutes=120))
+
+    def test_duration_cannot_push_showings_past_closing_hour(self):
+        self.movie.duration_in_minutes = 400
+
+        with self.assertRaisesMessage(ValidationError, 'would collide with cinema open hours'):
+            self.movie.full_clean()
+        with self.assertRaisesMessage(ValidationError, 'would collide with cinema open hours'):
+            self.movie.save()
+        self.assertEqual(Showing.objects.get(pk=self.late_showing.pk).ends_at, self.late_showing.ends_at)
+
+    def test_unchanged_duration_is_not_checked(self):
+        self.movie.title = 'Late movie 2'
+
+        # Only the saved duration is read, showings are not.
+        with self.assertNumQueries(1):
+            self.movie.clean()
+        self.movie.save()
+        self.assertEqual(Movie.objects.get(pk=self.movie.pk).slug, 'late-movie-2')
+
+
+class HallLayoutTests(CinemaTestCase):
+    def test_migrated_layouts_keep_amounts_of_places(self):
+        fill_hall_layouts = import_module('cinema.migrations.0015_hall_layout_and_showing_seat_map').fill_hall_layouts
+        halls = [Hall.objects.create(rows=1, seats_in_row=1) for _ in range(3)]
+        for hall, places in zip(halls, (48, 41, 0)):
+            Hall.objects.filter(pk=hall.pk).update(places=places)
+
+        fill_hall_layouts(django_apps, None)
+
+        self.assertEqual([Hall.objects.values_list('rows', 'seats_in_row', 'places').get(pk=hall.pk) for hall in halls],
+                         [(6, 8, 48), (2, 21, 41), (1, 1, 0)])
+
+    def test_seats_beyond_places_of_hall_cannot_be_ordered(self):
+        hall = Hall.objects.create(rows=2, seats_in_row=3)
+        Hall.objects.filter(pk=hall.pk).update(places=5)
+        hall.refresh_from_db()
+        showing = Showing.objects.create(when=self.showing.when, movie=self.movies[0], hall=hall)
+
+        seat_map = showing.get_seat_map()
+        self.assertEqual((seat_map.free_count(), seat_map.taken_seats()), (5, [(2, 3)]))
+        with self.assertRaisesMessage(ValidationError, 'Seats 2-3 are not available.'):
+            book_tickets(showing, self.client_user, 1, seats=[(2, 3)])
+
+        book_tickets(showing, self.client_user, 5)
+        self.assertEqual(Showing.objects.get(pk=showing.pk).free_seats, 0)
+
+
+class LocalTimesTests(CinemaTestCase):
+    def test_annotated_local_times_match_local_times_across_clock_changes(self):
+        hall = Hall.objects.create(rows=3, seats_in_row=5)
+        tz = timezone.get_default_timezone()
+        # Local times before and after clocks are changed in Europe/Warsaw.
+        for when in ('2021-03-27 22:30', '2021-03-28 00:15', '2021-03-28 22:30', '2021-10-30 22:30',
+                     '2021-10-31 00:30', '2021-10-31 22:30'):
+            Showing.objects.create(when=tz.localize(timezone.datetime.fromisoformat(when)), movie=self.movies[0],
+                                   hall=hall)
+
+        showings = Showing.objects.filter(hall=hall).with_local_times()
+        self.assertEqual(
+            [(showing.local_date, showing.local_time, showing.local_weekday, showing.local_end_time)
+             for showing in showings],
+            [(timezone.localtime(showing.when).date(), timezone.localtime(showing.when).time(),
+              timezone.localtime(showing.when).isoweekday(), timezone.localtime(showing.ends_at).time())
+             for showing in Showing.objects.filter(hall=hall)]
+        )
+        self.assertEqual([showing.get_formatted_time() for showing in showings],
+                         ['22:30', '00:15', '22:30', '22:30', '00:30', '22:30'])
+        self.assertEqual([showing.get_formatted_end_time() for showing in showings],
+                         ['00:10', '01:55', '00:10', '00:10', '02:10', '00:10'])
+
+    def test_local_times_are_computed_again_when_showing_moves(self):
+        showing = Showing.objects.with_local_times().get(pk=self.showing.pk)
+        self.assertEqual(showing.get_date(), timezone.localtime(self.showing.when).date())
+
+        showing.when += timezone.timedelta(days=1, hours=-2)
+        local_when = timezone.localtime(showing.when)
+        self.assertEqual((showing.get_datetime(), showing.get_date(), showing.get_formatted_time(),
+                          showing.get_numerical_weekday()),
+                         (local_when, local_when.date(), local_when.strftime('%H:%M'), local_when.weekday()))
+
+
+class SeatMapTests(SimpleTestCase):
+    def test_seats_are_taken_and_released(self):
+        seat_map = SeatMap(5, 10)
+        seat_map.take([(2, 5), (2, 6), (5, 10)])
+
+        self.assertEqual(seat_map.taken_seats(), [(2, 5), (2, 6), (5, 10)])
+        self.assertFalse(seat_map.is_free((2, 6)))
+        self.assertEqual(seat_map.free_count(), 47)
+
+        seat_map.release([(2, 6)])
+        seat_map = SeatMap(5, 10, seat_map.to_bytes())
+        self.assertEqual(seat_map.taken_seats(), [(2, 5), (5, 10)])
+        self.assertTrue(seat_map.is_free((2, 6)))
+
+    def test_taken_and_incorrect_seats_cannot_be_taken(self):
+        seat_map = SeatMap(5, 10)
+        seat_map.take([(1, 1)])
+
+        with self.assertRaisesMessage(ValidationError, 'Seats 1-1 are not available.'):
+            seat_map.take([(1, 2), (1, 1)])
+        with self.assertRaisesMessage(ValidationError, 'picked more than once'):
+            seat_map.take([(1, 3), (1, 3)])
+        with self.assertRaisesMessage(ValidationError, '6-1 is not a correct seat'):
+            seat_map.take([(6, 1)])
+        with self.assertRaisesMessage(ValidationError, '1-11 is not a correct seat'):
+            seat_map.take([(1, 11)])
+        self.assertEqual(seat_map.taken_seats(), [(1, 1)])
+
+    def test_best_adjacent_seats_are_in_the_middle_behind_the_center(self):
+        seat_map = SeatMap(5, 10)
+
+        self.assertEqual(seat_map.best_adjacent(2), [(4, 5), (4, 6)])
+        self.assertEqual(seat_map.best_adjacent(3), [(4, 4), (4, 5), (4, 6)])
+
+    def test_best_adjacent_seats_skip_taken_seats(self):
+        seat_map = SeatMap(2, 5)
+        seat_map.take([(1, 3), (2, 2), (2, 4)])
+
+        self.assertEqual(seat_map.best_adjacent(2), [(1, 1), (1, 2)])
+        self.assertIsNone(seat_map.best_adjacent(3))
+        self.assertIsNone(seat_map.best_adjacent(6))
+
+    def test_best_seats_are_scattered_without_adjacent_ones(self):
+        seat_map = SeatMap(2, 3)
+        seat_map.take([(1, 2), (2, 2)])
+
+        self.assertEqual(seat_map.best_seats(3), [(1, 1), (2, 1), (2, 3)])
+        self.assertIsNone(seat_map.best_seats(5))
+
+
+class RequestTimingTests(CinemaTestCase):
+    def test_middleware_serves_async_requests_asynchronously(self):
+        async def get_response(request):
+            pass
+
+        self.assertTrue(asyncio.iscoroutinefunction(RequestTimingMiddleware(get_response)))
+        self.assertFalse(asyncio.iscoroutinefunction(RequestTimingMiddleware(lambda request: None)))
+
+    def test_queries_are_measured(self):
+        self.client.force_login(self.staff)
+        # Queries of the session and the user are made before the request is measured.
+        response = self.client.get(reverse('report-movies'))
+        self.assertRegex(response['Server-Timing'], 'db;dur=[0-9.]+;desc="[1-9][0-9]* queries"')
+
+    async def test_queries_of_async_requests_are_measured(self):
+        await sync_to_async(self.async_client.force_login, thread_sensitive=True)(self.staff)
+        response = await self.async_client.get(reverse('report-movies'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], 'db;dur=[0-9.]+;desc="[1-9][0-9]* queries"')
+
+    @override_settings(DEBUG=True, CINEMA_TIMING_SAMPLE_RATE=1)
+    async def test_user_of_async_requests_is_logged(self):
+        await sync_to_async(self.async_client.force_login, thread_sensitive=True)(self.client_user)
+        with self.assertLogs('cinema.timing') as logs:
+            response = await self.async_client.get(f'{reverse("api-availability")}?showings={self.showing.pk}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(logs.records[-1].getMessage())['user'], self.client_user.pk)
+
+
+class CatalogViewsQueriesTests(CinemaTestCase):
+    def test_schedule(self):
+        self.assertNumQueriesOfGet(1, reverse('schedule'))
+
+    def test_movie_list(self):
+        self.assertNumQueriesOfGet(2, reverse('movie-list'))
+
+    def test_showing_list(self):
+        self.assertNumQueriesOfGet(3, reverse('showing-list'))
+
+    def test_showing_list_with_invalid_facets(self):
+        url = f'{reverse("showing-list")}?hall=x&hall=99999999999&hall={self.halls[0].pk}&weekday=monday&time=noon'
+        response = self.assertNumQueriesOfGet(3, url)
+        self.assertTrue(response.context['showings'])
+        self.assertTrue(all(showing.hall_id == self.halls[0].pk for showing in response.context['showings']))
+
+    def test_movie_detail(self):
+        self.assertNumQueriesOfGet(2, reverse('movie-detail-view', args=[self.movies[0].slug]))
+
+    def test_showing_detail(self):
+        self.assertNumQueriesOfGet(1, reverse('showing-detail-view', args=[self.showing.pk]))
+
+    def test_events_are_not_served_under_wsgi(self):
+        response = self.client.get(f'/events/day/{self.showing.get_date()}/?days=7')
+        self.assertEqual(response.status_code, 204)
+
+
+class EventsTests(TransactionTestCase):
+    """Events are published once bookings commit, so changes are really committed."""
+
+    def setUp(self):
+        self.client_user = get_user_model().objects.create_user('client@example.com', 'password')
+        hall = Hall.objects.create(rows=1, seats_in_row=5)
+        movie = Movie.objects.create(title='Movie', director='Director', year_of_production=2000,
+                                     type='drama', duration_in_minutes=100, description='Description')
+        tomorrow = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0) \
+            + timezone.timedelta(days=1)
+        self.showing = Showing.objects.create(when=tomorrow, movie=movie, hall=hall)
+
+    async def test_booked_seats_are_streamed_under_asgi(self):
+        requests, responses = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/events/showing/{self.showing.pk}/', 'query_string': b''}
+        stream = asyncio.ensure_future(events_application(scope, requests.get, responses.put))
+
+        async def get_event():
+            message = await asyncio.wait_for(responses.get(), timeout=5)
+            event, data = message['body'].decode().split('\n')[:2]
+            return event, json.loads(data[len('data: '):])
+
+        start = await asyncio.wait_for(responses.get(), timeout=5)
+        self.assertEqual(start['status'], 200)
+        self.assertEqual(await get_event(), ('event: snapshot', [
+            {'showing': str(self.showing.pk), 'free_places': 5, 'all_places': 5}
+        ]))
+
+        await sync_to_async(book_tickets)(self.showing, self.client_user, 2, seats=[(1, 2), (1, 3)])
+        self.assertEqual(await get_event(), ('event: seats', {
+            'showing': str(self.showing.pk), 'free_places': 3, 'all_places': 5, 'taken': ['1-2', '1-3'],
+            'released': [],
+        }))
+
+        await requests.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(stream, timeout=5)
+
+    def test_listener_connection_is_closed_before_reconnecting(self):
+        class Stop(Exception):
+            pass
+
+        pg_connection = mock.MagicMock()
+        pg_connection.cursor.side_effect = OSError('Connection lost.')
+        with mock.patch.object(connection.Database, 'connect', return_value=pg_connection), \
+                mock.patch('cinema.events.time.sleep', side_effect=Stop), \
+                self.assertLogs('cinema.events', 'ERROR'), self.assertRaises(Stop):
+            PostgresBroker().listen()
+
+        pg_connection.close.assert_called_once_with()
+
+
+class SearchTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.interstellar, self.prestige, self.odyssey = [
+            Movie.objects.create(title=title, director=director, year_of_production=2000, type='drama',
+                                 duration_in_minutes=120, description=description)
+            for title, director, description in (
+                ('Interstellar', 'Christopher Nolan', 'Explorers travel through a wormhole in space.'),
+                ('The Prestige', 'Christopher Nolan', 'Rivalry of two magicians.'),
+                ('Space Odyssey', 'Stanley Kubrick', 'Humanity finds a mysterious monolith.'),
+            )
+        ]
+
+    def test_empty_query_finds_nothing(self):
+        self.assertEqual(list(search_movies(' ?! ')), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search is used on PostgreSQL only.')
+    def test_all_terms_are_matched_as_prefixes(self):
+        self.assertEqual(list(search_movies('interst')), [self.interstellar])
+        self.assertEqual(list(search_movies('christ magic')), [self.prestige])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search is used on PostgreSQL only.')
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(list(search_movies('space')), [self.odyssey, self.interstellar])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Trigram similarity is used on PostgreSQL only.')
+    def test_typos_are_matched_by_similarity(self):
+        self.assertEqual(list(search_movies('Intersteller')), [self.interstellar])
+        self.assertEqual(list(search_movies('Stanly Kubrik')), [self.odyssey])
+
+    def test_portable_search_ranks_titles_above_directors(self):
+        Movie.objects.create(title='Nolan documentary', director='Director', year_of_production=2010,
+                             type='documentary', duration_in_minutes=90, description='Description')
+
+        self.assertEqual([movie.title for movie in _search_movies_portable('nolan')],
+                         ['Nolan documentary', 'Interstellar', 'The Prestige'])
+        self.assertEqual(list(_search_movies_portable('wormhole')), [])
+
+
+class FacetsTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.all_showings = annotate_facets(Showing.objects.all())
+        # Every day there are two showings in each hall.
+        self.weekday = str(self.showing.get_datetime().isoweekday())
+
+    def test_counts_of_every_value(self):
+        counts = count_facets(self.all_showings, {})
+
+        self.assertEqual(counts['hall'], Counter({str(hall.pk): 14 for hall in self.halls}))
+        self.assertEqual(counts['weekday'], Counter({str(weekday): 4 for weekday in range(1, 8)}))
+        self.assertEqual(counts['available'], Counter({'1': 28}))
+
+    def test_counts_of_facet_depend_on_values_selected_in_other_facets(self):
+        selected = {'hall': {str(self.halls[0].pk)}, 'weekday': {self.weekday}}
+        counts = count_facets(self.all_showings, selected)
+
+        self.assertEqual(counts['hall'], Counter({str(hall.pk): 2 for hall in self.halls}))
+        self.assertEqual(counts['weekday'], Counter({str(weekday): 2 for weekday in range(1, 8)}))
+        self.assertEqual(counts['available'], Counter({'1': 2}))
+        self.assertEqual(filter_by_facets(self.all_showings, selected).count(), 2)
+
+    def test_values_without_matching_showings_are_listed(self):
+        facets = {parameter: values for parameter, _, values in get_facets(self.all_showings, {'available': {'0'}})}
+
+        self.assertEqual(facets['hall'], [(str(hall.pk), f'Hall {hall.pk}', 0, False) for hall in self.halls])
+        self.assertEqual(facets['available'], [('1', 'Has free seats', 28, False)])
+
+
+class ApiViewsQueriesTests(CinemaTestCase):
+    def test_schedule(self):
+        self.assertNumQueriesOfGet(2, reverse('api-schedule'))
+
+    def test_movie_detail(self):
+        self.assertNumQueriesOfGet(3, reverse('api-movie-detail', args=[self.movies[0].slug]))
+
+    def test_showing_detail(self):
+        self.assertNumQueriesOfGet(2, reverse('api-showing-detail', args=[self.showing.pk]))
+
+    def test_availability(self):
+        showings = ','.join(str(showing.pk) for showing in self.showings)
+        self.assertNumQueriesOfGet(1, f'{reverse("api-availability")}?showings={showings}')
+
+
+class ApiConditionalGetTests(CinemaTestCase):
+    def test_unchanged_schedule_is_not_modified(self):
+        etag = self.client.get(reverse('api-schedule'))['ETag']
+
+        # Only the catalog version is read.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api-schedule'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_showing_etag_changes_with_its_seats(self):
+        url = reverse('api-showing-detail', args=[self.showing.pk])
+        response = self.client.get(url)
+        etag, free_places = response['ETag'], response.json()['free_places']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        book_tickets(self.showing, self.client_user, 2)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['free_places'], free_places - 2)
+
+
+class CatalogVersionTests(TransactionTestCase):
+    """The catalog version is bumped after commit, so transactions are not rolled back by these tests."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.client_user = User.objects.create_user('client@example.com', 'password')
+        self.cashier = User.objects.create_user('cashier@example.com', 'password', is_cashier=True)
+
+        self.hall = Hall.objects.create(rows=5, seats_in_row=10)
+        self.movie = Movie.objects.create(title='Movie', director='Director', year_of_production=2000,
+                                          type='drama', duration_in_minutes=100, description='Description')
+        tomorrow = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0) \
+            + timezone.timedelta(days=1)
+        self.showing = Showing.objects.create(when=tomorrow, movie=self.movie, hall=self.hall)
+
+    def get_schedule_etag(self):
+        response = self.client.get(reverse('api-schedule'))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_catalog_changes_bump_the_version(self):
+        etag = self.get_schedule_etag()
+        Showing.objects.create(when=self.showing.when + timezone.timedelta(hours=3), movie=self.movie, hall=self.hall)
+
+        self.assertNotEqual(self.get_schedule_etag(), etag)
+
+    def test_orders_do_not_bump_the_version(self):
+        etag = self.get_schedule_etag()
+        order = book_tickets(self.showing, self.client_user, 2)
+        finalize_orders([order.pk], self.cashier, accepted=False)
+
+        self.assertEqual(self.get_schedule_etag(), etag)
+
+
+class BenchmarkTests(CinemaTestCase):
+    def test_every_view_has_sample_arguments(self):
+        command = BenchmarkCommand()
+        names = [name for name, path, user in command.get_urls(command.get_samples())]
+
+        self.assertEqual(names, [
+            pattern.name for urlconf in URLCONFS for pattern in import_module(urlconf).urlpatterns
+            if isinstance(pattern, URLPattern) and pattern.name
+        ])
+
+
+class ReconcileSeatCountersTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        # Orders of the fixture are created without updating seat counters.
+        Order.objects.all().delete()
+
+    def reconcile(self, **options):
+        stdout = io.StringIO()
+        call_command('reconcile_seat_counters', stdout=stdout, **options)
+        return stdout.getvalue().splitlines()
+
+    def test_correct_counters_are_not_changed(self):
+        self.assertEqual(self.reconcile(), ['Fixed 0 showing(s) with drifted seat counters.'])
+
+    def test_drifted_counters_are_recomputed_from_orders(self):
+        book_tickets(self.showing, self.client_user, 2, seats=[(1, 1), (1, 2)])
+        showing = Showing.objects.select_related('hall').with_counted_taken_seats().get(pk=self.showing.pk)
+        taken, places, seat_map = showing.counted_taken_seats, showing.hall.places, showing.seat_map
+        Showing.objects.filter(pk=showing.pk).update(taken_seats=0, free_seats=0, seat_map=b'')
+
+        report = [f'{showing.pk}: taken 0 -> {taken}, free 0 -> {places - taken}']
+        self.assertEqual(self.reconcile(dry_run=True),
+                         report + ['Found 1 showing(s) with drifted seat counters.'])
+        self.assertEqual(Showing.objects.values_list('taken_seats', 'free_seats').get(pk=showing.pk), (0, 0))
+
+        self.assertEqual(self.reconcile(), report + ['Fixed 1 showing(s) with drifted seat counters.'])
+        showing = Showing.objects.select_related('hall').get(pk=showing.pk)
+        self.assertEqual((showing.taken_seats, showing.free_seats, bytes(showing.seat_map)),
+                         (taken, places - taken, bytes(seat_map)))
+        self.assertIn((1, 2), showing.get_seat_map().taken_seats())
+
+
+class ImportScheduleTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        # First day after the fixture's showings.
+        self.day = timezone.localtime(self.showing.when).replace(hour=12) + timezone.timedelta(days=1)
+
+    def import_schedule(self, content, suffix='.jsonl', **options):
+        """Import file with given content, return output of the command."""
+
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as file:
+            file.write(content)
+            file.flush()
+
+            stdout = io.StringIO()
+            call_command('import_schedule', file.name, stdout=stdout, stderr=io.StringIO(), **options)
+        return stdout.getvalue()
+
+    def assertImportFails(self, content, errors, suffix='.jsonl'):
+        """Assert that importing the file reports given errors and nothing is imported."""
+
+        stderr = io.StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as file:
+            file.write(content)
+            file.flush()
+
+            with self.assertRaisesMessage(CommandError, f'Found {len(errors)} error(s), nothing was imported.'):
+                call_command('import_schedule', file.name, stderr=stderr)
+
+        self.assertEqual(stderr.getvalue().splitlines(), errors)
+        self.assertEqual(Showing.objects.count(), len(self.showings))
+
+    @staticmethod
+    def to_jsonl(rows):
+        return ''.join(f'{json.dumps(row)}\n' for row in rows)
+
+    def get_when(self, days=0, hours=0):
+        return (self.day + timezone.timedelta(days=days, hours=hours)).strftime('%d/%m/%Y %H:%M')
+
+    def get_showing(self, movie, hours=0):
+        """Return showing as described in errors."""
+
+        return Showing(when=self.day + timezone.timedelta(hours=hours), movie=movie)
+
+    def test_csv_rows_are_imported(self):
+        movie, hall = self.movies[0], self.halls[1]
+        content = f'movie,hall,when\n{movie.slug},{hall.pk},{self.get_when()}\n' \
+                  f'{movie.slug},{hall.pk},{self.get_when(hours=3)}\n'
+
+        self.assertIn('Imported 2 showing(s).', self.import_schedule(content, suffix='.csv'))
+
+        showings = Showing.objects.filter(when__gte=self.day)
+        self.assertEqual([(showing.get_datetime(), showing.ends_at, showing.movie_id, showing.hall_id,
+                           showing.free_seats) for showing in showings], [
+            (self.day + timezone.timedelta(hours=hours),
+             self.day + timezone.timedelta(hours=hours, minutes=movie.duration_in_minutes),
+             movie.pk, hall.pk, hall.places)
+            for hours in (0, 3)
+        ])
+
+    def test_jsonl_rows_with_movie_ids_are_imported(self):
+        content = self.to_jsonl([{'movie': self.movies[1].pk, 'hall': self.halls[0].pk, 'when': self.get_when()},
+                                 {'movie': self.movies[2].slug, 'hall': self.halls[1].pk, 'when': self.get_when()}])
+
+        self.assertIn('Imported 2 showing(s).', self.import_schedule(content))
+        self.assertEqual(list(Showing.objects.filter(when__gte=self.day).values_list('movie_id', 'hall_id')),
+                         [(self.movies[1].pk, self.halls[0].pk), (self.movies[2].pk, self.halls[1].pk)])
+
+    def test_dry_run_imports_nothing(self):
+        content = self.to_jsonl([{'movie': self.movies[0].slug, 'hall': self.halls[0].pk, 'when': self.get_when()}])
+
+        self.assertIn('1 showing(s) can be imported.', self.import_schedule(content, dry_run=True))
+        self.assertEqual(Showing.objects.count(), len(self.showings))
+
+    def test_slug_of_digits_takes_precedence_over_id(self):
+        movie = Movie.objects.create(title='1917', director='Director', year_of_production=2019,
+                                     type='war', duration_in_minutes=110, description='Description')
+        # Loaded after the other movie, which is ordered by year of production.
+        Movie.objects.create(id=1917, title='Other movie', director='Director', year_of_production=2020,
+                             type='drama', duration_in_minutes=100, description='Description')
+
+        self.import_schedule(self.to_jsonl([{'movie': '1917', 'hall': self.halls[0].pk, 'when': self.get_when()}]))
+
+        self.assertEqual(Showing.objects.get(when__gte=self.day).movie, movie)
+
+    def test_unknown_movie_and_hall_are_reported(self):
+        self.assertImportFails(self.to_jsonl([
+            {'movie': 'unknown-movie', 'hall': self.halls[0].pk, 'when': self.get_when()},
+            {'movie': self.movies[0].slug, 'hall': 999, 'when': self.get_when()},
+            {'movie': self.movies[0].slug, 'hall': self.halls[0].pk, 'when': 'tomorrow'},
+        ]), [
+            "Line 1: unknown movie 'unknown-movie'.",
+            'Line 2: unknown hall 999.',
+            "Line 3: incorrect date 'tomorrow'.",
+        ])
+
+    def test_showings_outside_open_hours_are_reported(self):
+        self.assertImportFails(self.to_jsonl([
+            {'movie': self.movies[0].slug, 'hall': self.halls[0].pk, 'when': self.get_when(hours=-7)},
+        ]), [f'Line 1: {self.get_showing(self.movies[0], hours=-7)} collides with cinema open hours.'])
+
+    def test_times_changed_by_clocks_are_reported(self):
+        # Clocks in Europe/Warsaw go forward at 2:00 and back at 3:00.
+        self.assertImportFails(self.to_jsonl([
+            {'movie': self.movies[0].slug, 'hall': self.halls[0].pk, 'when': '28/03/2021 02:30'},
+            {'movie': self.movies[0].slug, 'hall': self.halls[0].pk, 'when': '31/10/2021 02:30'},
+        ]), [
+            "Line 1: date '28/03/2021 02:30' does not exist or is ambiguous in local time.",
+            "Line 2: date '31/10/2021 02:30' does not exist or is ambiguous in local time.",
+        ])
+
+    def test_overlapping_rows_are_reported(self):
+        self.assertImportFails(self.to_jsonl([
+            {'movie': self.movies[0].slug, 'hall': self.halls[0].pk, 'when': self.get_when()},
+            {'movie': self.movies[1].slug, 'hall': self.halls[1].pk, 'when': self.get_when(hours=1)},
+            {'movie': self.movies[1].slug, 'hall': self.halls[0].pk, 'when': self.get_when(hours=1)},
+        ]), [f'Line 3: {self.get_showing(self.movies[1], hours=1)} in {self.halls[0]} collides with line 1 '
+              f'({self.get_showing(self.movies[0])}).'])
+
+    def test_overlap_with_existing_showing_is_reported(self):
+        # 22:00 of the previous day, before the last showing of the fixture ends.
+        showing = self.get_showing(self.movies[0], hours=-14)
+        self.assertImportFails(self.to_jsonl([
+            {'movie': self.movies[0].slug, 'hall': self.showing.hall_id, 'when': self.get_when(hours=-14)},
+        ]), [f'Line 1: {showing} in {self.showing.hall} collides with existing showing ({self.showing}).'])
+
+    def test_queries_do_not_depend_on_amount_of_rows(self):
+        def count_queries(days):
+            rows = [{'movie': self.movies[day % 3].slug, 'hall': self.halls[day % 2].pk, 'when': self.get_when(day)}
+                    for day in days]
+            with CaptureQueriesContext(connection) as context:
+                self.import_schedule(self.to_jsonl(rows))
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(range(2)), count_queries(range(2, 8)))
+        self.assertEqual(Showing.objects.filter(when__gte=self.day).count(), 8)
+
+    def test_lines_which_are_not_objects_are_reported(self):
+        self.assertImportFails(
+            f'[1]\n{self.to_jsonl([{"movie": self.movies[0].slug, "hall": self.halls[0].pk, "when": self.get_when()}])}'
+            f'"showing"\n',
+            ['Line 1: expected an object, got [1].', "Line 3: expected an object, got 'showing'."]
+        )
+
+
+class MetricsTests(CinemaTestCase):
+    def test_bookings_are_counted(self):
+        def get_counts():
+            return [REGISTRY.get_sample_value(name) for name in (
+                'cinema_orders_created_total', 'cinema_orders_rejected_for_lack_of_seats_total'
+            )]
+
+        created, rejected = get_counts()
+
+        book_tickets(self.showing, self.client_user, 2)
+        with self.assertRaises(ValidationError):
+            book_tickets(self.showing, self.client_user, self.showing.hall.places)
+
+        self.assertEqual(get_counts(), [created + 1, rejected + 1])
+
+    def test_metrics_are_exposed(self):
+        self.client.get(reverse('schedule'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'cinema_orders_created_total')
+        self.assertContains(response, 'cinema_view_duration_seconds_count{method="GET",view="schedule"}')
+
+    async def test_async_requests_are_measured(self):
+        def get_count():
+            return REGISTRY.get_sample_value('cinema_view_duration_seconds_count',
+                                             {'view': 'metrics', 'method': 'GET'}) or 0
+
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        count = get_count()
+        response = await self.async_client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_count(), count + 1)
+
+    def test_unknown_methods_share_a_label(self):
+        def get_count():
+            return REGISTRY.get_sample_value('cinema_view_duration_seconds_count',
+                                             {'view': 'schedule', 'method': 'other'}) or 0
+
+        count = get_count()
+        self.client.generic('BREW', reverse('schedule'))
+
+        self.assertEqual(get_count(), count + 1)
+        self.assertIsNone(REGISTRY.get_sample_value('cinema_view_duration_seconds_count',
+                                                    {'view': 'schedule', 'method': 'BREW'}))
+
+    @override_settings(CINEMA_METRICS_TOKEN='secret')
+    def test_token_is_required_if_set(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_staff_gets_metrics_without_token(self):
+        self.client.force_login(self.client_user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+def get_plan_nodes(queryset):
+    """Return nodes of the plan PostgreSQL would use to run the queryset."""
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    result, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        result.append(node)
+        nodes.extend(node.get('Plans', ()))
+    return result
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL only.')
+class QueryPlansTests(CinemaTestCase):
+    """Hot queries must use their indexes, not read showing and order tables sequentially.
+
+    Plans are made for a few months of generated showings and orders with
+    fresh statistics, so that the planner chooses as it would in production.
+    """
+
+    large_tables = {Showing._meta.db_table, Order._meta.db_table}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        call_command('generate_cinema_data', halls=10, movies=30, days=120, past_days=90, customers=100,
+                     orders=40000, stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        # Next showing in one of the generated halls, which are as busy as real ones.
+        cls.generated_showing = Showing.objects.exclude(hall__in=cls.halls).filter(when__gte=timezone.now()).first()
+
+    def assertUsesIndex(self, queryset, index_name):
+        nodes = get_plan_nodes(queryset)
+        self.assertEqual([node['Relation Name'] for node in nodes
+                          if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in self.large_tables], [])
+        self.assertIn(index_name, [node.get('Index Name') for node in nodes])
+
+    def test_schedule(self):
+        self.assertUsesIndex(get_week_showings(timezone.now()), 'showing_when_idx')
+
+    def test_collisions(self):
+        showing = Showing(hall=self.generated_showing.hall, movie=self.generated_showing.movie,
+                          when=self.generated_showing.when + timezone.timedelta(hours=1))
+        showing.ends_at = showing.when + timezone.timedelta(minutes=showing.movie.duration_in_minutes)
+        # Showings are stored in order of their start, so the window of all halls is read
+        # from showing_when_idx, cheaper than visiting scattered rows of a (hall, when) index.
+        self.assertUsesIndex(showing.get_colliding_showings(), 'showing_when_idx')
+
+    def test_counted_taken_seats(self):
+        self.assertUsesIndex(Showing.objects.filter(pk=self.generated_showing.pk).with_counted_taken_seats(),
+                             'order_showing_status_idx')
+
+    def test_cashier_queue(self):
+        request = RequestFactory().get(reverse('cashier-queue'))
+        request.user = self.cashier
+        view = CashierQueueView()
+        view.setup(request)
+
+        self.assertUsesIndex(view.get_queryset()[:view.paginate_by], 'order_pending_idx')
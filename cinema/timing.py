@@ -0,0 +1,218 @@
+"""Timing of requests.
+
+RequestTimingMiddleware measures time spent by a request in the database
+(along with the amount of queries), rendering templates, in the view and in
+total. Every measured request is logged as one JSON line to `cinema.timing`
+logger; requests slower than CINEMA_TIMING_SLOW_REQUEST_MS are logged as
+warnings with their slowest queries attached. Staff members (and everyone
+when DEBUG is on) also get the timings in Server-Timing response header,
+which is shown by browsers' developer tools.
+
+Only CINEMA_TIMING_SAMPLE_RATE of requests is measured, so that the cost in
+production stays negligible. Requests of staff members are always measured,
+but logged only if sampled or slow.
+
+The timing of the request being served is kept in a context variable, which
+asgiref passes on to threads running synchronous code, and every database
+connection records its queries in it. So queries are measured in whichever
+thread they are made, and the middleware serves ASGI requests on the event
+loop instead of making Django run them one at a time in a single thread.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+_current_timing = contextvars.ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """Timings of a single request, also used as database execute wrapper."""
+
+    def __init__(self, is_sampled, show_header, user_id):
+        self.is_sampled = is_sampled
+        self.show_header = show_header
+        self.user_id = user_id
+        self.token = None
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.queries = []
+        self.durations = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - start, sql))
+
+    def get_db_time(self):
+        return sum(duration for duration, _ in self.queries)
+
+    def get_slowest_queries(self, amount):
+        return heapq.nlargest(amount, self.queries, key=lambda query: query[0])
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every database connection, recording queries in
+    timing of the current request if it is measured."""
+
+    timing = _current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    # Wrappers are kept when the connection reconnects.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_execute_wrapper, dispatch_uid='cinema_timing_execute_wrapper')
+
+
+@contextmanager
+def measure(name):
+    """Add time spent in the block to `name` duration of the current request."""
+
+    timing = _current_timing.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timing is not None:
+            timing.durations[name] += time.perf_counter() - start
+
+
+def to_ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class RequestTimingMiddleware(MiddlewareMixin):
+    """Must be placed after AuthenticationMiddleware, it checks if the user is staff."""
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        timing = self.start(*self.get_user(request))
+        if timing is None:
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timing.reset(timing.token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        # Loading the user may query the database, which is not allowed in the event loop,
+        # so the user is not touched by the middleware after this call.
+        timing = self.start(*await sync_to_async(self.get_user, thread_sensitive=True)(request))
+        if timing is None:
+            return await self.get_response(request)
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timing.reset(timing.token)
+        return self.finish(request, response, timing)
+
+    @staticmethod
+    def get_user(request):
+        """Return (whether to show Server-Timing header, id of the user)."""
+
+        user = request.user
+        return settings.DEBUG or user.is_staff, user.pk
+
+    @staticmethod
+    def start(show_header, user_id):
+        """Return timing of the request made current, or None if the request is not measured."""
+
+        is_sampled = random.random() < settings.CINEMA_TIMING_SAMPLE_RATE
+        if not is_sampled and not show_header:
+            return None
+
+        timing = RequestTiming(is_sampled, show_header, user_id)
+        timing.token = _current_timing.set(timing)
+        return timing
+
+    def finish(self, request, response, timing):
+        total_time = time.perf_counter() - timing.started
+        view_time = total_time - (timing.view_started - timing.started) if timing.view_started else None
+
+        if timing.show_header:
+            response['Server-Timing'] = self.get_server_timing(timing, view_time, total_time)
+        is_slow = total_time * 1000 >= settings.CINEMA_TIMING_SLOW_REQUEST_MS
+        if timing.is_sampled or is_slow:
+            self.log(request, response, timing, view_time, total_time, is_slow)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timing = _current_timing.get()
+        if timing is None or response.is_rendered:
+            return response
+
+        start = time.perf_counter()
+
+        def rendered(response):
+            timing.durations['template'] += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def get_server_timing(timing, view_time, total_time):
+        metrics = [f'db;dur={to_ms(timing.get_db_time())};desc="{len(timing.queries)} queries"']
+        if 'template' in timing.durations:
+            metrics.append(f'template;dur={to_ms(timing.durations["template"])}')
+        if view_time is not None:
+            metrics.append(f'view;dur={to_ms(view_time)}')
+        metrics.append(f'total;dur={to_ms(total_time)}')
+        return ', '.join(metrics)
+
+    @staticmethod
+    def log(request, response, timing, view_time, total_time, is_slow):
+        match = request.resolver_match
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user': timing.user_id,
+            'queries': len(timing.queries),
+            'db_ms': to_ms(timing.get_db_time()),
+            'template_ms': to_ms(timing.durations['template']),
+            'view_ms': to_ms(view_time) if view_time is not None else None,
+            'total_ms': to_ms(total_time),
+            'slow': is_slow,
+        }
+        if is_slow:
+            # Queries are logged without their parameters, which may contain personal data.
+            record['slowest_queries'] = [
+                {'sql': sql, 'ms': to_ms(duration)}
+                for duration, sql in timing.get_slowest_queries(settings.CINEMA_TIMING_SLOWEST_QUERIES)
+            ]
+
+        logger.log(logging.WARNING if is_slow else logging.INFO, json.dumps(record))
@@ -1,17 +1,26 @@
 from django.urls import path
 
 from .views import (
-    ScheduleView,
-    MovieDetailView,
+    schedule_view,
+    movie_detail_view,
     ShowingDetailView,
-    MovieListView,
-    ShowingListView,
+    movie_list_view,
+    showing_list_view,
 )
+from .api import schedule_api_view, movie_api_view, showing_api_view, availability_api_view
+from .metrics import metrics_view
+from .sse import no_events_view
 
 urlpatterns = [
-    path('', ScheduleView.as_view(), name='schedule'),
-    path('movies/', MovieListView.as_view(), name='movie-list'),
-    path('showings/', ShowingListView.as_view(), name='showing-list'),
+    path('api/schedule/', schedule_api_view, name='api-schedule'),
+    path('api/movies/<slug:slug>/', movie_api_view, name='api-movie-detail'),
+    path('api/availability/', availability_api_view, name='api-availability'),
+    path('api/showings/<uuid:pk>/', showing_api_view, name='api-showing-detail'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('events/<path:path>', no_events_view, name='events'),
+    path('', schedule_view, name='schedule'),
+    path('movies/', movie_list_view, name='movie-list'),
+    path('showings/', showing_list_view, name='showing-list'),
     path('showing/<uuid:pk>/', ShowingDetailView.as_view(), name='showing-detail-view'),
-    path('<slug:slug>/', MovieDetailView.as_view(), name='movie-detail-view'),
+    path('<slug:slug>/', movie_detail_view, name='movie-detail-view'),
 ]
@@ -23,3 +23,19 @@ def validate_correct_no_places(value):
             '%(value)s is not a correct number of places',
             params={'value': value}
         )
+
+
+def validate_correct_no_rows(value):
+    if value < 1 or value > 40:
+        raise ValidationError(
+            '%(value)s is not a correct number of rows',
+            params={'value': value}
+        )
+
+
+def validate_correct_no_seats_in_row(value):
+    if value < 1 or value > 40:
+        raise ValidationError(
+            '%(value)s is not a correct number of seats in a row',
+            params={'value': value}
+        )
@@ -1,9 +1,59 @@
+from asgiref.sync import sync_to_async
 from django.views.generic import ListView, DetailView, TemplateView
+from django.db import close_old_connections
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
 from django.db.models import Q
 from django.contrib import messages
+from django.core.paginator import Paginator
 
 from .models import Showing, Movie
+from .search import search_movies
+from .facets import annotate_facets, get_selected_facets, filter_by_facets, get_facets
+from .timing import measure
+
+
+def get_query_string_without_page(request):
+    """Return query string of the request without page number, used by pagination links."""
+
+    params = request.GET.copy()
+    params.pop('page', None)
+    return params.urlencode()
+
+
+def get_week_showings(since):
+    """Return showings from `since` until the end of the 6th day after it."""
+
+    last_day = (since + timezone.timedelta(days=6)).replace(hour=23, minute=59)
+
+    return Showing.objects.with_availability().filter(
+        when__gte=since,
+        when__lte=last_day).order_by('when')
+
+
+def group_by_weekday(showings):
+    """Return list of (weekday, showings) starting from today."""
+
+    today = timezone.now().date().weekday()
+    weekdays = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+    weekdays = weekdays[today:7] + weekdays[0:today]
+
+    # Group showings by weekday in a single pass over the queryset.
+    showings_by_weekday = {num: [] for num, _ in weekdays}
+    for showing in showings:
+        showings_by_weekday[showing.get_numerical_weekday()].append(showing)
+
+    return [
+        (weekday, showings_by_weekday[num]) for num, weekday in weekdays
+    ]
 
 
 class ScheduleView(ListView):
@@ -13,30 +63,12 @@ class ScheduleView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        today = timezone.now().date().weekday()
-        weekdays = (
-            (0, 'Monday'),
-            (1, 'Tuesday'),
-            (2, 'Wednesday'),
-            (3, 'Thursday'),
-            (4, 'Friday'),
-            (5, 'Saturday'),
-            (6, 'Sunday'),
-        )
-        weekdays = weekdays[today:7] + weekdays[0:today]
-        context['weekdays'] = weekdays
+        context['schedule'] = group_by_weekday(context['showings'])
 
         return context
 
     def get_queryset(self):
-        today = timezone.now()
-        last_day = (today + timezone.timedelta(days=6)).replace(hour=23, minute=59)
-
-        showings = Showing.objects.filter(
-            when__gte=today,
-            when__lte=last_day).order_by('when')
-        return showings
+        return get_week_showings(timezone.now())
 
 
 class MovieDetailView(DetailView):
@@ -47,9 +79,9 @@ class MovieDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        movie = self.get_object()
+        movie = self.object
         now = timezone.now()
-        showings = movie.showing_set.filter(when__gte=now).order_by('when')
+        showings = Showing.objects.with_availability().filter(movie=movie, when__gte=now).order_by('when')
         context['showings'] = showings
 
         return context
@@ -57,6 +89,7 @@ class MovieDetailView(DetailView):
 
 class ShowingDetailView(DetailView):
     model = Showing
+    queryset = Showing.objects.with_availability()
     context_object_name = 'showing'
     template_name = 'cinema/showing_detail.html'
 
@@ -65,14 +98,13 @@ class MovieListView(ListView):
     model = Movie
     template_name = 'cinema/movie_list.html'
     context_object_name = 'movies'
+    paginate_by = 20
 
     def get_queryset(self):
         search_query = self.request.GET.get('search_query') or None
 
         if search_query:
-            queryset = Movie.objects.filter(
-                Q(title__icontains=search_query) | Q(director__icontains=search_query)
-            )
+            queryset = search_movies(search_query)
         else:
             queryset = Movie.objects.all()
 
@@ -83,12 +115,14 @@ class MovieListView(ListView):
         search_query = self.request.GET.get('search_query') or ''
 
         context['search_query'] = search_query
+        context['query_string'] = get_query_string_without_page(self.request)
 
         return context
 
 
 class ShowingListView(TemplateView):
     template_name = 'cinema/showing_list.html'
+    paginate_by = 20
 
     def get_context_data(self, **kwargs):
         context = super(ShowingListView, self).get_context_data(**kwargs)
@@ -115,7 +149,7 @@ class ShowingListView(TemplateView):
                 messages.error(self.request, message='An incorrect date was provided.')
                 return context
 
-        showings = Showing.objects.filter(
+        showings = Showing.objects.with_availability().filter(
             (Q(movie__title__icontains=movie) | Q(movie__director__icontains=movie)),
             Q(when__gte=from_when)
         )
@@ -123,10 +157,63 @@ class ShowingListView(TemplateView):
         if to_when:
             showings = showings.filter(Q(when__lte=to_when))
 
+        showings = annotate_facets(showings)
+        selected_facets = get_selected_facets(self.request.GET)
+        paginator = Paginator(filter_by_facets(showings, selected_facets), self.paginate_by)
+        page_obj = paginator.get_page(self.request.GET.get('page'))
+
         context['movie'] = movie
         if to_when:
             context['to_when'] = timezone.datetime.strftime(to_when, '%d/%m/%Y %H:%M')
         context['from_when'] = timezone.datetime.strftime(from_when, '%d/%m/%Y %H:%M')
-        context['showings'] = showings
+        context['facets'] = get_facets(showings, selected_facets)
+        context['page_obj'] = page_obj
+        context['showings'] = page_obj.object_list
+        context['query_string'] = get_query_string_without_page(self.request)
 
         return context
+
+
+def as_async_view(view_class, **initkwargs):
+    """Return async view serving given class-based view.
+
+    Under ASGI, Django 3.1 runs all synchronous views of a process in a single
+    thread, one request at a time. The returned view instead runs the whole
+    view, including querying the database and rendering the template, in the
+    shared thread pool (its size is set by ASGI_THREADS environment variable),
+    so a single worker serves many catalog requests concurrently while the
+    event loop is free. Under WSGI the view runs in the request's thread as
+    before. Ordering and staff views stay synchronous.
+    """
+
+    view = view_class.as_view(**initkwargs)
+
+    def render_view(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            with measure('template'):
+                response.render()
+        return response
+
+    def render_view_in_pool(request, *args, **kwargs):
+        # Database connections are per thread, so pool threads manage theirs
+        # the same way as request_started/request_finished signals do.
+        close_old_connections()
+        try:
+            return render_view(request, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    async def async_view(request, *args, **kwargs):
+        if isinstance(request, ASGIRequest):
+            return await sync_to_async(render_view_in_pool, thread_sensitive=False)(request, *args, **kwargs)
+        return await sync_to_async(render_view)(request, *args, **kwargs)
+
+    async_view.view_class = view_class
+    return async_view
+
+
+schedule_view = as_async_view(ScheduleView)
+movie_list_view = as_async_view(MovieListView)
+showing_list_view = as_async_view(ShowingListView)
+movie_detail_view = as_async_view(MovieDetailView)
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cinema_project.settings')
 
-application = get_asgi_application()
+from cinema.streaming import get_streaming_asgi_application  # noqa: E402
+
+# Sends streaming responses (e.g exports) as they are produced, see cinema.streaming.
+django_application = get_streaming_asgi_application()
+
+from cinema.sse import route_events  # noqa: E402 (apps must be loaded first)
+
+application = route_events(django_application)
@@ -41,22 +41,28 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # local
     'users.apps.UsersConfig',
     'cinema.apps.CinemaConfig',
     'orders.apps.OrdersConfig',
+    'reports.apps.ReportsConfig',
+    'archive.apps.ArchiveConfig',
 
     # 3rd party
     'crispy_forms',
 ]
 
 MIDDLEWARE = [
+    'cinema.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cinema.timing.RequestTimingMiddleware',
+    'cinema.nplusone.NPlusOneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -155,6 +161,53 @@ CINEMA_OPENING_MINUTE = 0
 CINEMA_CLOSING_HOUR = 3
 CINEMA_CLOSING_MINUTE = 0
 
+# Seconds for which availability returned by batch endpoint is cached
+# and maximal amount of showings in one request.
+CINEMA_AVAILABILITY_CACHE_TIMEOUT = 5
+CINEMA_AVAILABILITY_MAX_SHOWINGS = 500
+
+# Broker of live seat availability events (see cinema.events), use
+# 'cinema.events.PostgresBroker' when running more than one worker.
+CINEMA_EVENTS_BROKER = os.environ.get('CINEMA_EVENTS_BROKER', 'cinema.events.InProcessBroker')
+
+# Store of waiting rooms' queues (see orders.waiting_room).
+CINEMA_WAITING_ROOM_STORE = 'orders.waiting_room.DatabaseStore'
+
+# Fraction of requests whose timings are measured and logged (see cinema.timing),
+# requests slower than given milliseconds are logged with their slowest queries.
+CINEMA_TIMING_SAMPLE_RATE = float(os.environ.get('CINEMA_TIMING_SAMPLE_RATE', 1 if DEBUG else 0.01))
+CINEMA_TIMING_SLOW_REQUEST_MS = 500
+CINEMA_TIMING_SLOWEST_QUERIES = 5
+
+# Detection of N+1 queries (see cinema.nplusone): 'warn' logs them, 'raise' raises
+# NPlusOneError (used by tests), empty turns detection off.
+CINEMA_NPLUSONE_DETECTION = os.environ.get('CINEMA_NPLUSONE_DETECTION', 'warn' if DEBUG else '')
+CINEMA_NPLUSONE_THRESHOLD = 3
+
+# Past days kept in showing and order tables, older ones are moved to
+# archive tables by archive_showings command (see archive.archiving).
+CINEMA_ARCHIVE_AFTER_DAYS = 90
+
+# Token required by /metrics endpoint (see cinema.metrics). If not set, only
+# staff members can see metrics.
+CINEMA_METRICS_TOKEN = os.environ.get('CINEMA_METRICS_TOKEN')
+
+
+# Logging
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'cinema.timing': {'handlers': ['timing'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 
 # Messages
 MESSAGE_TAGS = {
@@ -22,4 +22,5 @@ urlpatterns = [
     path('account/', include('users.urls')),
     path('orders/', include('orders.urls')),
     path('staff/', include('staff_panel.urls')),
+    path('staff/reports/', include('reports.urls')),
 ]
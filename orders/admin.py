@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import Order
+from .models import Order, WaitingRoom
 
-admin.site.register(Order)
\ No newline at end of file
+admin.site.register(Order)
+admin.site.register(WaitingRoom)
\ No newline at end of file
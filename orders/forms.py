@@ -1,10 +1,64 @@
-from django.forms import ModelForm
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.forms import ModelForm, Form, Field, MultipleChoiceField, ChoiceField
+from django.forms import ModelChoiceField, DateField, UUIDField, DateInput, HiddenInput, MultipleHiddenInput
 
 from .models import Order
+from cinema.models import Hall
+from cinema.seats import parse_seat
 
 
 class CreateOrderForm(ModelForm):
+    seats = MultipleChoiceField(required=False)
 
     class Meta:
         model = Order
         fields = ('tickets_amount',)
+
+    def __init__(self, *args, seat_map=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Amount of tickets is not needed if seats are picked.
+        self.fields['tickets_amount'].required = False
+
+        if seat_map is not None:
+            self.fields['seats'].choices = [
+                (label, label) for row in seat_map.layout() for label, is_taken in row if not is_taken
+            ]
+
+    def clean_seats(self):
+        return [parse_seat(label) for label in self.cleaned_data['seats']]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        seats = cleaned_data.get('seats')
+
+        if seats:
+            cleaned_data['tickets_amount'] = len(seats)
+        elif not cleaned_data.get('tickets_amount') and 'tickets_amount' not in self.errors:
+            self.add_error('tickets_amount', 'Provide amount of tickets or pick seats.')
+
+        return cleaned_data
+
+
+class CashierQueueFilterForm(Form):
+    showing = UUIDField(required=False, widget=HiddenInput)
+    hall = ModelChoiceField(queryset=Hall.objects.all(), required=False, to_field_name='number')
+    date = DateField(required=False, input_formats=['%d/%m/%Y', '%Y-%m-%d'],
+                     widget=DateInput(attrs={'placeholder': 'dd/mm/yyyy'}))
+
+
+class MultipleUUIDField(Field):
+    widget = MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [uuid.UUID(str(item)) for item in value or ()]
+        except ValueError:
+            raise ValidationError('Incorrect order identifier.')
+
+
+class FinalizeOrdersForm(Form):
+    orders = MultipleUUIDField()
+    action = ChoiceField(choices=(('accept', 'Accept'), ('reject', 'Reject')))
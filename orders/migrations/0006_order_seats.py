@@ -0,0 +1,82 @@
+from itertools import groupby
+
+from django.db import migrations, models
+
+
+# Seats are numbered row by row, bit `n` of a bitmap is set if n-th seat is
+# taken, as in cinema.seats.SeatMap at the time of this migration.
+def to_bytes(indexes, size):
+    bits = bytearray((size + 7) // 8)
+    for index in indexes:
+        bits[index >> 3] |= 1 << (index & 7)
+    return bytes(bits)
+
+
+def find_best_seats(taken, rows, seats_in_row, amount):
+    """Return indexes of `amount` best free seats, adjacent ones in one row
+    if possible, or None if there are not enough free seats."""
+
+    def score(row, number):
+        # The lower the better: middle seats of rows a bit behind the middle of the hall.
+        return abs(row - (rows * 2 + 2) / 3) * seats_in_row + abs(number - (seats_in_row + 1) / 2)
+
+    best, best_score = None, None
+    for row in range(1, rows + 1):
+        for number in range(1, seats_in_row - amount + 2):
+            first = (row - 1) * seats_in_row + number - 1
+            block = range(first, first + amount)
+            if taken.isdisjoint(block):
+                block_score = score(row, number + (amount - 1) / 2)
+                if best_score is None or block_score < best_score:
+                    best, best_score = list(block), block_score
+    if best is not None:
+        return best
+
+    free = [index for index in range(rows * seats_in_row) if index not in taken]
+    if len(free) < amount:
+        return None
+    return sorted(sorted(free, key=lambda index: score(index // seats_in_row + 1, index % seats_in_row + 1))[:amount])
+
+
+def assign_seats(apps, schema_editor):
+    Showing = apps.get_model('cinema', 'Showing')
+    Order = apps.get_model('orders', 'Order')
+
+    # Orders made before seats existed get the best seats left in order of booking,
+    # rejected ones released theirs. Seat maps of showings are filled from them.
+    orders = Order.objects.exclude(accepted=False, cashier_who_accepted__isnull=False) \
+        .select_related('showing__hall').order_by('showing', 'date', 'pk')
+
+    for showing, showing_orders in groupby(orders.iterator(), key=lambda order: order.showing):
+        hall = showing.hall
+        size = hall.rows * hall.seats_in_row
+        # Trailing seats of halls with more seats than places cannot be ordered (see cinema 0015).
+        taken = set(range(hall.places, size))
+        for order in showing_orders:
+            seats = find_best_seats(taken, hall.rows, hall.seats_in_row, order.tickets_amount)
+            if seats is None:
+                raise RuntimeError(
+                    f'Showing {showing.pk} has more tickets ordered than places, '
+                    'cancel some of its orders before migrating.'
+                )
+            taken.update(seats)
+            Order.objects.filter(pk=order.pk).update(seats=to_bytes(seats, size))
+
+        Showing.objects.filter(pk=showing.pk).update(seat_map=to_bytes(taken, size))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0015_hall_layout_and_showing_seat_map'),
+        ('orders', '0005_auto_20210109_2001'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='seats',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(assign_seats, migrations.RunPython.noop),
+    ]
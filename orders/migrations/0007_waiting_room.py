@@ -0,0 +1,47 @@
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cinema', '0020_catalogversion'),
+        ('orders', '0006_order_seats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitingRoom',
+            fields=[
+                ('showing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='waiting_room', serialize=False, to='cinema.showing')),
+                ('admissions_per_minute', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('burst', models.PositiveIntegerField(default=10, validators=[django.core.validators.MinValueValidator(1)])),
+                ('admission_minutes', models.PositiveIntegerField(default=10, validators=[django.core.validators.MinValueValidator(1)])),
+                ('is_active', models.BooleanField(default=True)),
+                ('tokens', models.FloatField(default=0, editable=False)),
+                ('refilled_at', models.DateTimeField(editable=False, null=True)),
+                ('last_position', models.BigIntegerField(default=0, editable=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WaitingRoomEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.BigIntegerField()),
+                ('admitted_at', models.DateTimeField(null=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='orders.waitingroom')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='waitingroomentry',
+            index=models.Index(fields=['room', 'position'], name='waiting_room_position_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitingroomentry',
+            constraint=models.UniqueConstraint(fields=('room', 'client'), name='unique_waiting_room_client'),
+        ),
+    ]
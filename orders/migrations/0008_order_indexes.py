@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0021_showing_when_idx'),
+        ('orders', '0007_waiting_room'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['showing', 'accepted', 'cashier_who_accepted'], name='order_showing_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(cashier_who_accepted__isnull=True), fields=['showing'], name='order_pending_idx'),
+        ),
+        # Covered by order_showing_status_idx.
+        migrations.AlterField(
+            model_name='order',
+            name='showing',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='cinema.showing'),
+        ),
+    ]
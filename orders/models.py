@@ -4,26 +4,12 @@ from django.db import models
 from django.core.validators import MinValueValidator
 
 from cinema.models import Showing
+from cinema.seats import SeatMap, format_seat
 from users.models import CustomUser
 
 
-class Order(models.Model):
-    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    date = models.DateField(auto_now_add=True)
-    tickets_amount = models.IntegerField(validators=[MinValueValidator(1)])
-    accepted = models.BooleanField(default=False)
-    showing = models.ForeignKey(Showing, on_delete=models.CASCADE)
-    client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='my_orders')
-    cashier_who_accepted = models.ForeignKey(CustomUser, on_delete=models.CASCADE,
-                                             null=True, blank=True, related_name='accepted_orders')
-
-    class Meta:
-        constraints = [
-            models.CheckConstraint(
-                name='correct_tickets_amount',
-                check=models.Q(tickets_amount__gte=1)
-            )
-        ]
+class OrderMixin:
+    """Methods of orders shared with archived orders (see archive.models)."""
 
     def is_accepted(self):
         return self.accepted
@@ -34,6 +20,12 @@ class Order(models.Model):
     def is_not_accepted(self):
         return (not self.is_accepted()) and (not self.is_rejected())
 
+    def get_seats(self):
+        return SeatMap.for_order(self).taken_seats()
+
+    def get_seats_string(self):
+        return ', '.join(format_seat(seat) for seat in self.get_seats())
+
     def is_accepted_string(self):
         if self.is_accepted():
             string = 'accepted'
@@ -47,3 +39,68 @@ class Order(models.Model):
         accepted = self.is_accepted_string()
         client = self.client.get_full_name()
         return f'Ticket #{self.uuid}: {self.showing} bought by {client} ({accepted})'
+
+
+class Order(OrderMixin, models.Model):
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date = models.DateField(auto_now_add=True)
+    tickets_amount = models.IntegerField(validators=[MinValueValidator(1)])
+    accepted = models.BooleanField(default=False)
+    # Indexed by order_showing_status_idx, which starts with it.
+    showing = models.ForeignKey(Showing, on_delete=models.CASCADE, db_index=False)
+    client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='my_orders')
+    cashier_who_accepted = models.ForeignKey(CustomUser, on_delete=models.CASCADE,
+                                             null=True, blank=True, related_name='accepted_orders')
+    # Bitmap of ordered seats (see cinema.seats.SeatMap).
+    seats = models.BinaryField(default=bytes, editable=False)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                name='correct_tickets_amount',
+                check=models.Q(tickets_amount__gte=1)
+            )
+        ]
+        indexes = [
+            # Taken places of a showing are summed up from its orders which were not rejected.
+            models.Index(fields=['showing', 'accepted', 'cashier_who_accepted'], name='order_showing_status_idx'),
+            # Cashiers' queue of orders waiting for acceptance, a small part of all orders.
+            models.Index(fields=['showing'], condition=models.Q(cashier_who_accepted__isnull=True),
+                         name='order_pending_idx'),
+        ]
+
+
+class WaitingRoom(models.Model):
+    """Opt-in admission control for a showing, see orders.waiting_room."""
+
+    showing = models.OneToOneField(Showing, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='waiting_room')
+    admissions_per_minute = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    # Size of token bucket, the most buyers admitted at once.
+    burst = models.PositiveIntegerField(default=10, validators=[MinValueValidator(1)])
+    # Time for admitted buyer to order tickets.
+    admission_minutes = models.PositiveIntegerField(default=10, validators=[MinValueValidator(1)])
+    is_active = models.BooleanField(default=True)
+
+    # State of the token bucket and the queue kept by DatabaseStore.
+    tokens = models.FloatField(default=0, editable=False)
+    refilled_at = models.DateTimeField(null=True, editable=False)
+    last_position = models.BigIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return f'Waiting room of {self.showing} ({self.admissions_per_minute} per minute)'
+
+
+class WaitingRoomEntry(models.Model):
+    room = models.ForeignKey(WaitingRoom, on_delete=models.CASCADE, related_name='entries')
+    client = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    position = models.BigIntegerField()
+    admitted_at = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'client'], name='unique_waiting_room_client'),
+        ]
+        indexes = [
+            models.Index(fields=['room', 'position'], name='waiting_room_position_idx'),
+        ]
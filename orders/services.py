@@ -0,0 +1,134 @@
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
+
+from .models import Order
+from cinema.events import publish_seats_changed
+from cinema.metrics import (
+    ORDERS_CREATED, ORDERS_REJECTED_FOR_LACK_OF_SEATS, ORDERS_FINALIZED, BOOKING_DURATION
+)
+from cinema.models import Showing
+from cinema.seats import SeatMap
+from reports.rollups import record_order_created, record_orders_finalized
+
+
+def _lock_showing(showing):
+    return Showing.objects.select_for_update(of=('self',)).select_related('hall').get(pk=showing.pk)
+
+
+@BOOKING_DURATION.time()
+def book_tickets(showing, client, tickets_amount, seats=None):
+    """Reserve places for given showing and create an order for them.
+
+    If `seats` are not given, the best available seats are picked. The
+    showing's row is locked until the order is inserted, so that
+    concurrent bookings cannot oversell the hall or book the same seat.
+    """
+
+    with transaction.atomic():
+        showing = _lock_showing(showing)
+
+        if showing.free_seats < tickets_amount:
+            ORDERS_REJECTED_FOR_LACK_OF_SEATS.inc()
+            raise ValidationError('Not enough available tickets.')
+
+        seat_map = SeatMap.for_showing(showing)
+        if seats:
+            if len(seats) != tickets_amount:
+                raise ValidationError('Amount of picked seats differs from amount of tickets.')
+            try:
+                seat_map.take(seats)
+            except ValidationError:
+                ORDERS_REJECTED_FOR_LACK_OF_SEATS.inc()
+                raise
+        else:
+            seats = seat_map.best_seats(tickets_amount)
+            if seats is None:
+                ORDERS_REJECTED_FOR_LACK_OF_SEATS.inc()
+                raise ValidationError('Not enough available tickets.')
+            seat_map.take(seats)
+
+        order_seats = SeatMap(showing.hall.rows, showing.hall.seats_in_row)
+        order_seats.take(seats)
+
+        Showing.objects.filter(pk=showing.pk).update(
+            seat_map=seat_map.to_bytes(),
+            taken_seats=models.F('taken_seats') + tickets_amount,
+            free_seats=models.F('free_seats') - tickets_amount
+        )
+        publish_seats_changed(showing, showing.free_seats - tickets_amount, taken=seats)
+
+        order = Order.objects.create(showing=showing, client=client, tickets_amount=tickets_amount,
+                                     seats=order_seats.to_bytes())
+        record_order_created(order)
+        ORDERS_CREATED.inc()
+        return order
+
+
+def release_tickets(order):
+    """Release places and seats taken by given order."""
+
+    release_orders_tickets([order])
+
+
+def release_orders_tickets(orders):
+    """Release places and seats taken by given orders, updating each of
+    their showings once."""
+
+    orders_by_showing = defaultdict(list)
+    for order in orders:
+        orders_by_showing[order.showing_id].append(order)
+
+    with transaction.atomic():
+        # Showings are locked in the same order by everyone to avoid deadlocks.
+        showings = Showing.objects.select_for_update(of=('self',)).select_related('hall').filter(
+            pk__in=orders_by_showing.keys()
+        ).order_by('pk')
+
+        for showing in showings:
+            showing_orders = orders_by_showing[showing.pk]
+            tickets_amount = sum(order.tickets_amount for order in showing_orders)
+
+            seat_map = SeatMap.for_showing(showing)
+            released = []
+            for order in showing_orders:
+                order_seats = SeatMap(showing.hall.rows, showing.hall.seats_in_row, order.seats)
+                released.extend(order_seats.taken_seats())
+            seat_map.release(released)
+
+            Showing.objects.filter(pk=showing.pk).update(
+                seat_map=seat_map.to_bytes(),
+                taken_seats=models.F('taken_seats') - tickets_amount,
+                free_seats=models.F('free_seats') + tickets_amount
+            )
+            publish_seats_changed(showing, showing.free_seats + tickets_amount, released=released)
+
+
+def finalize_orders(order_uuids, cashier, accepted):
+    """Accept or reject orders which have not been finalized yet.
+
+    Pending orders are locked and then finalized with a single conditional
+    UPDATE, so an order is finalized by exactly one cashier. Rejected orders
+    release their seats. Return tuple of lists of uuids: (finalized orders,
+    orders that were already finalized or do not exist).
+    """
+
+    order_uuids = set(order_uuids)
+
+    with transaction.atomic():
+        pending = list(
+            Order.objects.select_for_update().filter(pk__in=order_uuids, cashier_who_accepted__isnull=True)
+        )
+
+        Order.objects.filter(
+            pk__in=[order.pk for order in pending], cashier_who_accepted__isnull=True
+        ).update(cashier_who_accepted=cashier, accepted=accepted)
+        record_orders_finalized(pending, cashier, accepted)
+
+        if not accepted:
+            release_orders_tickets(pending)
+
+    finalized = [order.pk for order in pending]
+    ORDERS_FINALIZED.labels('accepted' if accepted else 'rejected').inc(len(finalized))
+    return finalized, list(order_uuids - set(finalized))
@@ -1,3 +1,193 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cinema.models import Movie, Hall, Showing
+from cinema.tests import CinemaTestCase
+from .models import Order, WaitingRoom, WaitingRoomEntry
+from .services import book_tickets
+from .waiting_room import Admission, DatabaseStore, WaitingRoomStore, check_admission
+
+
+class OrdersViewsQueriesTests(CinemaTestCase):
+    def test_create_order(self):
+        self.assertNumQueriesOfGet(4, reverse('create-order', args=[self.showing.pk]), self.client_user)
+
+    def test_cashier_queue(self):
+        self.assertNumQueriesOfGet(5, reverse('cashier-queue'), self.cashier)
+
+    def test_cashier_queue_filtered_by_hall_and_date(self):
+        url = f'{reverse("cashier-queue")}?hall={self.halls[0].pk}&date={self.showing.get_date().isoformat()}'
+        self.assertNumQueriesOfGet(6, url, self.cashier)
+
+    def test_accept_order(self):
+        order = self.orders[-1]
+        self.assertNumQueriesOfGet(6, reverse('accept-order', args=[order.pk]), self.cashier, status_code=302)
+
+    def test_reject_order(self):
+        order = self.orders[-1]
+        self.assertNumQueriesOfGet(10, reverse('reject-order', args=[order.pk]), self.cashier, status_code=302)
+
+    def test_finalize_orders(self):
+        orders = [order.pk for order in self.orders if order.showing == self.showing]
+        self.client.force_login(self.cashier)
+
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('finalize-orders'), {'orders': orders, 'action': 'accept'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(pk__in=orders, accepted=True).count(), len(orders))
+
+
+class BookingTests(TransactionTestCase):
+    """Bookings race in separate threads, each with its own database connection."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.clients = [User.objects.create_user(f'client{i}@example.com', 'password') for i in range(4)]
+
+        hall = Hall.objects.create(rows=1, seats_in_row=5)
+        movie = Movie.objects.create(title='Movie', director='Director', year_of_production=2000,
+                                     type='drama', duration_in_minutes=100, description='Description')
+        tomorrow = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0) \
+            + timezone.timedelta(days=1)
+        self.showing = Showing.objects.create(when=tomorrow, movie=movie, hall=hall)
+
+    def assertSeatsTaken(self, amount):
+        showing = Showing.objects.select_related('hall').get(pk=self.showing.pk)
+        self.assertEqual((showing.taken_seats, showing.free_seats), (amount, 5 - amount))
+        self.assertEqual(len(showing.get_seat_map().taken_seats()), amount)
+        self.assertEqual(sum(Order.objects.filter(showing=showing).values_list('tickets_amount', flat=True)), amount)
+
+    def test_more_tickets_than_free_seats_are_not_booked(self):
+        book_tickets(self.showing, self.clients[0], 4)
+
+        with self.assertRaisesMessage(ValidationError, 'Not enough available tickets.'):
+            book_tickets(self.showing, self.clients[1], 2)
+        self.assertSeatsTaken(4)
+
+    def book_concurrently(self, bookings):
+        """Book (client, tickets amount, seats) of every booking in its own thread at once,
+        return sorted list of results."""
+
+        barrier = threading.Barrier(len(bookings))
+        results = []
+
+        def book(client, tickets_amount, seats):
+            try:
+                barrier.wait()
+                book_tickets(self.showing, client, tickets_amount, seats=seats)
+                results.append('booked')
+            except ValidationError:
+                results.append('rejected')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=booking) for booking in bookings]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(results)
+
+    def test_concurrent_bookings_of_last_seats_do_not_oversell(self):
+        results = self.book_concurrently([(client, 2, None) for client in self.clients])
+
+        self.assertEqual(results, ['booked', 'booked', 'rejected', 'rejected'])
+        self.assertSeatsTaken(4)
+
+    def test_concurrent_bookings_of_the_same_seat(self):
+        results = self.book_concurrently([(self.clients[0], 2, [(1, 2), (1, 3)]),
+                                          (self.clients[1], 2, [(1, 3), (1, 4)])])
+
+        self.assertEqual(results, ['booked', 'rejected'])
+        self.assertSeatsTaken(2)
+
+
+class LeavingOnceStore(DatabaseStore):
+    """Store whose buyers leave the queue once right after joining, as if
+    from another tab."""
+
+    left = False
+
+    def admit(self, room, now):
+        super().admit(room, now)
+        if not LeavingOnceStore.left:
+            LeavingOnceStore.left = True
+            WaitingRoomEntry.objects.filter(room=room).delete()
+
+
+class WaitingRoomTests(CinemaTestCase):
+    def setUp(self):
+        super().setUp()
+        # A token every 30 seconds, one buyer admitted at once.
+        self.room = WaitingRoom.objects.create(showing=self.showing, admissions_per_minute=2, burst=1,
+                                               admission_minutes=10)
+        self.store = DatabaseStore()
+        self.now = timezone.now()
+
+    def join(self, client, now):
+        self.store.join(self.room, client, now)
+        self.store.admit(self.room, now)
+        return self.store.get_admission(self.room, client, now)
+
+    def test_first_buyer_is_admitted(self):
+        admission = check_admission(self.room, self.client_user)
+
+        self.assertTrue(admission.is_admitted)
+        self.assertEqual(admission.position, 1)
+
+    def test_next_buyers_get_positions_in_queue(self):
+        self.assertEqual(self.join(self.client_user, self.now),
+                         Admission(True, 1, 0, self.now + timezone.timedelta(minutes=10)))
+        self.assertEqual(self.join(self.other_client, self.now), Admission(False, 2, 0, None))
+        self.assertEqual(self.join(self.cashier, self.now), Admission(False, 3, 1, None))
+        # Joining again keeps the position.
+        self.assertEqual(self.join(self.cashier, self.now), Admission(False, 3, 1, None))
+
+    def test_buyers_are_admitted_at_refill_rate(self):
+        for client in (self.client_user, self.other_client, self.cashier):
+            self.join(client, self.now)
+
+        later = self.now + timezone.timedelta(seconds=30)
+        self.store.admit(self.room, later)
+
+        self.assertEqual(self.store.get_admission(self.room, self.other_client, later),
+                         Admission(True, 2, 0, later + timezone.timedelta(minutes=10)))
+        self.assertEqual(self.store.get_admission(self.room, self.cashier, later), Admission(False, 3, 0, None))
+
+    def test_buyer_queues_again_after_admission_expires(self):
+        self.join(self.client_user, self.now)
+        self.join(self.other_client, self.now)
+
+        expired = self.now + timezone.timedelta(minutes=10)
+        self.assertEqual(self.join(self.client_user, expired), Admission(False, 3, 0, None))
+        self.assertTrue(self.store.get_admission(self.room, self.other_client, expired).is_admitted)
+
+        readmitted = expired + timezone.timedelta(seconds=30)
+        self.store.admit(self.room, readmitted)
+        self.assertEqual(self.store.get_admission(self.room, self.client_user, readmitted),
+                         Admission(True, 3, 0, readmitted + timezone.timedelta(minutes=10)))
+
+    def test_buyer_who_is_not_in_queue_has_no_admission(self):
+        self.assertIsNone(self.store.get_admission(self.room, self.client_user, self.now))
+
+    @override_settings(CINEMA_WAITING_ROOM_STORE='orders.tests.LeavingOnceStore')
+    def test_buyer_removed_from_queue_meanwhile_joins_again(self):
+        LeavingOnceStore.left = False
+        admission = check_admission(self.room, self.client_user)
+
+        self.assertTrue(LeavingOnceStore.left)
+        self.assertEqual(admission.position, 2)
+
+    def test_stores_must_implement_whole_interface(self):
+        class IncompleteStore(WaitingRoomStore):
+            def join(self, room, client, now):
+                return 1
+
+        with self.assertRaises(TypeError):
+            IncompleteStore()
@@ -1,31 +1,40 @@
-from django.views.generic import CreateView
-from django.contrib.auth.mixins import LoginRequiredMixin
+import math
+
+from django.views.generic import CreateView, ListView
+from django.views.decorators.http import require_POST
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
-from django.shortcuts import get_object_or_404, redirect
-from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.utils import timezone
 
 from .models import Order
-from .forms import CreateOrderForm
+from .forms import CreateOrderForm, CashierQueueFilterForm, FinalizeOrdersForm
+from .services import book_tickets, finalize_orders
+from .waiting_room import get_active_room, check_admission, get_store
 from cinema.models import Showing
+from cinema.views import get_query_string_without_page
 
 
 def finalize_order(request, order_uuid, accepted):
     if not request.user.is_cashier:
         raise PermissionDenied
 
-    order = get_object_or_404(Order, pk=order_uuid)
+    finalized, _ = finalize_orders([order_uuid], request.user, accepted)
 
-    if not order.cashier_who_accepted:
-        order.cashier_who_accepted = request.user
-        order.accepted = accepted
-        order.save()
+    if finalized:
         messages.success(request, 'Order has been finalized successfully.')
+    elif Order.objects.filter(pk=order_uuid).exists():
+        messages.warning(request, 'Order has already been finalized.')
+    else:
+        raise Http404
 
-    return redirect('profile')
+    return redirect('cashier-queue')
 
 
 @login_required()
@@ -38,6 +47,83 @@ def reject_order_view(request, order_uuid):
     return finalize_order(request, order_uuid, False)
 
 
+@login_required()
+@require_POST
+def finalize_orders_view(request):
+    """Accept or reject many orders at once."""
+
+    if not request.user.is_cashier:
+        raise PermissionDenied
+
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('cashier-queue')
+
+    form = FinalizeOrdersForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, 'Select orders to finalize.')
+        return redirect(next_url)
+
+    accepted = form.cleaned_data['action'] == 'accept'
+    finalized, already_finalized = finalize_orders(form.cleaned_data['orders'], request.user, accepted)
+
+    if finalized:
+        action = 'accepted' if accepted else 'rejected'
+        messages.success(request, f'{len(finalized)} order(s) {action} successfully.')
+    if already_finalized:
+        orders = ', '.join(str(order_uuid) for order_uuid in sorted(already_finalized))
+        messages.warning(request, f'{len(already_finalized)} order(s) had already been finalized: {orders}')
+
+    return redirect(next_url)
+
+
+class CashierQueueView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    """Orders waiting for a cashier, filtered by showing, hall and date of showing."""
+
+    template_name = 'orders/cashier_queue.html'
+    context_object_name = 'orders'
+    paginate_by = 20
+
+    def test_func(self):
+        return self.request.user.is_cashier
+
+    def get_filter_form(self):
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = CashierQueueFilterForm(self.request.GET)
+        return self._filter_form
+
+    def get_queryset(self):
+        orders = Order.objects.filter(cashier_who_accepted__isnull=True).select_related(
+            'showing__movie', 'showing__hall', 'client'
+        )
+
+        form = self.get_filter_form()
+        filters = form.cleaned_data if form.is_valid() else {}
+
+        if filters.get('showing'):
+            orders = orders.filter(showing=filters['showing'])
+        if filters.get('hall'):
+            orders = orders.filter(showing__hall=filters['hall'])
+
+        if filters.get('date'):
+            day_start = timezone.make_aware(timezone.datetime.combine(
+                filters['date'], timezone.datetime.min.time()))
+            orders = orders.filter(showing__when__gte=day_start,
+                                   showing__when__lt=day_start + timezone.timedelta(days=1))
+        else:
+            # By default orders for all showings from the beginning of current day.
+            today = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+            orders = orders.filter(showing__when__gte=today)
+
+        return orders.order_by('showing__when', 'date', 'uuid')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filter_form'] = self.get_filter_form()
+        context['query_string'] = get_query_string_without_page(self.request)
+        return context
+
+
 class CreateOrderView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     model = Order
     form_class = CreateOrderForm
@@ -46,9 +132,21 @@ class CreateOrderView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     success_message = 'Tickets booked successfully!'
 
     def get_showing(self):
-        showing_uuid = self.kwargs['showing_uuid'] or None
-        showing = get_object_or_404(Showing, pk=showing_uuid)
-        return showing
+        # Showing is fetched once per request.
+        if not hasattr(self, '_showing'):
+            showing_uuid = self.kwargs['showing_uuid'] or None
+            self._showing = get_object_or_404(Showing.objects.with_availability(), pk=showing_uuid)
+        return self._showing
+
+    def get_seat_map(self):
+        if not hasattr(self, '_seat_map'):
+            self._seat_map = self.get_showing().get_seat_map()
+        return self._seat_map
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['seat_map'] = self.get_seat_map()
+        return kwargs
 
     def get(self, request, *args, **kwargs):
         # If showing has already taken place.
@@ -56,7 +154,7 @@ class CreateOrderView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
             messages.error(request, message='This showing has already taken place.')
             return redirect(reverse('schedule'))
 
-        return super().get(request, *args, **kwargs)
+        return self.wait_for_admission() or super().get(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
         # If showing has already taken place.
@@ -64,20 +162,52 @@ class CreateOrderView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
             messages.error(request, message='Cannot order: This showing has already taken place.')
             return redirect(reverse('schedule'))
 
-        return super().post(request, *args, **kwargs)
+        return self.wait_for_admission() or super().post(request, *args, **kwargs)
+
+    def wait_for_admission(self):
+        """Return waiting room page if the showing has an active waiting room
+        and the user has not been admitted to order yet."""
+
+        self.waiting_room = get_active_room(self.get_showing())
+        if self.waiting_room is None:
+            self.admission = None
+            return None
+
+        self.admission = check_admission(self.waiting_room, self.request.user)
+        if self.admission.is_admitted:
+            return None
+
+        minutes = math.ceil((self.admission.ahead + 1) / self.waiting_room.admissions_per_minute)
+        return render(self.request, 'orders/waiting_room.html', {
+            'showing': self.get_showing(),
+            'admission': self.admission,
+            'estimated_minutes': minutes,
+        })
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['showing'] = self.get_showing()
+        context['seat_rows'] = self.get_seat_map().layout()
+        context['admission'] = self.admission
 
         return context
 
     def form_valid(self, form):
-        form.instance.client = self.request.user
-        form.instance.showing = self.get_showing()
-
-        if form.instance.tickets_amount > form.instance.showing.free_places():
-            form.add_error(field='tickets_amount', error='Not enough available tickets.')
+        showing = self.get_showing()
+
+        try:
+            self.object = book_tickets(showing, self.request.user, form.cleaned_data['tickets_amount'],
+                                       seats=form.cleaned_data['seats'])
+        except ValidationError as e:
+            form.add_error(field=None, error=e)
+            # Show up to date amount of free places and seats.
+            showing.refresh_from_db(fields=('taken_seats', 'free_seats', 'seat_map'))
+            self._seat_map = showing.get_seat_map()
             return super().form_invalid(form)
 
-        return super().form_valid(form)
+        if self.waiting_room is not None:
+            get_store().leave(self.waiting_room, self.request.user)
+
+        messages.success(self.request, self.get_success_message(form.cleaned_data))
+
+        return redirect(self.get_success_url())
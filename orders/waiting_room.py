@@ -0,0 +1,145 @@
+"""Virtual waiting room for showings with high demand.
+
+When a showing has an active WaitingRoom, buyers opening its order form get
+a position in a queue instead. Buyers are admitted in order of their
+positions at a rate limited with a token bucket: the bucket is refilled with
+`admissions_per_minute` tokens per minute up to `burst` tokens, and every
+admitted buyer takes one. Admission expires after `admission_minutes`, after
+which the buyer has to queue again.
+
+State of the queue is kept by a store set with CINEMA_WAITING_ROOM_STORE
+setting, DatabaseStore keeps it in database tables.
+"""
+
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import WaitingRoom, WaitingRoomEntry
+
+# State of a buyer in a waiting room, `ahead` is the amount of buyers in
+# front of them that are not admitted yet.
+Admission = namedtuple('Admission', ('is_admitted', 'position', 'ahead', 'expires_at'))
+
+
+class WaitingRoomStore(ABC):
+    """Interface of stores of waiting rooms' state."""
+
+    @abstractmethod
+    def join(self, room, client, now):
+        """Add client at the end of the queue unless they are already in it,
+        or their admission expired. Return their position."""
+
+    @abstractmethod
+    def admit(self, room, now):
+        """Refill the token bucket and admit as many waiting clients as there
+        are tokens. May do nothing if another request is already admitting."""
+
+    @abstractmethod
+    def get_admission(self, room, client, now):
+        """Return Admission of client, or None if they are not in the queue
+        (e.g they left it or their admission expired since they joined)."""
+
+    @abstractmethod
+    def leave(self, room, client):
+        """Remove client from the queue, e.g after they ordered tickets."""
+
+
+class DatabaseStore(WaitingRoomStore):
+    """Store keeping the token bucket in WaitingRoom row and the queue in
+    WaitingRoomEntry table, so that no other service is needed."""
+
+    def join(self, room, client, now):
+        entry = WaitingRoomEntry.objects.filter(room=room, client=client).first()
+        if entry is not None and not self._is_expired(room, entry, now):
+            return entry.position
+
+        with transaction.atomic():
+            # Positions are given out under the lock of the room's row.
+            room = WaitingRoom.objects.select_for_update().get(pk=room.pk)
+            room.last_position += 1
+            WaitingRoom.objects.filter(pk=room.pk).update(last_position=room.last_position)
+
+            WaitingRoomEntry.objects.update_or_create(
+                room=room, client=client,
+                defaults={'position': room.last_position, 'admitted_at': None}
+            )
+
+        return room.last_position
+
+    def admit(self, room, now):
+        with transaction.atomic():
+            # Only one request refills the bucket at a time, others do not wait for it.
+            room = WaitingRoom.objects.select_for_update(skip_locked=True).filter(pk=room.pk).first()
+            if room is None:
+                return
+
+            tokens = room.burst if room.refilled_at is None else min(
+                room.burst,
+                room.tokens + (now - room.refilled_at).total_seconds() * room.admissions_per_minute / 60
+            )
+
+            admitted = 0
+            if tokens >= 1:
+                waiting = WaitingRoomEntry.objects.filter(room=room, admitted_at__isnull=True) \
+                    .order_by('position').values_list('pk', flat=True)[:int(tokens)]
+                admitted = WaitingRoomEntry.objects.filter(pk__in=list(waiting)).update(admitted_at=now)
+
+            WaitingRoom.objects.filter(pk=room.pk).update(tokens=tokens - admitted, refilled_at=now)
+
+            # Forget buyers whose admission expired and who did not come back.
+            WaitingRoomEntry.objects.filter(
+                room=room, admitted_at__lte=now - timezone.timedelta(minutes=room.admission_minutes)
+            ).delete()
+
+    def get_admission(self, room, client, now):
+        entry = WaitingRoomEntry.objects.filter(room=room, client=client).first()
+        if entry is None:
+            return None
+
+        if entry.admitted_at is not None:
+            return Admission(True, entry.position, 0, self._get_expiry(room, entry))
+
+        ahead = WaitingRoomEntry.objects.filter(
+            room=room, admitted_at__isnull=True, position__lt=entry.position
+        ).count()
+        return Admission(False, entry.position, ahead, None)
+
+    def leave(self, room, client):
+        WaitingRoomEntry.objects.filter(room=room, client=client).delete()
+
+    @staticmethod
+    def _get_expiry(room, entry):
+        return entry.admitted_at + timezone.timedelta(minutes=room.admission_minutes)
+
+    def _is_expired(self, room, entry, now):
+        return entry.admitted_at is not None and self._get_expiry(room, entry) <= now
+
+
+def get_store():
+    return import_string(settings.CINEMA_WAITING_ROOM_STORE)()
+
+
+def get_active_room(showing):
+    return WaitingRoom.objects.filter(showing=showing, is_active=True).first()
+
+
+def check_admission(room, client):
+    """Put client in the queue of the room if needed, admit next buyers and
+    return Admission of the client."""
+
+    store = get_store()
+    now = timezone.now()
+
+    while True:
+        store.join(room, client, now)
+        store.admit(room, now)
+        admission = store.get_admission(room, client, now)
+        if admission is not None:
+            return admission
+        # Removed from the queue by a concurrent request (e.g admitting next buyers
+        # a moment later or leaving in another tab) after joining it, join again.
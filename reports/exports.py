@@ -0,0 +1,205 @@
+"""Streaming exports of orders and showings as CSV or JSON Lines.
+
+Rows are read with a query per table joining all needed tables, as plain
+values in chunks (with a server-side cursor on PostgreSQL), and written
+out as they come, so memory used does not depend on the amount of rows.
+Rows of archived days (see archive.archiving) are merged in, so exports of
+past periods stay complete.
+"""
+
+import csv
+import heapq
+import tempfile
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, When, Value, CharField, Q, F
+from django.utils import timezone
+
+from archive.models import ArchivedShowing, ArchivedOrder
+from cinema.models import Showing
+from cinema.seats import SeatMap, format_seat
+from orders.models import Order
+
+# Rows read from the database at once and written out at once.
+CHUNK_SIZE = 2000
+
+# Bytes of a spooled export kept in memory, larger ones are written to disk.
+SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+ORDER_COLUMNS = {
+    'uuid': 'uuid',
+    'date': 'date',
+    'status': 'status',
+    'tickets_amount': 'tickets_amount',
+    'seats': 'seats',
+    'showing': 'showing_id',
+    'showing_when': 'showing__when',
+    'movie': 'showing__movie__title',
+    'hall': 'showing__hall_id',
+    'client_email': 'client__email',
+    'client_first_name': 'client__first_name',
+    'client_last_name': 'client__last_name',
+    'cashier_email': 'cashier_who_accepted__email',
+}
+
+SHOWING_COLUMNS = {
+    'uuid': 'uuid',
+    'when': 'when',
+    'ends_at': 'ends_at',
+    'movie': 'movie__title',
+    'hall': 'hall_id',
+    'places': 'hall__places',
+    'taken_seats': 'taken_seats',
+    'free_seats': 'free_seats',
+}
+
+
+STATUSES = {
+    'accepted': Q(accepted=True),
+    'rejected': Q(accepted=False, cashier_who_accepted__isnull=False),
+    'pending': Q(cashier_who_accepted__isnull=True),
+}
+
+
+def get_day_bounds(filters):
+    bounds = {}
+    if filters.get('since'):
+        bounds['gte'] = timezone.make_aware(timezone.datetime.combine(filters['since'], timezone.datetime.min.time()))
+    if filters.get('until'):
+        bounds['lt'] = timezone.make_aware(timezone.datetime.combine(
+            filters['until'] + timezone.timedelta(days=1), timezone.datetime.min.time()
+        ))
+    return bounds
+
+
+def get_orders(filters):
+    """Return rows of orders of showings from given days, of given showing,
+    movie and status (see ExportFilterForm), archived ones included."""
+
+    return heapq.merge(
+        get_order_rows(ArchivedOrder.objects.all(), filters),
+        get_order_rows(Order.objects.all(), filters),
+        key=itemgetter('showing__when', 'showing_id', 'uuid'),
+    )
+
+
+def get_order_rows(orders, filters):
+    orders = orders.annotate(status=Case(
+        When(accepted=True, then=Value('accepted')),
+        When(cashier_who_accepted__isnull=False, then=Value('rejected')),
+        default=Value('pending'),
+        output_field=CharField(),
+    ))
+
+    for lookup, value in get_day_bounds(filters).items():
+        orders = orders.filter(**{f'showing__when__{lookup}': value})
+    if filters.get('showing'):
+        orders = orders.filter(showing=filters['showing'])
+    if filters.get('movie'):
+        orders = orders.filter(showing__movie=filters['movie'])
+    if filters.get('status'):
+        orders = orders.filter(STATUSES[filters['status']])
+
+    fields = [field for field in ORDER_COLUMNS.values() if field != 'seats']
+    rows = orders.values(*fields, 'seats', 'showing__hall__rows', 'showing__hall__seats_in_row') \
+        .order_by('showing__when', 'showing', 'uuid')
+
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        seat_map = SeatMap(row.pop('showing__hall__rows'), row.pop('showing__hall__seats_in_row'), row['seats'])
+        row['seats'] = ' '.join(format_seat(seat) for seat in seat_map.taken_seats())
+        row['showing__when'] = timezone.localtime(row['showing__when'])
+        yield row
+
+
+def get_showings(filters):
+    """Return rows of showings from given days of given movie, archived ones
+    included."""
+
+    archived_showings = ArchivedShowing.objects.annotate(free_seats=F('hall__places') - F('taken_seats'))
+    return heapq.merge(
+        get_showing_rows(archived_showings, filters),
+        get_showing_rows(Showing.objects.all(), filters),
+        key=itemgetter('when', 'uuid'),
+    )
+
+
+def get_showing_rows(showings, filters):
+    for lookup, value in get_day_bounds(filters).items():
+        showings = showings.filter(**{f'when__{lookup}': value})
+    if filters.get('showing'):
+        showings = showings.filter(pk=filters['showing'])
+    if filters.get('movie'):
+        showings = showings.filter(movie=filters['movie'])
+
+    rows = showings.values(*SHOWING_COLUMNS.values()).order_by('when', 'uuid')
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        row['when'] = timezone.localtime(row['when'])
+        row['ends_at'] = timezone.localtime(row['ends_at'])
+        yield row
+
+
+EXPORTS = {
+    'orders': (get_orders, ORDER_COLUMNS),
+    'showings': (get_showings, SHOWING_COLUMNS),
+}
+
+
+class Echo:
+    """File-like object returning what is written, so that csv.writer
+    produces lines instead of writing them to a buffer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns.keys())
+
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([row[field] for field in columns.values()]))
+        if len(chunk) == CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def iter_jsonl(rows, columns):
+    encoder = DjangoJSONEncoder()
+
+    chunk = []
+    for row in rows:
+        chunk.append(encoder.encode({column: row[field] for column, field in columns.items()}) + '\n')
+        if len(chunk) == CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'jsonl': (iter_jsonl, 'application/jsonl'),
+}
+
+
+def export(kind, file_format, filters):
+    """Return iterator of chunks of text of export of kind ('orders' or
+    'showings') in file_format ('csv' or 'jsonl') filtered with filters."""
+
+    get_rows, columns = EXPORTS[kind]
+    write, _ = FORMATS[file_format]
+    return write(get_rows(filters), columns)
+
+
+def spool(chunks):
+    """Write chunks of an export to a temporary file and return it opened for
+    reading from the start, for servers which cannot run queries while
+    sending the response (see ExportView)."""
+
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in chunks:
+        file.write(chunk.encode())
+    file.seek(0)
+    return file
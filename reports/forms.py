@@ -0,0 +1,32 @@
+from django.core.exceptions import ValidationError
+from django.forms import Form, DateField, DateInput, ChoiceField, UUIDField, ModelChoiceField
+
+from cinema.models import Movie
+
+
+class ReportFilterForm(Form):
+    since = DateField(required=False, input_formats=['%d/%m/%Y', '%Y-%m-%d'],
+                      widget=DateInput(attrs={'placeholder': 'dd/mm/yyyy'}))
+    until = DateField(required=False, input_formats=['%d/%m/%Y', '%Y-%m-%d'],
+                      widget=DateInput(attrs={'placeholder': 'dd/mm/yyyy'}))
+    period = ChoiceField(required=False, choices=[('week', 'Week'), ('day', 'Day'), ('month', 'Month')])
+
+    def clean(self):
+        cleaned_data = super().clean()
+        since, until = cleaned_data.get('since'), cleaned_data.get('until')
+
+        if since and until and since > until:
+            raise ValidationError('First day is after the last one.')
+
+        return cleaned_data
+
+
+class ExportFilterForm(ReportFilterForm):
+    """Filters of exports, days are days of showings."""
+
+    period = None
+    showing = UUIDField(required=False)
+    movie = ModelChoiceField(Movie.objects.all(), required=False, to_field_name='slug')
+    status = ChoiceField(required=False, choices=[('', 'Any'), ('accepted', 'Accepted'), ('rejected', 'Rejected'),
+                                                  ('pending', 'Pending')])
+    format = ChoiceField(required=False, choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')])
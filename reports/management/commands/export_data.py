@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.exports import EXPORTS, FORMATS, export
+from reports.forms import ExportFilterForm
+
+
+class Command(BaseCommand):
+    help = 'Write orders or showings matching filters as CSV or JSON Lines, without loading them all into memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORTS.keys())
+        parser.add_argument('--format', choices=FORMATS.keys(), default='csv')
+        parser.add_argument('--since', help='First day of showings (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Last day of showings (YYYY-MM-DD).')
+        parser.add_argument('--showing', help='UUID of the showing.')
+        parser.add_argument('--movie', help='Slug of the movie.')
+        parser.add_argument('--status', choices=['accepted', 'rejected', 'pending'], help='Status of orders.')
+        parser.add_argument('--output', help='Path of the file to write, by default standard output.')
+
+    def handle(self, *args, **options):
+        form = ExportFilterForm({field: options[field] for field in ('since', 'until', 'showing', 'movie', 'status')
+                                 if options[field]})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        chunks = export(options['kind'], options['format'], form.cleaned_data)
+        if options['output'] is None:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Written {options["kind"]} to {options["output"]}.'))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from archive.models import ArchivedShowing
+from cinema.models import Showing
+from reports.rollups import rebuild_rollups, get_local_date
+
+
+def parse_date(value):
+    try:
+        return timezone.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Incorrect date {value!r}, expected YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Recompute report rollups of given days (by default of all days with showings) from showings ' \
+           'and orders, a chunk of days at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_date, help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--until', type=parse_date, help='Last day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--days-per-chunk', type=int, default=7,
+                            help='Amount of days rebuilt in one transaction.')
+
+    def handle(self, *args, **options):
+        if options['days_per_chunk'] < 1:
+            raise CommandError('At least one day per chunk is needed.')
+
+        bounds = Showing.objects.aggregate(first=Min('when'), last=Max('when'))
+        if bounds['first'] is None:
+            self.stdout.write('There are no showings.')
+            return
+
+        since = options['since'] or get_local_date(bounds['first'])
+        until = options['until'] or get_local_date(bounds['last'])
+        if since > until:
+            raise CommandError('First day is after the last one.')
+
+        # Orders of archived days are not in the hot tables anymore, their rollups are final.
+        last_archived = ArchivedShowing.objects.aggregate(last=Max('when'))['last']
+        if last_archived is not None and since <= get_local_date(last_archived):
+            raise CommandError(f'Days until {get_local_date(last_archived)} are archived, '
+                               f'their rollups cannot be rebuilt.')
+
+        showings = 0
+        first_day = since
+        while first_day <= until:
+            last_day = min(first_day + timezone.timedelta(days=options['days_per_chunk'] - 1), until)
+            showings += rebuild_rollups(first_day, last_day)
+            self.stdout.write(f'Rebuilt {first_day} - {last_day}.')
+            first_day = last_day + timezone.timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups of {showings} showing(s) from {since} to {until}.'))
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('cinema', '0020_catalogversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowingStats',
+            fields=[
+                ('orders', models.IntegerField(default=0)),
+                ('tickets', models.IntegerField(default=0)),
+                ('accepted_tickets', models.IntegerField(default=0)),
+                ('rejected_tickets', models.IntegerField(default=0)),
+                ('showing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='cinema.showing')),
+                ('date', models.DateField()),
+                ('places', models.IntegerField(default=0)),
+                ('hall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.hall')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieDayStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('tickets', models.IntegerField(default=0)),
+                ('accepted_tickets', models.IntegerField(default=0)),
+                ('rejected_tickets', models.IntegerField(default=0)),
+                ('date', models.DateField()),
+                ('showings', models.IntegerField(default=0)),
+                ('places', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HallDayStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.IntegerField(default=0)),
+                ('tickets', models.IntegerField(default=0)),
+                ('accepted_tickets', models.IntegerField(default=0)),
+                ('rejected_tickets', models.IntegerField(default=0)),
+                ('date', models.DateField()),
+                ('showings', models.IntegerField(default=0)),
+                ('places', models.IntegerField(default=0)),
+                ('hall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.hall')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CashierDayStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('accepted_orders', models.IntegerField(default=0)),
+                ('accepted_tickets', models.IntegerField(default=0)),
+                ('rejected_orders', models.IntegerField(default=0)),
+                ('rejected_tickets', models.IntegerField(default=0)),
+                ('cashier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='showingstats',
+            index=models.Index(fields=['date'], name='showing_stats_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moviedaystats',
+            index=models.Index(fields=['date'], name='movie_day_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='moviedaystats',
+            constraint=models.UniqueConstraint(fields=('movie', 'date'), name='unique_movie_day_stats'),
+        ),
+        migrations.AddIndex(
+            model_name='halldaystats',
+            index=models.Index(fields=['date'], name='hall_day_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='halldaystats',
+            constraint=models.UniqueConstraint(fields=('hall', 'date'), name='unique_hall_day_stats'),
+        ),
+        migrations.AddIndex(
+            model_name='cashierdaystats',
+            index=models.Index(fields=['date'], name='cashier_day_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cashierdaystats',
+            constraint=models.UniqueConstraint(fields=('cashier', 'date'), name='unique_cashier_day_stats'),
+        ),
+    ]
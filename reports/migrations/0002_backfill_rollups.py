@@ -0,0 +1,70 @@
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+SALES_FIELDS = ('orders', 'tickets', 'accepted_tickets', 'rejected_tickets')
+
+
+def backfill_rollups(apps, schema_editor):
+    """Compute rollups of showings and orders made before rollups existed,
+    as reports.rollups.rebuild_rollups does."""
+
+    Showing = apps.get_model('cinema', 'Showing')
+    Order = apps.get_model('orders', 'Order')
+    ShowingStats = apps.get_model('reports', 'ShowingStats')
+    MovieDayStats = apps.get_model('reports', 'MovieDayStats')
+    HallDayStats = apps.get_model('reports', 'HallDayStats')
+    CashierDayStats = apps.get_model('reports', 'CashierDayStats')
+
+    rejected = Q(accepted=False, cashier_who_accepted__isnull=False)
+    sales = {
+        row['showing']: row
+        for row in Order.objects.values('showing').annotate(
+            orders=Count('pk'),
+            tickets=Sum('tickets_amount', filter=~rejected),
+            accepted_tickets=Sum('tickets_amount', filter=Q(accepted=True)),
+            rejected_tickets=Sum('tickets_amount', filter=rejected),
+        ).order_by()
+    }
+
+    showing_stats, day_stats, dates = [], {}, {}
+    for showing_uuid, movie_id, hall_id, when, places in Showing.objects.order_by() \
+            .values_list('uuid', 'movie_id', 'hall_id', 'when', 'hall__places').iterator():
+        date = dates[showing_uuid] = timezone.localtime(when).date()
+        showing_sales = sales.get(showing_uuid, {})
+        counts = {field: showing_sales.get(field) or 0 for field in SALES_FIELDS}
+
+        showing_stats.append(ShowingStats(showing_id=showing_uuid, date=date, movie_id=movie_id, hall_id=hall_id,
+                                          places=places, **counts))
+        for key in ((MovieDayStats, 'movie_id', movie_id, date), (HallDayStats, 'hall_id', hall_id, date)):
+            day_stats.setdefault(key, Counter()).update(counts, showings=1, places=places)
+
+    cashier_sales = Order.objects.filter(cashier_who_accepted__isnull=False) \
+        .values('showing', 'cashier_who_accepted', 'accepted') \
+        .annotate(orders=Count('pk'), tickets=Sum('tickets_amount')).order_by()
+    for row in cashier_sales:
+        result = 'accepted' if row['accepted'] else 'rejected'
+        key = (CashierDayStats, 'cashier_id', row['cashier_who_accepted'], dates[row['showing']])
+        day_stats.setdefault(key, Counter()).update({f'{result}_orders': row['orders'],
+                                                     f'{result}_tickets': row['tickets']})
+
+    ShowingStats.objects.bulk_create(showing_stats, batch_size=1000)
+    for model in (MovieDayStats, HallDayStats, CashierDayStats):
+        model.objects.bulk_create([
+            model(date=date, **{field: object_id}, **totals)
+            for (stats_model, field, object_id, date), totals in day_stats.items() if stats_model is model
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_indexes'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+"""Rollup tables of sales and occupancy, kept up to date by reports.rollups.
+
+All statistics are assigned to the (local) day of the showing. Tickets are
+counted for orders that were not rejected, so they are the places taken.
+"""
+
+from django.db import models
+
+from cinema.models import Movie, Hall, Showing
+from users.models import CustomUser
+
+
+class SalesStats(models.Model):
+    orders = models.IntegerField(default=0)
+    tickets = models.IntegerField(default=0)
+    accepted_tickets = models.IntegerField(default=0)
+    rejected_tickets = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ShowingStats(SalesStats):
+    showing = models.OneToOneField(Showing, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    date = models.DateField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    hall = models.ForeignKey(Hall, on_delete=models.CASCADE, related_name='+')
+    places = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='showing_stats_date_idx'),
+        ]
+
+
+class MovieDayStats(SalesStats):
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    showings = models.IntegerField(default=0)
+    places = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'date'], name='unique_movie_day_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='movie_day_stats_date_idx'),
+        ]
+
+
+class HallDayStats(SalesStats):
+    hall = models.ForeignKey(Hall, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    showings = models.IntegerField(default=0)
+    places = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hall', 'date'], name='unique_hall_day_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='hall_day_stats_date_idx'),
+        ]
+
+
+class CashierDayStats(models.Model):
+    cashier = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    accepted_orders = models.IntegerField(default=0)
+    accepted_tickets = models.IntegerField(default=0)
+    rejected_orders = models.IntegerField(default=0)
+    rejected_tickets = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cashier', 'date'], name='unique_cashier_day_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='cashier_day_stats_date_idx'),
+        ]
@@ -0,0 +1,300 @@
+"""Incremental updates and rebuilds of report rollups (see reports.models).
+
+Bookings and finalizations of orders, and created showings, update rollups
+with increments once their transaction commits, in a separate short
+transaction, so that bookings of different showings of the same movie do
+not wait for each other on its rollup row. Sales of edited showings are
+moved to rollups of their new day, movie or hall, and sales of deleted ones
+are subtracted, all under the lock of the showing's stats row. Other changes
+(e.g orders deleted in admin or halls resized) are fixed by rebuild_reports
+command, which rebuilds whole days.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import ShowingStats, MovieDayStats, HallDayStats, CashierDayStats
+from cinema.models import Showing
+from orders.models import Order
+
+SALES_FIELDS = ('orders', 'tickets', 'accepted_tickets', 'rejected_tickets')
+
+REJECTED = Q(accepted=False, cashier_who_accepted__isnull=False)
+
+# Day rollups and their key fields besides date, in the order their rows are locked.
+DAY_STATS_KEYS = {MovieDayStats: 'movie_id', HallDayStats: 'hall_id', CashierDayStats: 'cashier_id'}
+
+
+def get_local_date(value):
+    return timezone.localtime(value).date()
+
+
+def _increment(model, keys, deltas, defaults=None):
+    """Add deltas to fields of the row identified by keys, creating it if needed."""
+
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    expressions = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**keys).update(**expressions):
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(defaults or {}), **deltas)
+    except IntegrityError:
+        # Created concurrently in the meantime.
+        model.objects.filter(**keys).update(**expressions)
+
+
+def _collect_day_deltas(day_deltas, movie_id, hall_id, date, deltas):
+    day_deltas[(MovieDayStats, movie_id, date)].update(deltas)
+    day_deltas[(HallDayStats, hall_id, date)].update(deltas)
+
+
+def _add_to_day_stats(day_deltas):
+    """Add deltas to day rollups, day_deltas is a dict of (model, id of movie,
+    hall or cashier, date) -> Counter.
+
+    Rows are updated in order of their model and keys, so that transactions
+    updating rollups of the same days (e.g finalizations of orders of many
+    showings) lock them in the same order and cannot deadlock.
+    """
+
+    models = list(DAY_STATS_KEYS)
+    for (model, object_id, date), deltas in sorted(
+            day_deltas.items(), key=lambda item: (models.index(item[0][0]), item[0][1], item[0][2])):
+        _increment(model, {DAY_STATS_KEYS[model]: object_id, 'date': date}, deltas)
+
+
+def _add_sales(showing_sales):
+    """Add sales of showings, a dict of (showing uuid, movie id, hall id, date) -> Counter,
+    return dict of showing uuid -> date the sales were added to.
+
+    Rollups of a showing are found by its locked stats row, as the showing
+    might have been moved since the sales were made (see record_showing_changed).
+    Stats rows are locked in order of showings, and then day rollups are
+    updated, see _add_to_day_stats.
+    """
+
+    dates, day_deltas = {}, defaultdict(Counter)
+    with transaction.atomic():
+        for (showing_uuid, movie_id, hall_id, date), deltas in sorted(showing_sales.items()):
+            current = ShowingStats.objects.select_for_update().filter(showing_id=showing_uuid) \
+                .values_list('movie_id', 'hall_id', 'date').first()
+            if current is not None:
+                movie_id, hall_id, date = current
+            elif not Showing.objects.filter(pk=showing_uuid).exists():
+                # Deleted in the meantime, its sales were subtracted without these.
+                continue
+
+            _increment(ShowingStats, {'showing_id': showing_uuid}, deltas,
+                       defaults={'movie_id': movie_id, 'hall_id': hall_id, 'date': date})
+            _collect_day_deltas(day_deltas, movie_id, hall_id, date, deltas)
+            dates[showing_uuid] = date
+
+        _add_to_day_stats(day_deltas)
+
+    return dates
+
+
+def _get_cashier_sales(showing_uuid):
+    return Order.objects.filter(showing=showing_uuid, cashier_who_accepted__isnull=False) \
+        .values('cashier_who_accepted', 'accepted') \
+        .annotate(orders=Count('pk'), tickets=Sum('tickets_amount')).order_by()
+
+
+def _collect_showing_totals(day_deltas, stats, sign, cashier_sales):
+    """Collect deltas adding (sign 1) or subtracting (sign -1) a showing's stats row
+    and its cashiers' sales to or from rollups of its day."""
+
+    deltas = {field: sign * getattr(stats, field) for field in SALES_FIELDS}
+    _collect_day_deltas(day_deltas, stats.movie_id, stats.hall_id, stats.date,
+                        dict(deltas, showings=sign, places=sign * stats.places))
+
+    for row in cashier_sales:
+        result = 'accepted' if row['accepted'] else 'rejected'
+        day_deltas[(CashierDayStats, row['cashier_who_accepted'], stats.date)].update({
+            f'{result}_orders': sign * row['orders'], f'{result}_tickets': sign * row['tickets'],
+        })
+
+
+def record_order_created(order):
+    showing = order.showing
+    key = (showing.pk, showing.movie_id, showing.hall_id, showing.get_date())
+    deltas = Counter(orders=1, tickets=order.tickets_amount)
+
+    transaction.on_commit(lambda: _add_sales({key: deltas}))
+
+
+def record_orders_finalized(orders, cashier, accepted):
+    """Record orders accepted or rejected by cashier."""
+
+    tickets_by_showing = defaultdict(Counter)
+    for order in orders:
+        tickets_by_showing[order.showing_id].update(orders=1, tickets=order.tickets_amount)
+
+    def add_finalized():
+        showings = Showing.objects.filter(pk__in=tickets_by_showing.keys()) \
+            .values_list('uuid', 'movie_id', 'hall_id', 'when')
+
+        showing_sales, cashier_sales = {}, defaultdict(Counter)
+        for showing_uuid, movie_id, hall_id, when in showings:
+            finalized = tickets_by_showing[showing_uuid]
+            if accepted:
+                deltas = Counter(accepted_tickets=finalized['tickets'])
+            else:
+                # Tickets of rejected orders are not counted as taken places anymore.
+                deltas = Counter(tickets=-finalized['tickets'], rejected_tickets=finalized['tickets'])
+            showing_sales[(showing_uuid, movie_id, hall_id, get_local_date(when))] = deltas
+
+        result = 'accepted' if accepted else 'rejected'
+        with transaction.atomic():
+            for showing_uuid, date in _add_sales(showing_sales).items():
+                finalized = tickets_by_showing[showing_uuid]
+                cashier_sales[(CashierDayStats, cashier.pk, date)].update({
+                    f'{result}_orders': finalized['orders'], f'{result}_tickets': finalized['tickets'],
+                })
+            # Cashiers' rollups are locked last, after rollups of movies and halls.
+            _add_to_day_stats(cashier_sales)
+
+    if tickets_by_showing:
+        transaction.on_commit(add_finalized)
+
+
+def record_showings_created(showings):
+    def add_showings():
+        day_deltas = defaultdict(Counter)
+        stats = []
+        for showing in showings:
+            date = showing.get_date()
+            stats.append(ShowingStats(showing_id=showing.pk, date=date, movie_id=showing.movie_id,
+                                      hall_id=showing.hall_id, places=showing.hall.places))
+            _collect_day_deltas(day_deltas, showing.movie_id, showing.hall_id, date,
+                                {'showings': 1, 'places': showing.hall.places})
+
+        with transaction.atomic():
+            ShowingStats.objects.bulk_create(stats, ignore_conflicts=True)
+            _add_to_day_stats(day_deltas)
+
+    transaction.on_commit(add_showings)
+
+
+def record_showing_changed(showing):
+    """Move sales of an edited showing to rollups of its day, movie and hall,
+    if any of them changed, once the current transaction commits."""
+
+    def move_showing():
+        with transaction.atomic():
+            stats = ShowingStats.objects.select_for_update().filter(showing_id=showing.pk).first()
+            current = Showing.objects.filter(pk=showing.pk) \
+                .values_list('movie_id', 'hall_id', 'when', 'hall__places').first()
+            if stats is None or current is None:
+                return
+
+            movie_id, hall_id, when, places = current
+            date = get_local_date(when)
+            if (stats.movie_id, stats.hall_id, stats.date, stats.places) == (movie_id, hall_id, date, places):
+                return
+
+            # Cashiers' rollups only depend on the day.
+            cashier_sales = list(_get_cashier_sales(showing.pk)) if date != stats.date else []
+            day_deltas = defaultdict(Counter)
+            _collect_showing_totals(day_deltas, stats, -1, cashier_sales)
+            stats.movie_id, stats.hall_id, stats.date, stats.places = movie_id, hall_id, date, places
+            stats.save()
+            _collect_showing_totals(day_deltas, stats, 1, cashier_sales)
+            _add_to_day_stats(day_deltas)
+
+    transaction.on_commit(move_showing)
+
+
+def record_showing_deleted(showing):
+    """Subtract sales of a showing about to be deleted from rollups of its day.
+
+    Called in the deleting transaction while the showing's stats row still
+    exists, so that the subtraction is rolled back with the deletion.
+    """
+
+    stats = ShowingStats.objects.select_for_update().filter(showing_id=showing.pk).first()
+    if stats is not None:
+        day_deltas = defaultdict(Counter)
+        _collect_showing_totals(day_deltas, stats, -1, list(_get_cashier_sales(showing.pk)))
+        _add_to_day_stats(day_deltas)
+
+
+def rebuild_rollups(first_day, last_day):
+    """Recompute rollups of days from first_day to last_day (inclusive) from
+    showings and orders, return the amount of showings.
+
+    Changes of orders of these days made while rebuilding may be lost, so
+    days with ongoing sales should be rebuilt when the cinema is closed.
+    """
+
+    start = timezone.make_aware(timezone.datetime.combine(first_day, timezone.datetime.min.time()))
+    end = timezone.make_aware(timezone.datetime.combine(
+        last_day + timezone.timedelta(days=1), timezone.datetime.min.time()
+    ))
+    showings = Showing.objects.filter(when__gte=start, when__lt=end)
+
+    sales = {
+        row['showing']: row
+        for row in Order.objects.filter(showing__in=showings).values('showing').annotate(
+            orders=Count('pk'),
+            tickets=Sum('tickets_amount', filter=~REJECTED),
+            accepted_tickets=Sum('tickets_amount', filter=Q(accepted=True)),
+            rejected_tickets=Sum('tickets_amount', filter=REJECTED),
+        ).order_by()
+    }
+    cashier_sales = Order.objects.filter(showing__in=showings, cashier_who_accepted__isnull=False) \
+        .values('showing', 'cashier_who_accepted', 'accepted') \
+        .annotate(orders=Count('pk'), tickets=Sum('tickets_amount')).order_by()
+
+    showing_stats, day_stats, dates = [], {}, {}
+    for showing_uuid, movie_id, hall_id, when, places in showings.order_by() \
+            .values_list('uuid', 'movie_id', 'hall_id', 'when', 'hall__places'):
+        date = dates[showing_uuid] = get_local_date(when)
+        showing_sales = sales.get(showing_uuid, {})
+
+        stats = ShowingStats(showing_id=showing_uuid, date=date, movie_id=movie_id, hall_id=hall_id, places=places,
+                             **{field: showing_sales.get(field) or 0 for field in SALES_FIELDS})
+        showing_stats.append(stats)
+
+        for model, keys in ((MovieDayStats, {'movie_id': movie_id}), (HallDayStats, {'hall_id': hall_id})):
+            key = (model, *keys.values(), date)
+            if key not in day_stats:
+                day_stats[key] = model(date=date, **keys)
+
+            totals = day_stats[key]
+            totals.showings += 1
+            totals.places += places
+            for field in SALES_FIELDS:
+                setattr(totals, field, getattr(totals, field) + getattr(stats, field))
+
+    cashier_stats = {}
+    for row in cashier_sales:
+        key = (row['cashier_who_accepted'], dates[row['showing']])
+        if key not in cashier_stats:
+            cashier_stats[key] = CashierDayStats(cashier_id=key[0], date=key[1])
+
+        totals = cashier_stats[key]
+        result = 'accepted' if row['accepted'] else 'rejected'
+        setattr(totals, f'{result}_orders', getattr(totals, f'{result}_orders') + row['orders'])
+        setattr(totals, f'{result}_tickets', getattr(totals, f'{result}_tickets') + row['tickets'])
+
+    with transaction.atomic():
+        # Stats of showings moved to other days are removed as well.
+        ShowingStats.objects.filter(Q(date__gte=first_day, date__lte=last_day) | Q(showing__in=showings)).delete()
+        for model in (MovieDayStats, HallDayStats, CashierDayStats):
+            model.objects.filter(date__gte=first_day, date__lte=last_day).delete()
+
+        ShowingStats.objects.bulk_create(showing_stats)
+        MovieDayStats.objects.bulk_create(stats for stats in day_stats.values() if isinstance(stats, MovieDayStats))
+        HallDayStats.objects.bulk_create(stats for stats in day_stats.values() if isinstance(stats, HallDayStats))
+        CashierDayStats.objects.bulk_create(cashier_stats.values())
+
+    return len(showing_stats)
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, pre_delete
+
+from .rollups import record_showings_created, record_showing_changed, record_showing_deleted
+
+
+def showing_saved(sender, instance, created, **kwargs):
+    if created:
+        record_showings_created([instance])
+    else:
+        record_showing_changed(instance)
+
+
+def showing_deleted(sender, instance, **kwargs):
+    record_showing_deleted(instance)
+
+
+# Orders are recorded by orders.services, showings created with
+# bulk_create() are recorded by code creating them.
+post_save.connect(showing_saved, sender='cinema.Showing', dispatch_uid='reports_showing_saved')
+pre_delete.connect(showing_deleted, sender='cinema.Showing', dispatch_uid='reports_showing_deleted')
@@ -0,0 +1,260 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.test import TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .exports import ORDER_COLUMNS
+from .models import ShowingStats, MovieDayStats, HallDayStats, CashierDayStats
+from .rollups import rebuild_rollups
+from cinema.models import Movie, Hall, Showing
+from cinema.streaming import StreamingASGIHandler
+from cinema.tests import CinemaTestCase
+from orders.services import book_tickets, finalize_orders
+
+
+def get_rollups():
+    """Return rows of all rollups, except ones of days left without any showings or sales."""
+
+    rollups = {}
+    for model in (ShowingStats, MovieDayStats, HallDayStats, CashierDayStats):
+        fields = [field.attname for field in model._meta.concrete_fields
+                  if not field.primary_key or model is ShowingStats]
+        counters = [i for i, field in enumerate(fields) if field != 'date' and not field.endswith('_id')]
+        rollups[model.__name__] = sorted(row for row in model.objects.values_list(*fields)
+                                         if model is ShowingStats or any(row[i] for i in counters))
+    return rollups
+
+
+class RollupsTests(TransactionTestCase):
+    """Incremental updates are made after commit, so transactions are not rolled back by these tests."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.client_user = User.objects.create_user('client@example.com', 'password')
+        self.cashier = User.objects.create_user('cashier@example.com', 'password', is_cashier=True)
+
+        self.hall = Hall.objects.create(rows=2, seats_in_row=5)
+        self.movie = Movie.objects.create(title='Movie', director='Director', year_of_production=2000,
+                                          type='drama', duration_in_minutes=100, description='Description')
+
+        tomorrow = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0) \
+            + timezone.timedelta(days=1)
+        self.days = (tomorrow.date(), tomorrow.date() + timezone.timedelta(days=1))
+        self.showings = [
+            Showing.objects.create(when=tomorrow, movie=self.movie, hall=self.hall),
+            Showing.objects.create(when=tomorrow + timezone.timedelta(hours=3), movie=self.movie, hall=self.hall),
+            Showing.objects.create(when=tomorrow + timezone.timedelta(days=1), movie=self.movie, hall=self.hall),
+        ]
+
+    def test_incremental_updates_match_rebuild(self):
+        orders = [
+            book_tickets(showing, self.client_user, tickets_amount)
+            for showing in self.showings
+            for tickets_amount in (1, 2, 3)
+        ]
+        finalize_orders([orders[0].pk, orders[3].pk], self.cashier, accepted=True)
+        finalize_orders([orders[1].pk, orders[8].pk], self.cashier, accepted=False)
+
+        incremental = get_rollups()
+        rebuild_rollups(*self.days)
+
+        self.assertEqual(incremental, get_rollups())
+        self.assertEqual(MovieDayStats.objects.get(date=self.days[0]).tickets, 2 * 6 - 2)
+        self.assertEqual(CashierDayStats.objects.get(date=self.days[1]).rejected_tickets, 3)
+
+    def book_and_finalize(self):
+        orders = [book_tickets(showing, self.client_user, 2) for showing in self.showings]
+        finalize_orders([orders[0].pk], self.cashier, accepted=True)
+        finalize_orders([orders[2].pk], self.cashier, accepted=False)
+
+    def assertRollupsMatchRebuild(self):
+        incremental = get_rollups()
+        rebuild_rollups(self.days[0], self.days[-1] + timezone.timedelta(days=1))
+        self.assertEqual(incremental, get_rollups())
+
+    def test_moved_showing_sales_are_moved(self):
+        self.book_and_finalize()
+        other_hall = Hall.objects.create(rows=3, seats_in_row=5)
+
+        # Only showings without booked seats can change their hall, seats of the rejected order were released.
+        showing = Showing.objects.get(pk=self.showings[2].pk)
+        showing.when -= timezone.timedelta(hours=18)
+        showing.hall = other_hall
+        with mock.patch('reports.rollups.rebuild_rollups') as rebuild:
+            showing.save()
+
+        rebuild.assert_not_called()
+        self.assertEqual(ShowingStats.objects.get(pk=showing.pk).date, self.days[0])
+        self.assertEqual(HallDayStats.objects.get(hall=other_hall).places, other_hall.places)
+        self.assertEqual(CashierDayStats.objects.get(date=self.days[0]).rejected_tickets, 2)
+        self.assertRollupsMatchRebuild()
+
+    def test_deleted_showing_sales_are_subtracted(self):
+        self.book_and_finalize()
+        with mock.patch('reports.rollups.rebuild_rollups') as rebuild:
+            self.showings[0].delete()
+
+        rebuild.assert_not_called()
+        self.assertEqual(list(MovieDayStats.objects.order_by('date').values_list('showings', 'tickets')),
+                         [(1, 2), (1, 0)])
+        self.assertRollupsMatchRebuild()
+
+    def test_deleted_movie_sales_are_subtracted(self):
+        self.book_and_finalize()
+        other_movie = Movie.objects.create(title='Other', director='Director', year_of_production=2000,
+                                           type='drama', duration_in_minutes=100, description='Description')
+        Showing.objects.create(when=self.showings[2].when + timezone.timedelta(hours=3), movie=other_movie,
+                               hall=self.hall)
+
+        with mock.patch('reports.rollups.rebuild_rollups') as rebuild:
+            self.movie.delete()
+
+        rebuild.assert_not_called()
+        self.assertEqual(list(HallDayStats.objects.filter(showings__gt=0).values_list('date', 'showings', 'tickets')),
+                         [(self.days[1], 1, 0)])
+        self.assertRollupsMatchRebuild()
+
+
+class ReportsViewsQueriesTests(CinemaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        finalize_orders([order.pk for order in cls.orders[:6]], cls.cashier, accepted=True)
+        rebuild_rollups(cls.showings[0].get_date(), cls.showings[-1].get_date())
+
+    def test_movies(self):
+        self.assertNumQueriesOfGet(4, reverse('report-movies'), self.staff)
+
+    def test_halls(self):
+        self.assertNumQueriesOfGet(4, f'{reverse("report-halls")}?period=day', self.staff)
+
+    def test_cashiers(self):
+        response = self.assertNumQueriesOfGet(4, f'{reverse("report-cashiers")}?period=month', self.staff)
+        self.assertContains(response, self.cashier.email)
+
+    def test_showings(self):
+        self.assertNumQueriesOfGet(4, reverse('report-showings'), self.staff)
+
+
+class ExportTests(CinemaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        finalize_orders([cls.orders[0].pk], cls.cashier, accepted=True)
+        finalize_orders([cls.orders[1].pk], cls.cashier, accepted=False)
+        cls.booked = book_tickets(cls.showing, cls.client_user, 2, seats=[(1, 1), (2, 3)])
+
+    def get_export(self, kind, query_string=''):
+        self.client.force_login(self.staff)
+        response = self.client.get(f'{reverse("report-export", args=[kind])}?{query_string}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_orders_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.get_export('orders'))))
+
+        self.assertEqual(len(rows), len(self.orders) + 1)
+        rows = {row['uuid']: row for row in rows}
+        self.assertEqual(rows[str(self.orders[0].pk)]['status'], 'accepted')
+        self.assertEqual(rows[str(self.orders[0].pk)]['cashier_email'], self.cashier.email)
+        self.assertEqual(rows[str(self.orders[1].pk)]['status'], 'rejected')
+        self.assertEqual(rows[str(self.orders[2].pk)]['status'], 'pending')
+        self.assertEqual(rows[str(self.booked.pk)]['seats'], '1-1 2-3')
+
+    def test_orders_jsonl_filters(self):
+        date = self.showing.get_date()
+        query_string = f'format=jsonl&status=pending&movie={self.showing.movie.slug}' \
+                       f'&since={date:%Y-%m-%d}&until={date:%Y-%m-%d}'
+        rows = [json.loads(line) for line in self.get_export('orders', query_string).splitlines()]
+
+        expected = {str(order.pk) for order in self.orders[2:] + [self.booked]
+                    if order.showing.movie == self.showing.movie and order.showing.get_date() == date}
+        self.assertEqual({row['uuid'] for row in rows}, expected)
+
+    def test_showings_filtered_by_showing(self):
+        rows = list(csv.DictReader(io.StringIO(self.get_export('showings', f'showing={self.showing.pk}'))))
+
+        self.assertEqual([row['uuid'] for row in rows], [str(self.showing.pk)])
+        self.showing.refresh_from_db()
+        self.assertEqual(rows[0]['taken_seats'], str(self.showing.taken_seats))
+
+    def test_rows_are_read_with_one_query_per_table(self):
+        self.client.force_login(self.staff)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('report-export', args=['orders']))
+            b''.join(response.streaming_content)
+
+    def test_invalid_filters(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(f'{reverse("report-export", args=["orders"])}?since=2020-02-01&until=2020-01-01')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('report-export', args=['users']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_export_through_asgi(self):
+        await sync_to_async(self.async_client.force_login, thread_sensitive=True)(self.staff)
+        response = await self.async_client.get(f'{reverse("report-export", args=["orders"])}?format=jsonl')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/jsonl')
+        # Content is read in the event loop, as the ASGI server does.
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(self.orders) + 1)
+
+    async def test_export_is_streamed_by_asgi_application(self):
+        class Disconnected(Exception):
+            pass
+
+        await sync_to_async(self.client.force_login, thread_sensitive=True)(self.staff)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('report-export', args=['orders']),
+            'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode())],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+            if message['type'] == 'http.response.body':
+                # The client goes away after the first chunk, so the rest of the export is never read.
+                raise Disconnected
+
+        # Like the test client, keep the connection of the test's transaction open.
+        request_started.disconnect(close_old_connections)
+        try:
+            with mock.patch('reports.exports.CHUNK_SIZE', 1), self.assertRaises(Disconnected):
+                await StreamingASGIHandler()(scope, receive, send)
+        finally:
+            request_started.connect(close_old_connections)
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(messages[1]['body'].decode().splitlines(), [','.join(ORDER_COLUMNS)])
+        self.assertTrue(messages[1]['more_body'])
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'showings.jsonl')
+            call_command('export_data', 'showings', format='jsonl', movie=self.movies[0].slug, output=path,
+                         stderr=io.StringIO())
+            with open(path) as file:
+                rows = [json.loads(line) for line in file]
+
+        self.assertEqual(len(rows), len([showing for showing in self.showings if showing.movie == self.movies[0]]))
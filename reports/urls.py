@@ -0,0 +1,11 @@
+from django.urls import path
+
+from .views import MoviesReportView, HallsReportView, CashiersReportView, ShowingsReportView, ExportView
+
+urlpatterns = [
+    path('movies/', MoviesReportView.as_view(), name='report-movies'),
+    path('halls/', HallsReportView.as_view(), name='report-halls'),
+    path('cashiers/', CashiersReportView.as_view(), name='report-cashiers'),
+    path('showings/', ShowingsReportView.as_view(), name='report-showings'),
+    path('export/<slug:kind>/', ExportView.as_view(), name='report-export'),
+]
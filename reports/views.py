@@ -0,0 +1,128 @@
+from django.db.models import DateField, Sum
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.views.generic import ListView, View
+
+from .exports import EXPORTS, FORMATS, export, spool
+from .forms import ReportFilterForm, ExportFilterForm
+from .models import ShowingStats, MovieDayStats, HallDayStats, CashierDayStats
+from cinema.views import get_query_string_without_page
+from staff_panel.views import StaffRequiredMixin
+
+
+class ReportView(StaffRequiredMixin, ListView):
+    """Report of rollup rows from a range of days summed up per period
+    (day, week or month) and `group_by` fields. Only rollup tables (joined
+    with small tables for names) are read, so the report does not get
+    slower as the amount of orders grows."""
+
+    context_object_name = 'rows'
+    paginate_by = 50
+    group_by = ()
+    sum_fields = ()
+    ordering = ()
+    title = None
+
+    def get_filter_form(self):
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = ReportFilterForm(self.request.GET)
+        return self._filter_form
+
+    def get_filters(self):
+        form = self.get_filter_form()
+        filters = form.cleaned_data if form.is_valid() else {}
+
+        # By default last four weeks.
+        until = filters.get('until') or timezone.localtime(timezone.now()).date()
+        since = filters.get('since') or until - timezone.timedelta(days=27)
+        return since, until, filters.get('period') or 'week'
+
+    def get_queryset(self):
+        since, until, period = self.get_filters()
+
+        return self.model.objects.filter(date__gte=since, date__lte=until) \
+            .annotate(period=Trunc('date', period, output_field=DateField())) \
+            .values('period', *self.group_by) \
+            .annotate(**{field: Sum(field) for field in self.sum_fields}) \
+            .order_by('-period', *self.ordering)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['filter_form'] = self.get_filter_form()
+        context['query_string'] = get_query_string_without_page(self.request)
+        context['title'] = self.title
+        return context
+
+
+class MoviesReportView(ReportView):
+    model = MovieDayStats
+    template_name = 'reports/movies.html'
+    group_by = ('movie__title', 'movie__slug')
+    sum_fields = ('showings', 'places', 'orders', 'tickets', 'accepted_tickets', 'rejected_tickets')
+    ordering = ('-tickets', 'movie__title')
+    title = 'Occupancy of movies'
+
+
+class HallsReportView(ReportView):
+    model = HallDayStats
+    template_name = 'reports/halls.html'
+    group_by = ('hall_id',)
+    sum_fields = ('showings', 'places', 'orders', 'tickets', 'accepted_tickets', 'rejected_tickets')
+    ordering = ('hall_id',)
+    title = 'Occupancy of halls'
+
+
+class CashiersReportView(ReportView):
+    model = CashierDayStats
+    template_name = 'reports/cashiers.html'
+    group_by = ('cashier__first_name', 'cashier__last_name', 'cashier__email')
+    sum_fields = ('accepted_orders', 'accepted_tickets', 'rejected_orders', 'rejected_tickets')
+    ordering = ('-accepted_orders', 'cashier__email')
+    title = 'Orders finalized by cashiers'
+
+
+class ShowingsReportView(ReportView):
+    """Sales of single showings, not summed up."""
+
+    model = ShowingStats
+    template_name = 'reports/showings.html'
+    title = 'Sales of showings'
+
+    def get_queryset(self):
+        since, until, _ = self.get_filters()
+
+        return ShowingStats.objects.filter(date__gte=since, date__lte=until) \
+            .values('showing_id', 'showing__when', 'movie__title', 'hall_id', 'places',
+                    'orders', 'tickets', 'accepted_tickets', 'rejected_tickets') \
+            .order_by('-showing__when', 'showing_id')
+
+
+class ExportView(StaffRequiredMixin, View):
+    """Streams all orders or showings matching filters as CSV or JSON Lines
+    file, see reports.exports. Under ASGI handlers other than
+    cinema.streaming.StreamingASGIHandler the file is spooled to a temporary
+    file first."""
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            raise Http404
+
+        form = ExportFilterForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+
+        file_format = form.cleaned_data['format'] or 'csv'
+        _, content_type = FORMATS[file_format]
+        today = timezone.localtime(timezone.now()).date()
+
+        chunks = export(kind, file_format, form.cleaned_data)
+        if isinstance(request, ASGIRequest) and not getattr(request, 'streams_synchronously', False):
+            # Django 3.1 ASGIHandler iterates streaming responses in the event loop, where
+            # the database cannot be queried, so the export is written out before sending it.
+            response = FileResponse(spool(chunks), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{kind}-{today}.{file_format}"'
+        return response
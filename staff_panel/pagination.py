@@ -0,0 +1,50 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(item, fields):
+    values = [str(getattr(item, field.lstrip('-'))) for field in fields]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(model, fields, cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(fields):
+            raise ValueError
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(fields, values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        raise ValueError(f'Incorrect cursor: {cursor}')
+
+
+def get_keyset_page(queryset, fields, cursor=None, size=20):
+    """Return (items, next_cursor) for the page of `queryset` ordered by `fields`
+    (which must identify rows uniquely) starting right after `cursor`.
+
+    Unlike offset pagination, cost of getting a page does not depend on how
+    far the page is, as the database can seek directly in the index.
+    """
+
+    queryset = queryset.order_by(*fields)
+
+    if cursor:
+        values = decode_cursor(queryset.model, fields, cursor)
+
+        # (a, b) > (x, y) is equivalent to: a > x OR (a = x AND b > y).
+        condition = Q()
+        for i, field in enumerate(fields):
+            lookup = f'{field[1:]}__lt' if field.startswith('-') else f'{field}__gt'
+            equal = {previous.lstrip('-'): value for previous, value in zip(fields[:i], values[:i])}
+            condition |= Q(**equal, **{lookup: values[i]})
+        queryset = queryset.filter(condition)
+
+    items = list(queryset[:size + 1])
+    next_cursor = encode_cursor(items[size - 1], fields) if len(items) > size else None
+
+    return items[:size], next_cursor
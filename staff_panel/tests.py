@@ -1,3 +1,130 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from .pagination import encode_cursor, get_keyset_page
+from cinema.models import Hall, Showing
+from cinema.tests import CinemaTestCase
+
+
+class StaffPanelViewsQueriesTests(CinemaTestCase):
+    def test_staff_panel(self):
+        self.assertNumQueriesOfGet(2, reverse('staff-panel'), self.staff)
+
+    def test_showings(self):
+        self.assertNumQueriesOfGet(3, reverse('staff-panel-showings'), self.staff)
+
+    def test_movies(self):
+        self.assertNumQueriesOfGet(3, reverse('staff-panel-movies'), self.staff)
+
+    def test_halls(self):
+        self.assertNumQueriesOfGet(3, reverse('staff-panel-halls'), self.staff)
+
+    def test_create_movie(self):
+        self.assertNumQueriesOfGet(2, reverse('create-movie'), self.staff)
+
+    def test_delete_movie(self):
+        self.assertNumQueriesOfGet(3, reverse('delete-movie', args=[self.movies[0].slug]), self.staff)
+
+    def test_create_hall(self):
+        self.assertNumQueriesOfGet(2, reverse('create-hall'), self.staff)
+
+    def test_delete_hall(self):
+        self.assertNumQueriesOfGet(3, reverse('delete-hall', args=[self.halls[0].pk]), self.staff)
+
+    def test_create_showing(self):
+        self.assertNumQueriesOfGet(4, reverse('create-showing'), self.staff)
+
+    def test_delete_showing(self):
+        self.assertNumQueriesOfGet(4, reverse('delete-showing', args=[self.showing.pk]), self.staff)
+
+    def test_manage_cashiers(self):
+        self.assertNumQueriesOfGet(3, reverse('manage-cashiers'), self.staff)
+
+
+class KeysetPaginationTests(CinemaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Showings starting at the same time in other halls.
+        for _ in range(3):
+            Showing.objects.create(when=cls.showing.when, movie=cls.showing.movie,
+                                   hall=Hall.objects.create(rows=5, seats_in_row=10))
+
+    def get_all_pages(self, queryset, fields, size):
+        items, cursor = [], None
+        while True:
+            page, cursor = get_keyset_page(queryset, fields, cursor, size)
+            items.append(page)
+            if cursor is None:
+                return items
+
+    def test_pages_cover_every_row_once(self):
+        for fields in (('when', 'uuid'), ('-when', '-uuid')):
+            with self.subTest(fields=fields):
+                pages = self.get_all_pages(Showing.objects.all(), fields, 3)
+
+                self.assertEqual([showing.pk for page in pages for showing in page],
+                                 list(Showing.objects.order_by(*fields).values_list('pk', flat=True)))
+                self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+
+    def test_page_boundary_between_rows_with_the_same_order_value(self):
+        tied = list(Showing.objects.filter(when=self.showing.when).order_by('uuid'))
+        cursor = encode_cursor(tied[1], ('when', 'uuid'))
+
+        page, _ = get_keyset_page(Showing.objects.all(), ('when', 'uuid'), cursor, 2)
+        self.assertEqual(page, tied[2:4])
+
+    def test_full_last_page_has_no_next_page(self):
+        page, cursor = get_keyset_page(Showing.objects.all(), ('when', 'uuid'), size=Showing.objects.count())
+
+        self.assertEqual(len(page), Showing.objects.count())
+        self.assertIsNone(cursor)
+
+    def test_page_after_cursor(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('staff-panel-movies'), {'cursor': encode_cursor(self.movies[0], ('id',))})
+
+        self.assertEqual(list(response.context['items']), self.movies[1:])
+        self.assertIsNone(response.context['next_url'])
+
+    def test_incorrect_cursor(self):
+        self.client.force_login(self.staff)
+        # Not base64 encoded, a value too few, a date instead of uuid.
+        for cursor in ('not a cursor', encode_cursor(self.showing, ('when',)),
+                       encode_cursor(self.showing, ('when', 'when'))):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('staff-panel-showings'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class CreateShowingTests(CinemaTestCase):
+    def post_showing(self, when, hall):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('create-showing'), {
+            'when': timezone.localtime(when).strftime('%d/%m/%Y %H:%M'), 'movie': self.movies[0].pk, 'hall': hall.pk
+        })
+
+    def test_showing_is_created(self):
+        response = self.post_showing(self.showing.ends_at, self.showing.hall)
+
+        self.assertRedirects(response, reverse('staff-panel'))
+        self.assertTrue(Showing.objects.filter(when=self.showing.ends_at, hall=self.showing.hall).exists())
+
+    def test_colliding_showing_is_a_form_error(self):
+        response = self.post_showing(self.showing.when, self.showing.hall)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', None, f'{self.showing} collides with showing that is to be added')
+
+    @skipUnless(connection.vendor == 'postgresql', 'The constraint exists on PostgreSQL only.')
+    def test_showing_colliding_after_validation_is_a_form_error(self):
+        # As if the colliding showing was added by other request after the form was validated.
+        with mock.patch.object(Showing, 'check_is_not_colliding'):
+            response = self.post_showing(self.showing.when, self.showing.hall)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', None, 'Showing collides with other showing added in the meantime.')
+        self.assertEqual(Showing.objects.filter(hall=self.showing.hall, when=self.showing.when).count(), 1)
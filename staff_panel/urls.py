@@ -2,6 +2,9 @@ from django.urls import path
 
 from .views import (
     StaffPanelView,
+    StaffPanelShowingsView,
+    StaffPanelMoviesView,
+    StaffPanelHallsView,
     CreateMovieView,
     DeleteMovieView,
     CreateHallView,
@@ -13,6 +16,9 @@ from .views import (
 
 urlpatterns = [
     path('panel/', StaffPanelView.as_view(), name='staff-panel'),
+    path('panel/showings/', StaffPanelShowingsView.as_view(), name='staff-panel-showings'),
+    path('panel/movies/', StaffPanelMoviesView.as_view(), name='staff-panel-movies'),
+    path('panel/halls/', StaffPanelHallsView.as_view(), name='staff-panel-halls'),
     path('create-movie/', CreateMovieView.as_view(), name='create-movie'),
     path('delete-movie/<slug:slug>/', DeleteMovieView.as_view(), name='delete-movie'),
     path('create-hall/', CreateHallView.as_view(), name='create-hall'),
@@ -3,8 +3,13 @@ from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.utils import timezone
 
 from .forms import CreateShowingForm, SelectUserForm
+from .pagination import get_keyset_page
 from cinema.models import Showing, Movie, Hall
 from django.contrib.auth import get_user_model
 
@@ -19,18 +24,75 @@ class StaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
 
 
 class StaffPanelView(StaffRequiredMixin, TemplateView):
+    """Lists of showings, movies and halls are loaded lazily
+    page by page from the views below."""
+
     template_name = 'staff_panel/staff_panel.html'
 
+
+class StaffPanelListView(StaffRequiredMixin, TemplateView):
+    """Render one page of entities for the staff panel, using keyset pagination."""
+
+    queryset = None
+    ordering = None
+    paginate_by = 20
+
+    def get_queryset(self):
+        if self.queryset is None:
+            raise ImproperlyConfigured(f'{self.__class__.__name__} is missing a queryset.')
+        return self.queryset.all()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context['showings'] = Showing.objects.all()
-        context['movies'] = Movie.objects.all()
-        context['halls'] = Hall.objects.all()
+        try:
+            items, next_cursor = get_keyset_page(self.get_queryset(), self.ordering,
+                                                 self.request.GET.get('cursor'), self.paginate_by)
+        except ValueError:
+            raise Http404('Incorrect cursor.')
+
+        next_url = None
+        if next_cursor:
+            params = self.request.GET.copy()
+            params['cursor'] = next_cursor
+            next_url = f'{self.request.path}?{params.urlencode()}'
+
+        context['items'] = items
+        context['next_url'] = next_url
 
         return context
 
 
+class StaffPanelShowingsView(StaffPanelListView):
+    template_name = 'staff_panel/_showings.html'
+    queryset = Showing.objects.select_related('movie')
+
+    def get_queryset(self):
+        now = timezone.now()
+        showings = super().get_queryset()
+
+        if self.request.GET.get('past'):
+            return showings.filter(when__lt=now)
+        return showings.filter(when__gte=now)
+
+    @property
+    def ordering(self):
+        # The most recent past showings first.
+        return ('-when', '-uuid') if self.request.GET.get('past') else ('when', 'uuid')
+
+
+class StaffPanelMoviesView(StaffPanelListView):
+    template_name = 'staff_panel/_movies.html'
+    ordering = ('id',)
+    queryset = Movie.objects.defer('search_vector', 'description')
+
+
+class StaffPanelHallsView(StaffPanelListView):
+    template_name = 'staff_panel/_halls.html'
+    ordering = ('number',)
+    queryset = Hall.objects.all()
+
+
 class CreateMovieView(StaffRequiredMixin, SuccessMessageMixin, CreateView):
     model = Movie
     template_name = 'staff_panel/create_movie.html'
@@ -60,6 +122,16 @@ class CreateShowingView(StaffRequiredMixin, SuccessMessageMixin, CreateView):
     success_message = 'Showing created!'
     success_url = reverse_lazy('staff-panel')
 
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError:
+            # A colliding showing was added after the form had been validated,
+            # the database constraint rejected this one (see Showing.get_colliding_showings).
+            form.add_error(None, 'Showing collides with other showing added in the meantime.')
+            return self.form_invalid(form)
+
 
 class DeleteShowingView(StaffRequiredMixin, DeleteView):
     model = Showing
@@ -77,7 +149,7 @@ class DeleteShowingView(StaffRequiredMixin, DeleteView):
 class CreateHallView(StaffRequiredMixin, SuccessMessageMixin, CreateView):
     model = Hall
     template_name = 'staff_panel/create_hall.html'
-    fields = ('places',)
+    fields = ('rows', 'seats_in_row')
     success_message = 'Hall created!'
     success_url = reverse_lazy('staff-panel')
 
@@ -1,3 +1,17 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from cinema.tests import CinemaTestCase
+
+
+class UsersViewsQueriesTests(CinemaTestCase):
+    def test_login(self):
+        self.assertNumQueriesOfGet(0, reverse('login'))
+
+    def test_signup(self):
+        self.assertNumQueriesOfGet(0, reverse('signup'))
+
+    def test_logout(self):
+        self.assertNumQueriesOfGet(4, reverse('logout'), self.client_user, status_code=302)
+
+    def test_profile(self):
+        self.assertNumQueriesOfGet(5, reverse('profile'), self.client_user)
@@ -5,7 +5,7 @@ from django.urls import reverse_lazy
 from django.utils import timezone
 
 from .forms import CustomUserCreationForm
-from orders.models import Order
+from archive.history import get_tickets_history
 
 
 class ProfileView(LoginRequiredMixin, TemplateView):
@@ -16,17 +16,12 @@ class ProfileView(LoginRequiredMixin, TemplateView):
 
         # Replace hour and minute to 0 to include all tickets for current day.
         now = timezone.now().replace(hour=0, minute=0)
-        tickets_history = self.request.user.my_orders.filter(showing__when__lt=now).order_by('showing__when')
-        tickets_current = self.request.user.my_orders.filter(showing__when__gte=now).order_by('showing__when')
-        tickets_for_cashier = None
-
-        if self.request.user.is_cashier:
-            tickets_for_cashier = Order.objects.filter(cashier_who_accepted__isnull=True,
-                                                       showing__when__gte=now).order_by('showing__when')
+        my_orders = self.request.user.my_orders.select_related('showing__movie', 'showing__hall')
+        tickets_history = get_tickets_history(self.request.user, now)
+        tickets_current = my_orders.filter(showing__when__gte=now).order_by('showing__when')
 
         context['tickets_history'] = tickets_history
         context['tickets_current'] = tickets_current
-        context['tickets_for_cashier'] = tickets_for_cashier
 
         return context
 